@@ -0,0 +1,127 @@
+"""
+Dose-response comparison across spending arms.
+
+Spending is cut into ordered arms (quintiles by default, see assign_treatment) and every
+pair of arms is compared as its own binary problem: the higher arm is "treated", the lower
+arm is the control. The propensity models of all pairs are fitted in one batched Newton
+solve on the shared design, each pair weighting in only its own rows. Each pair's model
+is then reused for the trim, the match and every outcome.
+
+Run with:
+    python -m src.analysis.dose_response --arms 5 --pairs all --out outputs/dose_response.csv
+"""
+import argparse
+import itertools
+import sys
+import time
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+from src.backend import to_pandas
+from src.data.preprocess import COVARIATES, assign_treatment
+from src.models.psm import fit_logit_batch, logistic, trim_common_support
+from src.models.matching import CausalMatcher
+
+PAIRINGS = ("all", "adjacent", "lowest")
+
+RESULT_COLUMNS = ["low_arm", "high_arm", "low_median", "high_median", "outcome", "att", "se", "ci_low", "ci_high",
+                  "n_treated", "n_control", "n_matched"]
+
+def arm_pairs(arms: List[int], pairs: str = "all") -> List[Tuple[int, int]]:
+    """
+    (low, high) arm pairs to compare: every pair, neighbours only, or each arm against the lowest.
+    """
+    if pairs == "all":
+        return list(itertools.combinations(arms, 2))
+    if pairs == "adjacent":
+        return list(zip(arms[:-1], arms[1:]))
+    if pairs == "lowest":
+        return [(arms[0], a) for a in arms[1:]]
+    raise ValueError(f"Unknown pairing {pairs!r}; expected one of {PAIRINGS}")
+
+def fit_pair_scores(df: pd.DataFrame, pairs: List[Tuple[int, int]], covariates: List[str],
+                    arm_col: str = "treatment") -> np.ndarray:
+    """
+    Propensity coefficients of P(high arm | X, low or high arm) for every pair, shape (n_pairs, p).
+    One batched fit: rows outside a pair get weight 0 in its model.
+    """
+    X = np.column_stack([np.ones(len(df)), df[covariates].to_numpy(dtype=np.float64)])
+    arm = df[arm_col].to_numpy()
+    low, high = np.array(pairs).T
+    weights = ((arm == low[:, None]) | (arm == high[:, None])).astype(np.float64)
+    y = (arm == high[:, None]).astype(np.float64)
+    return fit_logit_batch(X, y, weights=weights)
+
+def run_dose_response(df: pd.DataFrame, covariates: Optional[List[str]] = None, outcomes: Optional[List[str]] = None,
+                      arm_col: str = "treatment", dose_col: str = "police_spending", pairs: str = "all",
+                      caliper: float = 0.25, trim: float = 0.05, alpha: float = 0.05) -> pd.DataFrame:
+    """
+    Matched ATT of each higher arm over each lower arm in df (arms coded 0..k in arm_col).
+    Returns one tidy row per (pair, outcome); pairs whose propensity model fails have NaN estimates.
+    """
+    df = to_pandas(df).reset_index(drop=True)
+    covariates = list(covariates or COVARIATES)
+    outcomes = [o for o in (outcomes or ["delta_violent_crime"]) if o in df.columns]
+    if not outcomes:
+        raise ValueError("None of the requested outcomes are in the data")
+
+    arms = sorted(int(a) for a in np.unique(df[arm_col]))
+    pair_list = arm_pairs(arms, pairs)
+    if not pair_list:
+        raise ValueError(f"Need at least two arms in {arm_col}, found {arms}")
+    betas = fit_pair_scores(df, pair_list, covariates, arm_col)
+    medians = df.groupby(arm_col)[dose_col].median()
+
+    arm = df[arm_col].to_numpy()
+    rows = []
+    for (low, high), beta in zip(pair_list, betas):
+        base = {"low_arm": low, "high_arm": high, "low_median": medians[low], "high_median": medians[high]}
+        if np.isnan(beta).any():
+            print(f"WARNING: propensity model for arms {low} vs {high} did not converge", file=sys.stderr)
+            rows += [dict(base, outcome=o) for o in outcomes]
+            continue
+
+        sample = df.loc[(arm == low) | (arm == high), covariates + outcomes].copy()
+        sample["treatment"] = (arm[sample.index] == high).astype(np.int8)
+        X = np.column_stack([np.ones(len(sample)), sample[covariates].to_numpy(dtype=np.float64)])
+        sample["propensity_score"] = logistic(X @ beta)
+        sample = trim_common_support(sample, threshold=trim)
+
+        matcher = CausalMatcher(caliper=caliper)
+        matched = matcher.match(sample, treatment_col="treatment", ps_col="propensity_score")
+        n_treated = int(sample["treatment"].sum())
+        counts = dict(base, n_treated=n_treated, n_control=len(sample) - n_treated, n_matched=len(matched))
+        for outcome in outcomes:
+            ai = matcher.abadie_imbens_se(outcome, alpha=alpha)
+            rows.append(dict(counts, outcome=outcome, att=matcher.calculate_att(outcome),
+                             se=ai["se"], ci_low=ai["ci_low"], ci_high=ai["ci_high"]))
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pairwise matched comparisons across spending arms.")
+    parser.add_argument("--arms", type=int, default=5, help="Equal-count spending arms (5 = quintiles).")
+    parser.add_argument("--cutpoints", type=float, nargs="+", default=None,
+                        help="Fixed spending cutpoints instead of equal-count arms.")
+    parser.add_argument("--pairs", choices=PAIRINGS, default="all")
+    parser.add_argument("--caliper", type=float, default=0.25)
+    parser.add_argument("--out", default="outputs/dose_response.csv")
+    args = parser.parse_args(argv)
+
+    from src.data.ingest import load_raw_data
+    from src.data.preprocess import load_and_merge
+    fisc, cius, acs = load_raw_data()
+    merged = load_and_merge(fisc, cius, acs)
+    if args.cutpoints:
+        df = assign_treatment(merged, cutpoints=args.cutpoints)
+    else:
+        df = assign_treatment(merged, n_arms=args.arms)
+
+    start = time.perf_counter()
+    results = run_dose_response(df, pairs=args.pairs, caliper=args.caliper)
+    elapsed = time.perf_counter() - start
+    results.to_csv(args.out, index=False)
+    print(f"{len(results)} arm comparisons in {elapsed:.2f}s -> {args.out}", file=sys.stderr)
+    print(results[["low_arm", "high_arm", "outcome", "att", "se", "n_matched"]].to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Randomization inference for the matched ATT.
+
+Two permutation tests of the sharp null of no effect:
+
+- Within-pair: in each match the treated/control labels are exchangeable, which flips
+  the sign of that match's outcome difference. All permutations are drawn as one
+  random sign matrix S (packed random bits, unpacked a chunk at a time), and every
+  permuted ATT is one matrix product S @ d. With few enough matches the 2^n sign
+  vectors are enumerated and the p-value is exact.
+- Global with rematching: treatment is permuted across the whole analysis sample and
+  the PS fit, common-support trim and matching are redone for every permutation, so
+  the null distribution includes the matching step. The propensity models of a block
+  of permutations are fitted together (fit_logit_batch); blocks can run in a process pool.
+
+p-values count the observed assignment as one of the permutations: (1 + #extreme) / (1 + B).
+
+Run with:
+    python -m src.analysis.randomization --n-perm 100000 --rematch 1000 --n-jobs 4
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Union
+from src.analysis.sensitivity import matched_differences
+from src.models.matching import BOOT_BLOCK, CausalMatcher, MatchedSet, att_from_scores, pipeline_att
+from src.models.psm import fit_logit_batch, logistic
+from src.parallel import map_in_processes
+
+ALTERNATIVES = ("two-sided", "greater", "less")
+# Permuted statistics are computed this many sign entries at a time (32 MB of float64)
+CHUNK_ELEMENTS = 1 << 22
+# Enumerate all 2^n sign vectors when there are at most this many matches
+MAX_EXACT_PAIRS = 16
+
+def _p_value(null: np.ndarray, observed: float, alternative: str, count_observed: bool = True) -> float:
+    """
+    Share of permuted statistics at least as extreme as observed (with a relative
+    tolerance, so permutations tying the observed value in exact arithmetic count).
+    """
+    if alternative not in ALTERNATIVES:
+        raise ValueError(f"Unknown alternative {alternative!r}; expected one of {ALTERNATIVES}")
+    null = null[~np.isnan(null)]
+    tol = 1e-12 * max(1.0, abs(observed))
+    if alternative == "greater":
+        extreme = np.count_nonzero(null >= observed - tol)
+    elif alternative == "less":
+        extreme = np.count_nonzero(null <= observed + tol)
+    else:
+        extreme = np.count_nonzero(np.abs(null) >= abs(observed) - tol)
+    if count_observed:
+        return (1 + extreme) / (1 + len(null))
+    return extreme / len(null)
+
+def sign_flip_null(diffs: np.ndarray, n_perm: int = 100_000, seed: Optional[int] = 0,
+                   chunk_elements: int = CHUNK_ELEMENTS) -> np.ndarray:
+    """
+    Mean of diffs under n_perm random sign flips. The signs are drawn as packed random
+    bytes; each chunk is unpacked to a 0/1 matrix B and sum(s * d) = sum(d) - 2 B @ d.
+    """
+    diffs = np.asarray(diffs, dtype=np.float64)
+    n = len(diffs)
+    rng = np.random.default_rng(seed)
+    null = np.empty(n_perm)
+    total = diffs.sum()
+    rows = max(1, chunk_elements // max(n, 1))
+    for start in range(0, n_perm, rows):
+        b = min(rows, n_perm - start)
+        packed = rng.integers(0, 256, size=(b, (n + 7) // 8), dtype=np.uint8)
+        flips = np.unpackbits(packed, axis=1, count=n)
+        null[start:start + b] = (total - 2.0 * (flips.astype(np.float64) @ diffs)) / n
+    return null
+
+def sign_flip_exact(diffs: np.ndarray) -> np.ndarray:
+    """
+    Mean of diffs under every one of the 2^n sign vectors (n <= MAX_EXACT_PAIRS).
+    """
+    diffs = np.asarray(diffs, dtype=np.float64)
+    n = len(diffs)
+    if n > MAX_EXACT_PAIRS:
+        raise ValueError(f"Exact enumeration is limited to {MAX_EXACT_PAIRS} matches, got {n}")
+    flips = (np.arange(2 ** n)[:, None] >> np.arange(n)) & 1
+    return (diffs.sum() - 2.0 * (flips.astype(np.float64) @ diffs)) / n
+
+def pair_permutation_test(matched: Union[pd.DataFrame, MatchedSet], outcome_col: str, n_perm: int = 100_000,
+                          alternative: str = "two-sided", seed: Optional[int] = 0) -> Dict[str, Any]:
+    """
+    Within-match permutation test of the ATT: each match's difference (treated minus its
+    controls' mean) has its sign flipped at random. Exact for 1:1 pairs; with several
+    controls per match it tests symmetry of the differences about zero. Matches with a
+    missing outcome are dropped, as in the ATT.
+
+    Returns att, p_value, n_perm (permutations used), exact (all 2^n enumerated), null_se
+    (SD of the permutation distribution) and null (the permuted ATTs).
+    """
+    diffs = matched_differences(matched, outcome_col)
+    if len(diffs) == 0:
+        return {"att": np.nan, "p_value": np.nan, "n_perm": 0, "exact": False, "null_se": np.nan,
+                "null": np.zeros(0)}
+    att = float(diffs.mean())
+    exact = len(diffs) <= MAX_EXACT_PAIRS and 2 ** len(diffs) <= n_perm
+    if exact:
+        null = sign_flip_exact(diffs)
+        # The identity assignment is already among the 2^n
+        p_value = _p_value(null, att, alternative, count_observed=False)
+    else:
+        null = sign_flip_null(diffs, n_perm, seed)
+        p_value = _p_value(null, att, alternative)
+    return {"att": att, "p_value": float(p_value), "n_perm": len(null), "exact": exact,
+            "null_se": float(np.std(null, ddof=1)) if len(null) > 1 else np.nan, "null": null}
+
+def _rematch_chunk(X: np.ndarray, d: np.ndarray, y: np.ndarray, n_perm: int, seed: np.random.SeedSequence,
+                   config: Dict[str, Any]) -> np.ndarray:
+    """
+    ATT after permuting d, refitting the PS, trimming and rematching, for n_perm permutations.
+    Permutations are drawn and fitted a block at a time, so memory stays at (block, n).
+    """
+    rng = np.random.default_rng(seed)
+    # Under a permuted treatment only the intercept is far from 0
+    p = d.mean()
+    beta0 = np.zeros(X.shape[1])
+    beta0[0] = np.log(p / (1 - p))
+    stats = np.full(n_perm, np.nan)
+    for start in range(0, n_perm, BOOT_BLOCK):
+        block = rng.permuted(np.tile(d, (min(BOOT_BLOCK, n_perm - start), 1)), axis=1)
+        betas = fit_logit_batch(X, block, beta0=beta0)
+        for j, d_perm in enumerate(block):
+            if not np.isnan(betas[j]).any():
+                stats[start + j] = att_from_scores(logistic(X @ betas[j]), d_perm, y, Xc=X[:, 1:], **config)
+    return stats
+
+def rematch_permutation_test(df: pd.DataFrame, treatment_col: str, covariates: List[str], outcome_col: str,
+                             matcher: Optional[CausalMatcher] = None, n_perm: int = 1000,
+                             trim_threshold: float = 0.05, n_neighbors: int = 1, alternative: str = "two-sided",
+                             seed: Optional[int] = 0, n_jobs: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Global permutation test: treatment is permuted across df (the pre-PS analysis sample)
+    and the whole PS fit -> trim -> match -> ATT pipeline is rerun with matcher's settings
+    (default CausalMatcher()). A Mahalanobis matcher must match on covariates, the PS
+    covariates, as in bootstrap_att. n_jobs > 1 splits the permutations across a process pool,
+    each worker drawing its own from an independent seed.
+
+    Returns att, p_value, n_perm, n_valid (permutations that produced an ATT), null_se and null.
+    """
+    matcher = matcher or CausalMatcher()
+    if matcher.distance == "mahalanobis" and list(matcher.covariates) != list(covariates):
+        raise ValueError("Mahalanobis rematching matches on the PS covariates; pass the same covariates")
+    X = np.column_stack([np.ones(len(df)), df[covariates].to_numpy(dtype=np.float64)])
+    d = df[treatment_col].to_numpy(dtype=np.float64)
+    y = df[outcome_col].to_numpy(dtype=np.float64)
+    config = dict(caliper=matcher.caliper, n_neighbors=n_neighbors, method=matcher.method, replace=matcher.replace,
+                  trim_threshold=trim_threshold, distance=matcher.distance, radius=matcher.radius)
+    att = pipeline_att(X, d, y, **config)
+
+    n_workers = max(1, min(n_jobs or 1, n_perm))
+    sizes = [len(c) for c in np.array_split(np.arange(n_perm), n_workers)]
+    seeds = np.random.SeedSequence(seed).spawn(n_workers)
+    if n_workers > 1:
+        parts = map_in_processes(_rematch_chunk, [(X, d, y, s, q, config) for s, q in zip(sizes, seeds)], n_workers)
+        null = np.concatenate(parts)
+    else:
+        null = _rematch_chunk(X, d, y, n_perm, seeds[0], config)
+
+    valid = null[~np.isnan(null)]
+    return {"att": att, "p_value": float(_p_value(valid, att, alternative)) if len(valid) and np.isfinite(att) else np.nan,
+            "n_perm": n_perm, "n_valid": int(len(valid)),
+            "null_se": float(np.std(valid, ddof=1)) if len(valid) > 1 else np.nan, "null": null}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Permutation tests of the matched ATT.")
+    parser.add_argument("--n-perm", type=int, default=100_000, help="Within-pair sign-flip permutations.")
+    parser.add_argument("--rematch", type=int, default=0,
+                        help="Global permutations with PS refit and rematching (0 to skip).")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes for the rematching test.")
+    parser.add_argument("--caliper", type=float, default=0.25)
+    parser.add_argument("--trim", type=float, default=0.05)
+    parser.add_argument("--outcome", default="delta_violent_crime")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    from src.backend import to_pandas
+    from src.data.ingest import load_raw_data
+    from src.data.preprocess import COVARIATES, binarize_treatment, load_and_merge
+    from src.models.matching import fit_matcher
+    from src.models.psm import estimate_propensity_score, trim_common_support
+    df = to_pandas(binarize_treatment(load_and_merge(*load_raw_data())))
+    df_ps = trim_common_support(estimate_propensity_score(df.copy(), "treatment", COVARIATES), args.trim)
+    matcher = fit_matcher(df_ps, "treatment", "propensity_score", caliper=args.caliper)
+
+    start = time.perf_counter()
+    pairs = pair_permutation_test(matcher.matched_set, args.outcome, n_perm=args.n_perm, seed=args.seed)
+    print(f"Within-pair test: ATT {pairs['att']:.4f}, p = {pairs['p_value']:.5f} "
+          f"({pairs['n_perm']:,} {'exact ' if pairs['exact'] else ''}permutations, "
+          f"{time.perf_counter() - start:.3f}s)")
+    if args.rematch:
+        start = time.perf_counter()
+        glob = rematch_permutation_test(df, "treatment", COVARIATES, args.outcome, CausalMatcher(caliper=args.caliper),
+                                        n_perm=args.rematch, trim_threshold=args.trim, seed=args.seed,
+                                        n_jobs=args.n_jobs)
+        print(f"Global test with rematching: ATT {glob['att']:.4f}, p = {glob['p_value']:.5f} "
+              f"({glob['n_valid']:,}/{glob['n_perm']:,} permutations, {time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,102 @@
 import numpy as np
 import scipy.stats as stats
-import modin.pandas as pd
+import pandas as pd
+from typing import Any, Dict, Optional, Tuple, Union
+from src.models.matching import MatchedSet
 
-def calculate_rosenbaum_bounds(matched_df: pd.DataFrame, outcome_col: str, gamma: float = 1.0) -> float:
+def matched_differences(matched: Union[pd.DataFrame, MatchedSet], outcome_col: str) -> np.ndarray:
+    """
+    Per-match outcome differences (treated minus mean of its controls), NaNs dropped.
+    Accepts either a MatchedSet or a matched DataFrame with 'match_id'/'role' columns.
+    """
+    if isinstance(matched, MatchedSet):
+        diffs = matched.outcome_differences(outcome_col)
+        return diffs[~np.isnan(diffs)]
+
+    treated = matched[matched["role"] == "Treated"].set_index("match_id")[outcome_col]
+    control = matched[matched["role"] == "Control"].groupby("match_id")[outcome_col].mean()
+    return (treated - control).dropna().to_numpy(dtype=np.float64)
+
+def _signed_rank_terms(diffs: np.ndarray) -> Tuple[float, float, float]:
+    """
+    Observed Wilcoxon signed-rank statistic and the rank sums its null moments depend on.
+    Zero differences carry no sign and are dropped before ranking.
+    """
+    diffs = diffs[diffs != 0]
+    ranks = stats.rankdata(np.abs(diffs))
+    # Observed Signed Rank Statistic (sum of ranks where diff > 0)
+    T = ranks[diffs > 0].sum()
+    return T, ranks.sum(), np.square(ranks).sum()
+
+def rosenbaum_sensitivity(matched: Union[pd.DataFrame, MatchedSet], outcome_col: str,
+                          gammas: Optional[np.ndarray] = None, alpha: float = 0.10) -> Dict[str, Any]:
+    """
+    Rosenbaum bounds for the Wilcoxon signed-rank test over a grid of Gammas (odds of hidden bias).
+    Under bias Gamma each pair is positive with probability at most p+ = Gamma / (1 + Gamma), so
+    E[T] = p+ * sum(r) and Var[T] = p+ (1 - p+) * sum(r^2) bound the statistic from above
+    (p- = 1 / (1 + Gamma) from below). Ranks are computed once and every Gamma is one array op.
+
+    Returns a dict with the curve ('gamma', 'p_upper', 'p_lower') and 'critical_gamma', the
+    Gamma at which the upper-bound p-value first exceeds alpha (1.0 if not significant at all).
+    """
+    if gammas is None:
+        gammas = np.linspace(1.0, 5.0, 401)
+    gammas = np.atleast_1d(np.asarray(gammas, dtype=np.float64))
+    if np.any(gammas < 1):
+        raise ValueError("Expected gammas >= 1")
+
+    T, s1, s2 = _signed_rank_terms(matched_differences(matched, outcome_col))
+
+    def bound(p):
+        # Large-sample normal approximation for T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (T - p * s1) / np.sqrt(p * (1 - p) * s2)
+        return stats.norm.sf(z)
+
+    p_plus = gammas / (1 + gammas)
+    p_upper = bound(p_plus)
+    p_lower = bound(1 - p_plus)
+
+    return {
+        "gamma": gammas,
+        "p_upper": p_upper,
+        "p_lower": p_lower,
+        "critical_gamma": float(_critical_gamma(T, s1, s2, alpha)),
+    }
+
+def _critical_gamma(T: float, s1: float, s2: float, alpha: float) -> float:
+    """
+    Solves p_upper(Gamma) = alpha in closed form.
+    (T - p s1) = z sqrt(p (1 - p) s2) squares to a quadratic in p; the smaller root is the
+    crossing on [1/2, T/s1], where the bound is monotone in p.
+    """
+    if s1 == 0:
+        return np.nan
+    z = stats.norm.isf(alpha)
+    if (T - 0.5 * s1) / np.sqrt(0.25 * s2) <= z:
+        return 1.0  # not significant even without hidden bias
+    a = s1 ** 2 + z ** 2 * s2
+    b = 2 * T * s1 + z ** 2 * s2
+    c = T ** 2
+    p = (b - np.sqrt(b ** 2 - 4 * a * c)) / (2 * a)
+    return np.inf if p >= 1 else p / (1 - p)
+
+def calculate_rosenbaum_bounds(matched_df: Union[pd.DataFrame, MatchedSet], outcome_col: str, gamma: float = 1.0) -> float:
     """
     Calculates the upper bound of the p-value for the Wilcoxon Signed-Rank Test
     at a given Gamma (odds of hidden bias).
-    
-    This is a simplified implementation for the signed rank statistic.
     """
-    treated = matched_df[matched_df["role"] == "Treated"].set_index("match_id")[outcome_col]
-    control = matched_df[matched_df["role"] == "Control"].groupby("match_id")[outcome_col].mean()
-    
-    diffs = (treated - control).dropna()
-    abs_diffs = diffs.abs()
-    ranks = abs_diffs.rank()
-    
-    # Observed Signed Rank Statistic (sum of ranks where diff > 0)
-    W = ranks[diffs > 0].sum()
-    N = len(diffs)
-    
-    # Expectations and Variances under Gamma
-    # For Gamma = 1 (Randomization), p = 0.5
-    # For Gamma > 1, p varies between 1/(1+Gamma) and Gamma/(1+Gamma)
-    
-    p_plus = gamma / (1 + gamma)
-    p_minus = 1 / (1 + gamma)
-    
-    # Worst case expectation (High statistic)
-    E_W = (p_plus * N * (N + 1)) / 2 # simplified, actually needs sum of ranks
-    # Variance
-    Var_W = (N * (N + 1) * (2 * N + 1)) / 24 # Standard Wilcoxon var, scaling needed for Gamma
-    
-    # Accurate Rosenbaum deviation requires iterating combinations or normal approx
-    # Using Large Sample Approximation for W
-    
-    # Validating Rust Integration - Removed for Pure Python Architecture
-    # Using Large Sample Approximation for W
-    z_score = (W - E_W) / np.sqrt(Var_W)
-    p_val = 1 - stats.norm.cdf(z_score)
-    return p_val
+    return float(rosenbaum_sensitivity(matched_df, outcome_col, gammas=[gamma])["p_upper"][0])
 
-def run_placebo_test(matched_df: pd.DataFrame, placebo_outcome: str) -> float:
+def run_placebo_test(matched_df: Union[pd.DataFrame, MatchedSet], placebo_outcome: str) -> float:
     """
     Runs the ATT calculation on a Placebo outcome (e.g. Past Crime).
     Expectation: Result should be insignificant (near 0).
     """
+    if isinstance(matched_df, MatchedSet):
+        y = matched_df.data[placebo_outcome].to_numpy(dtype=np.float64)
+        return np.nanmean(y[matched_df.treated_pos]) - np.nanmean(y[matched_df.control_pos])
+
     treated = matched_df[matched_df["role"] == "Treated"]
     control = matched_df[matched_df["role"] == "Control"]
     
@@ -0,0 +1,284 @@
+"""
+Headless analysis API.
+
+An AnalysisSession holds the ingested frames and the merged panel in memory, and
+run(params) returns an AnalysisResult: plain data (numbers, dicts, arrays), no
+printing. Rendering is a separate step (src.report). The HTTP server in src.server
+keeps one session alive and answers repeated requests against it.
+
+    session = AnalysisSession.from_raw()
+    result = session.run(AnalysisParams(caliper=0.1, n_boot=0))
+    print(result.att.estimate)
+"""
+import dataclasses
+import sys
+import time
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from src.backend import to_backend
+from src.data.preprocess import COVARIATES, binarize_treatment, load_and_merge
+from src.models.psm import estimate_propensity_score, trim_common_support
+from src.models.matching import CausalMatcher, fit_matcher
+from src.data.functional import StageCache, cached_pipe, splat, stage
+from src.profiling import get_profiler
+from src.analysis.sensitivity import rosenbaum_sensitivity, run_placebo_test
+from src.analysis.randomization import pair_permutation_test
+
+# Gamma grid of the Rosenbaum sweep (steps of 0.004 up to 5)
+DEFAULT_GAMMAS = tuple(np.round(np.arange(1.0, 5.002, 0.004), 3))
+
+@dataclass
+class AnalysisParams:
+    """
+    Knobs of one analysis run. outcome=None picks the DiD change in violent crime when
+    the panel has it, else the cross-sectional rate. distance="mahalanobis" matches on
+    the covariates instead of the PS logit; caliper then stays a PS-logit caliper (None
+    drops it) and radius caps the Mahalanobis distance. regression_cov is the covariance
+    of the bias-adjusted regression: "nonrobust", "HC1", or "cluster" on
+    regression_cluster ("match_id" or "state"). n_perm within-pair sign flips give the
+    randomization p-value (0 skips it).
+    """
+    low_q: float = 0.25
+    high_q: float = 0.75
+    covariates: List[str] = field(default_factory=lambda: list(COVARIATES))
+    trim: float = 0.05
+    caliper: Optional[float] = 0.25
+    distance: str = "ps"
+    radius: Optional[float] = None
+    outcome: Optional[str] = None
+    n_boot: int = 2000
+    boot_jobs: Optional[int] = None
+    gammas: Tuple[float, ...] = DEFAULT_GAMMAS
+    sensitivity_alpha: float = 0.10
+    regression_cov: str = "nonrobust"
+    regression_cluster: Optional[str] = None
+    n_perm: int = 100_000
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "AnalysisParams":
+        """
+        Builds params from a (JSON) dict; unknown keys raise ValueError.
+        """
+        names = {f.name for f in dataclasses.fields(cls)}
+        unknown = sorted(set(values) - names)
+        if unknown:
+            raise ValueError(f"Unknown analysis parameters: {unknown}")
+        if "gammas" in values:
+            values = dict(values, gammas=tuple(float(g) for g in values["gammas"]))
+        return cls(**values)
+
+@dataclass
+class SampleSummary:
+    fisc_cities: int
+    acs_locations: int
+    n_analyzed: int
+    using_did: bool
+    outcome: str
+    covariates: List[str]
+    n_treated: int
+    n_control: int
+    n_matched: int
+
+@dataclass
+class ATTResult:
+    estimate: float
+    se: float
+    ci_low: float
+    ci_high: float
+    bootstrap: Optional[Dict[str, Any]] = None
+
+@dataclass
+class RegressionResult:
+    """
+    Bias-adjusted OLS of the outcome on treatment and covariates in the matched sample.
+    Coefficient tables are dicts keyed by term.
+    """
+    formula: str
+    nobs: int
+    params: Dict[str, float]
+    bse: Dict[str, float]
+    tvalues: Dict[str, float]
+    pvalues: Dict[str, float]
+    ci_low: Dict[str, float]
+    ci_high: Dict[str, float]
+    cov_type: str = "nonrobust"
+
+@dataclass
+class PlaceboResult:
+    outcome: str
+    estimate: Optional[float]
+
+@dataclass
+class RandomizationResult:
+    """
+    Within-pair permutation test of the ATT (src.analysis.randomization).
+    """
+    p_value: float
+    n_perm: int
+    exact: bool
+    null_se: float
+
+@dataclass
+class SensitivityResult:
+    gamma: np.ndarray
+    p_upper: np.ndarray
+    p_lower: np.ndarray
+    critical_gamma: float
+    alpha: float
+
+    def p_upper_at(self, gamma: float) -> float:
+        return float(self.p_upper[np.argmin(np.abs(self.gamma - gamma))])
+
+    def p_lower_at(self, gamma: float) -> float:
+        return float(self.p_lower[np.argmin(np.abs(self.gamma - gamma))])
+
+@dataclass
+class AnalysisResult:
+    """
+    Everything one run produces. att/regression/placebo/sensitivity/randomization are
+    None when nothing could be matched (randomization also when n_perm is 0).
+    """
+    params: AnalysisParams
+    sample: SampleSummary
+    att: Optional[ATTResult] = None
+    regression: Optional[RegressionResult] = None
+    placebo: Optional[PlaceboResult] = None
+    sensitivity: Optional[SensitivityResult] = None
+    randomization: Optional[RandomizationResult] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-ready dict: arrays become lists, numpy scalars become floats, NaN becomes None.
+        """
+        return jsonable(dataclasses.asdict(self))
+
+def jsonable(value: Any) -> Any:
+    """
+    value with nested arrays, numpy scalars and non-finite floats made JSON-ready (see to_dict).
+    """
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, (np.integer, np.bool_)):
+        return value.item()
+    if isinstance(value, (float, np.floating)):
+        return None if not np.isfinite(value) else float(value)
+    return value
+
+class AnalysisSession:
+    """
+    Ingested frames plus the merged panel, kept resident across runs.
+    The merge runs once; binarized samples are kept per treatment cutoff. With a
+    StageCache, PS fit, trim, match and bootstrap outputs are also reused across
+    sessions (see src.data.functional.cached_pipe).
+    """
+    def __init__(self, fisc: pd.DataFrame, cius: pd.DataFrame, acs: pd.DataFrame,
+                 cache: Optional[StageCache] = None):
+        self.fisc, self.cius, self.acs = fisc, cius, acs
+        self.cache = cache
+        self.merged = cached_pipe((fisc, cius, acs), stage(splat(load_and_merge), name="merge"), cache=cache)
+        self._binarized: Dict[Tuple[float, float], pd.DataFrame] = {}
+
+    @classmethod
+    def from_raw(cls, cache: Optional[StageCache] = None, **ingest_options) -> "AnalysisSession":
+        """
+        Loads the raw inputs (options as for load_raw_data) and converts them to the active backend.
+        """
+        from src.data.ingest import load_raw_data
+        with get_profiler().stage("ingest") as rec:
+            frames = load_raw_data(**ingest_options)
+            rec.output(frames)
+        return cls(*[to_backend(f) for f in frames], cache=cache)
+
+    def binarized(self, low_q: float, high_q: float) -> pd.DataFrame:
+        key = (low_q, high_q)
+        if key not in self._binarized:
+            # binarize_treatment adds its column to its input: keep the resident panel untouched
+            self._binarized[key] = cached_pipe(self.merged.copy(deep=False),
+                                               stage(binarize_treatment, name="binarize", low_q=low_q, high_q=high_q),
+                                               cache=self.cache)
+        return self._binarized[key]
+
+    def run(self, params: Optional[AnalysisParams] = None) -> AnalysisResult:
+        """
+        Binarize -> PS fit -> trim -> match -> ATT (Abadie-Imbens SE, optional bootstrap)
+        -> bias-adjusted regression -> placebo and Rosenbaum sensitivity.
+        """
+        params = params or AnalysisParams()
+        profiler = get_profiler()
+        start = time.perf_counter()
+        timings = {}
+
+        df = self.binarized(params.low_q, params.high_q)
+        using_did = "delta_violent_crime" in df.columns
+        outcome = params.outcome or ("delta_violent_crime" if using_did else "violent_crime_rate")
+        covariates = list(params.covariates)
+
+        # Matching options beyond the PS defaults (left out otherwise, keeping PS stage keys stable)
+        options = {} if params.distance == "ps" else dict(distance=params.distance, covariates=covariates,
+                                                            radius=params.radius)
+
+        # PS fit -> common-support trim -> matching; the PS stage adds a column, so it gets
+        # a shallow copy (new columns never touch the shared data)
+        matcher = cached_pipe(df.copy(deep=False),
+                              stage(estimate_propensity_score, name="ps_fit", treatment="treatment", covariates=covariates),
+                              stage(trim_common_support, name="trim", threshold=params.trim),
+                              stage(fit_matcher, name="match", treatment_col="treatment", ps_col="propensity_score",
+                                    caliper=params.caliper, **options),
+                              cache=self.cache)
+        matched = matcher.matched_set
+        n_treated = int((matched.data["treatment"] == 1).sum())
+        sample = SampleSummary(
+            fisc_cities=len(self.fisc), acs_locations=len(self.acs), n_analyzed=len(df), using_did=using_did,
+            outcome=outcome, covariates=covariates, n_treated=n_treated,
+            n_control=len(matched.data) - n_treated, n_matched=len(matched))
+        result = AnalysisResult(params=params, sample=sample, timings=timings)
+        timings["match_s"] = time.perf_counter() - start
+        if matched.empty:
+            return result
+
+        with profiler.stage("att", matched):
+            att = matcher.calculate_att(outcome)
+            ai = matcher.abadie_imbens_se(outcome)
+        result.att = ATTResult(estimate=att, se=ai["se"], ci_low=ai["ci_low"], ci_high=ai["ci_high"])
+        timings["first_result_s"] = time.perf_counter() - start
+
+        if params.n_boot > 0:
+            boot = cached_pipe(df, stage(CausalMatcher(caliper=params.caliper, **options).bootstrap_att, name="bootstrap",
+                                         treatment_col="treatment", covariates=covariates, outcome_col=outcome,
+                                         n_boot=params.n_boot, trim_threshold=params.trim, n_jobs=params.boot_jobs),
+                               cache=self.cache)
+            result.att.bootstrap = {k: boot[k] for k in ("se", "ci_low", "ci_high", "n_valid")}
+
+        formula = f"{outcome} ~ treatment + " + " + ".join(covariates)
+        with profiler.stage("regression", matched) as rec:
+            model = matcher.bias_adjustment(formula, outcome, cov_type=params.regression_cov,
+                                            cluster=params.regression_cluster)
+            rec.output(matcher.design_matrix(["treatment"] + covariates).X)
+        conf = model.conf_int()
+        cov_type = params.regression_cov + (f" ({params.regression_cluster})" if params.regression_cov == "cluster" else "")
+        result.regression = RegressionResult(
+            formula=formula, nobs=int(model.nobs), params=model.params.to_dict(), bse=model.bse.to_dict(),
+            tvalues=model.tvalues.to_dict(), pvalues=model.pvalues.to_dict(),
+            ci_low=conf[0].to_dict(), ci_high=conf[1].to_dict(), cov_type=cov_type)
+
+        # Placebo: change in property crime under DiD, else its level
+        placebo_col = "delta_property_crime" if using_did else "property_crime_rate"
+        with profiler.stage("sensitivity", matched):
+            placebo = run_placebo_test(matched, placebo_col) if placebo_col in matched.data.columns else None
+            sens = rosenbaum_sensitivity(matched, outcome, gammas=np.asarray(params.gammas),
+                                         alpha=params.sensitivity_alpha)
+            perm = pair_permutation_test(matched, outcome, n_perm=params.n_perm) if params.n_perm > 0 else None
+        result.placebo = PlaceboResult(outcome=placebo_col, estimate=None if placebo is None else float(placebo))
+        result.sensitivity = SensitivityResult(gamma=sens["gamma"], p_upper=sens["p_upper"], p_lower=sens["p_lower"],
+                                               critical_gamma=sens["critical_gamma"], alpha=params.sensitivity_alpha)
+        if perm is not None:
+            result.randomization = RandomizationResult(p_value=perm["p_value"], n_perm=perm["n_perm"],
+                                                       exact=perm["exact"], null_se=perm["null_se"])
+        timings["total_s"] = time.perf_counter() - start
+        print(f"Analysis run in {timings['total_s']:.3f}s", file=sys.stderr)
+        return result
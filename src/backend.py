@@ -0,0 +1,82 @@
+import sys
+import time
+import pandas as pd
+from typing import Any, Optional
+
+# DataFrame backend for the analysis stages.
+# Ingest always produces plain pandas frames; main converts them once with to_backend().
+# Modin (and Ray behind it) is imported and started only when that backend is chosen.
+
+BACKENDS = ("pandas", "modin", "auto")
+# "auto" switches to Modin at this many input rows; below it cluster startup dominates
+AUTO_MODIN_ROWS = 5_000_000
+
+_active = "pandas"
+_startup_seconds = 0.0
+
+def resolve_backend(name: str, n_rows: Optional[int] = None) -> str:
+    """
+    Maps a backend setting to "pandas" or "modin"; "auto" decides by input row count.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown dataframe backend: {name}")
+    if name == "auto":
+        return "modin" if n_rows is not None and n_rows >= AUTO_MODIN_ROWS else "pandas"
+    return name
+
+def _start_modin():
+    """
+    Imports modin.pandas and brings up Ray if Modin is configured to run on it.
+    """
+    import modin.config
+    import modin.pandas as mpd
+    if modin.config.Engine.get() == "Ray":
+        import ray
+        if not ray.is_initialized():
+            print("Initializing Ray for Modin...", file=sys.stderr)
+            ray.init(ignore_reinit_error=True)
+    return mpd
+
+def set_backend(name: str = "auto", n_rows: Optional[int] = None) -> str:
+    """
+    Selects the active backend, starting Modin/Ray if needed. Returns the resolved name.
+    """
+    global _active, _startup_seconds
+    _active = resolve_backend(name, n_rows)
+    start = time.perf_counter()
+    if _active == "modin":
+        _start_modin()
+    _startup_seconds = time.perf_counter() - start
+    return _active
+
+def get_backend() -> str:
+    return _active
+
+def startup_seconds() -> float:
+    """
+    Time spent starting the active backend (imports and cluster startup).
+    """
+    return _startup_seconds
+
+def dataframe_module() -> Any:
+    """
+    The pandas-compatible module of the active backend, for constructing new frames.
+    """
+    return _start_modin() if _active == "modin" else pd
+
+def to_backend(df: pd.DataFrame) -> Any:
+    """
+    Converts a pandas frame to the active backend (no-op for pandas).
+    """
+    if _active == "modin":
+        return _start_modin().DataFrame(df)
+    return df
+
+def to_pandas(df: Any) -> pd.DataFrame:
+    """
+    Converts a frame of either backend to plain pandas.
+    """
+    if isinstance(df, pd.DataFrame):
+        return df
+    from modin.utils import to_pandas as modin_to_pandas
+    return modin_to_pandas(df)
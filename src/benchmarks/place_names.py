@@ -0,0 +1,57 @@
+"""
+Benchmark: per-row place-name parsing vs the vectorized, memoized path in src.data.ingest.
+The per-row baseline and the equivalence checks live in tests/test_place_names.py.
+
+Run from the repository root with:
+    python -m src.benchmarks.place_names --rows 50000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from src.data import ingest
+from src.data.ingest import parse_acs_places, us_state_abbrev
+from tests.test_place_names import parse_acs_places_legacy
+
+SUFFIXES = [" city", " town", " village", " CDP", ""]
+
+def make_acs_places(n_rows: int, n_distinct: int, seed: int = 0) -> pd.Series:
+    """
+    Builds ACS-style labels ("Frazee city, Minnesota") with n_distinct distinct places.
+    """
+    rng = np.random.default_rng(seed)
+    states = list(us_state_abbrev)
+    stems = [f"Place{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{chr(65 + (i // 676) % 26)}"
+             for i in range(n_distinct)]
+    distinct = [f"{stem}{SUFFIXES[i % len(SUFFIXES)]}, {states[i % len(states)]}" for i, stem in enumerate(stems)]
+    return pd.Series(np.array(distinct, dtype=object)[rng.integers(0, n_distinct, n_rows)])
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Place-name parsing benchmark.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--distinct", type=int, default=30000)
+    args = parser.parse_args(argv)
+
+    places = make_acs_places(args.rows, args.distinct)
+
+    legacy, t_legacy = _time(parse_acs_places_legacy, places)
+
+    ingest._CITY_NAME_TABLE.clear()
+    vectorized, t_cold = _time(parse_acs_places, places)
+    # Second call hits the canonicalization table for every name
+    _, t_warm = _time(parse_acs_places, places)
+
+    pd.testing.assert_frame_equal(legacy, vectorized)
+
+    print(f"rows={args.rows} distinct={args.distinct}")
+    print(f"legacy apply:       {t_legacy:8.3f}s")
+    print(f"vectorized (cold):  {t_cold:8.3f}s  ({t_legacy / t_cold:6.1f}x)")
+    print(f"vectorized (warm):  {t_warm:8.3f}s  ({t_legacy / t_warm:6.1f}x)")
+
+if __name__ == "__main__":
+    main()
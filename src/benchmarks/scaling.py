@@ -0,0 +1,148 @@
+"""
+Benchmark: pipeline subsystems across synthetic data scales, with a planted-ATT check.
+
+For each scale, synthetic inputs are generated once under data/synthetic/n<units>
+(see src.data.synthetic) and each subsystem is timed on them. The matched ATT on the
+change in violent crime must recover the planted effect within --att-tol
+Abadie-Imbens standard errors. A run can be saved as the baseline; later runs fail
+if a subsystem slows down by more than --slowdown over it.
+
+Run with:
+    python -m src.benchmarks.scaling --scales 1000 10000 100000 --save-baseline
+    python -m src.benchmarks.scaling --scales 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Tuple
+from src.data.ingest import load_raw_data
+from src.data.preprocess import COVARIATES, binarize_treatment, load_and_merge
+from src.data.synthetic import PLANTED_ATT, write_synthetic
+from src.models.psm import estimate_propensity_score, trim_common_support
+from src.models.matching import CausalMatcher
+from src.analysis.sensitivity import calculate_rosenbaum_bounds
+
+SYNTHETIC_DIR = "data/synthetic"
+BASELINE_PATH = "outputs/benchmarks/scaling_baseline.json"
+OUTCOME = "delta_violent_crime"
+# Slowdowns smaller than this many seconds are treated as timer noise
+MIN_REGRESSION_SECONDS = 0.05
+
+def _best_of(repeat: int, func: Callable[..., Any], *args) -> Tuple[Any, float]:
+    best, result = np.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def synthetic_inputs(n_units: int, seed: int = 0, att: float = PLANTED_ATT) -> str:
+    """
+    Directory with synthetic inputs for n_units, generated on first use.
+    """
+    out_dir = os.path.join(SYNTHETIC_DIR, f"n{n_units}")
+    meta_path = os.path.join(out_dir, "synthetic.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        if meta["seed"] == seed and meta["att"] == att:
+            return out_dir
+    write_synthetic(out_dir, n_units, seed, att)
+    return out_dir
+
+def run_scale(n_units: int, repeat: int = 1, seed: int = 0, att: float = PLANTED_ATT,
+              caliper: float = 0.25) -> Dict[str, Any]:
+    """
+    Times every subsystem at one scale. Returns {'timings': {subsystem: seconds}, 'att': {...}}.
+    """
+    raw_dir = synthetic_inputs(n_units, seed, att)
+    timings = {}
+
+    (fisc, cius, acs), timings["load_raw_data"] = _best_of(
+        repeat, lambda: load_raw_data(use_cache=False, raw_dir=raw_dir))
+    merged, timings["load_and_merge"] = _best_of(repeat, load_and_merge, fisc, cius, acs)
+    df, timings["binarize_treatment"] = _best_of(repeat, lambda: binarize_treatment(merged.copy()))
+    df_ps, timings["estimate_propensity_score"] = _best_of(
+        repeat, lambda: estimate_propensity_score(df.copy(), "treatment", COVARIATES))
+    df_trimmed = trim_common_support(df_ps)
+
+    def match():
+        matcher = CausalMatcher(caliper=caliper)
+        matcher.match_nearest_neighbor(df_trimmed, "treatment", "propensity_score")
+        return matcher
+    matcher, timings["match_nearest_neighbor"] = _best_of(repeat, match)
+    estimate, timings["calculate_att"] = _best_of(repeat, matcher.calculate_att, OUTCOME)
+    _, timings["calculate_rosenbaum_bounds"] = _best_of(
+        repeat, calculate_rosenbaum_bounds, matcher.matched_set, OUTCOME, 1.5)
+
+    se = matcher.abadie_imbens_se(OUTCOME)["se"]
+    return {
+        "timings": timings,
+        "rows": {"merged": len(merged), "analysis": len(df), "matched": len(matcher.matched_set)},
+        "att": {"planted": att, "estimate": estimate, "se": se},
+    }
+
+def check_att(result: Dict[str, Any], tol: float) -> bool:
+    att = result["att"]
+    return bool(np.isfinite(att["estimate"]) and abs(att["estimate"] - att["planted"]) <= tol * att["se"])
+
+def find_regressions(results: Dict[str, Any], baseline: Dict[str, Any], slowdown: float) -> List[str]:
+    """
+    Subsystems slower than baseline by more than the slowdown factor (and MIN_REGRESSION_SECONDS).
+    """
+    found = []
+    for scale, result in results.items():
+        base = baseline.get(scale, {}).get("timings", {})
+        for name, seconds in result["timings"].items():
+            if name in base and seconds > base[name] * slowdown and seconds - base[name] > MIN_REGRESSION_SECONDS:
+                found.append(f"n={scale} {name}: {seconds:.3f}s vs baseline {base[name]:.3f}s")
+    return found
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark on synthetic inputs.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=1, help="Timing repeats per subsystem (best is kept).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--att", type=float, default=PLANTED_ATT, help="Planted treatment effect.")
+    parser.add_argument("--att-tol", type=float, default=3.0,
+                        help="Allowed |estimate - planted| in Abadie-Imbens standard errors.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline.")
+    parser.add_argument("--slowdown", type=float, default=1.5, help="Regression threshold over the baseline.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    failures = []
+    for n_units in args.scales:
+        print(f"Benchmarking n={n_units}...", file=sys.stderr)
+        result = run_scale(n_units, args.repeat, args.seed, args.att)
+        results[str(n_units)] = result
+        att = result["att"]
+        ok = check_att(result, args.att_tol)
+        if not ok:
+            failures.append(f"n={n_units} ATT {att['estimate']:.2f} (se {att['se']:.2f}) misses planted {att['planted']:.2f}")
+
+        print(f"\nn={n_units}  rows={result['rows']}")
+        for name, seconds in result["timings"].items():
+            print(f"  {name:28s} {seconds:9.3f}s")
+        print(f"  ATT {att['estimate']:.2f} (se {att['se']:.2f}), planted {att['planted']:.2f}: {'ok' if ok else 'FAIL'}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            failures += find_regressions(results, json.load(fh), args.slowdown)
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll checks passed.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sys
+import glob
+import pandas as pd
+import pyarrow.feather as feather
+from typing import Callable, Dict, List, Optional, Any
+
+# Bump when the normalized frame layout changes so stale artifacts are ignored
+CACHE_VERSION = 2
+CACHE_DIR = "data/cache"
+
+def file_fingerprint(path: str) -> Dict[str, Any]:
+    """
+    Identifies a source file by path, size, mtime and SHA-256 of its contents.
+    """
+    stat = os.stat(path)
+    with open(path, "rb") as fh:
+        digest = hashlib.file_digest(fh, "sha256").hexdigest()
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest,
+    }
+
+def cache_key(name: str, sources: List[str], params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Builds the cache key for a frame from its source fingerprints and loader parameters.
+    """
+    payload = {
+        "name": name,
+        "version": CACHE_VERSION,
+        "sources": [file_fingerprint(p) for p in sources],
+        "params": params or {},
+    }
+    blob = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+def _artifact_path(cache_dir: str, name: str, key: str) -> str:
+    return os.path.join(cache_dir, f"{name}-{key[:16]}.arrow")
+
+def read_frame(path: str) -> pd.DataFrame:
+    """
+    Reads an Arrow IPC artifact, memory-mapping the file instead of buffering it.
+    """
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+def atomic_write(path: str, write: Callable[[str], None]) -> None:
+    """
+    Calls write(tmp_path) on a temp file next to path, then renames it over path, so an
+    interrupted run never leaves a torn file behind. Creates the directory if needed.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_frame(df: pd.DataFrame, path: str) -> None:
+    """
+    Writes an uncompressed Arrow IPC artifact (uncompressed keeps it mmap-able).
+    """
+    atomic_write(path, lambda tmp_path: feather.write_feather(df.reset_index(drop=True), tmp_path,
+                                                              compression="uncompressed"))
+
+def invalidate_cache(name: Optional[str] = None, cache_dir: str = CACHE_DIR) -> int:
+    """
+    Deletes cached artifacts for one frame (or all frames if name is None).
+    Returns the number of files removed.
+    """
+    pattern = f"{name}-*.arrow" if name else "*.arrow"
+    removed = 0
+    for path in glob.glob(os.path.join(cache_dir, pattern)):
+        os.remove(path)
+        removed += 1
+    return removed
+
+def load_cached(name: str, sources: List[str], params: Optional[Dict[str, Any]] = None,
+                cache_dir: str = CACHE_DIR) -> Optional[pd.DataFrame]:
+    """
+    Returns the cached frame for these sources/params, or None on a cache miss.
+    """
+    path = _artifact_path(cache_dir, name, cache_key(name, sources, params))
+    if not os.path.exists(path):
+        return None
+    print(f"Loading {name} from cache...", file=sys.stderr)
+    return read_frame(path)
+
+def store_cached(name: str, sources: List[str], df: pd.DataFrame, params: Optional[Dict[str, Any]] = None,
+                 cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Writes df as the cached frame for these sources/params and returns it as read back from disk,
+    so fresh and cached runs hand identical frames downstream.
+    """
+    path = _artifact_path(cache_dir, name, cache_key(name, sources, params))
+    # Only one artifact per frame is kept; older keys are stale by construction
+    invalidate_cache(name, cache_dir)
+    write_frame(df, path)
+    return read_frame(path)
+
+def cached_frame(name: str, sources: List[str], loader: Callable[..., pd.DataFrame], *args,
+                 params: Optional[Dict[str, Any]] = None, use_cache: bool = True,
+                 rebuild: bool = False, cache_dir: str = CACHE_DIR, **kwargs) -> pd.DataFrame:
+    """
+    Returns loader(*args, **kwargs), served from the on-disk cache when the sources are unchanged.
+    rebuild=True forces a fresh parse and overwrites the cached artifact.
+    """
+    if not use_cache:
+        return loader(*args, **kwargs)
+
+    if not rebuild:
+        cached = load_cached(name, sources, params, cache_dir)
+        if cached is not None:
+            return cached
+
+    return store_cached(name, sources, loader(*args, **kwargs), params, cache_dir)
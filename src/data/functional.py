@@ -1,5 +1,14 @@
-from typing import  Callable, Any, Iterable, TypeVar
-from functools import reduce, partial
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+from typing import  Callable, Any, Dict, Iterable, List, NamedTuple, Optional, TypeVar
+from functools import lru_cache, partial, reduce, wraps
+from src.data.cache import atomic_write
+from src.profiling import get_profiler
 
 T = TypeVar("T")
 U = TypeVar("U")
@@ -30,3 +39,211 @@ def filter_c(predicate: Callable[[T], bool]) -> Callable[[Iterable[T]], Iterable
     Curried filter function.
     """
     return lambda iterable: filter(predicate, iterable)
+
+# --- Cached pipeline -------------------------------------------------------
+# A stage is a function plus keyword parameters: stage(f, a=1) runs f(x, a=1).
+# Stage outputs are stored on disk under a content-addressed key chained from
+# the pipeline input:  key_i = H(key_{i-1}, identity(f_i), params_i).
+# key_0 fingerprints the input data, so a stage re-runs only when its function,
+# its parameters, or anything upstream of it changed.
+
+STAGE_CACHE_DIR = "data/cache/stages"
+STAGE_CACHE_BYTES = 1 << 30
+
+class Stage(NamedTuple):
+    func: Callable[..., Any]
+    params: Dict[str, Any]
+    name: str
+
+def stage(func: Callable[..., Any], name: Optional[str] = None, **params) -> Stage:
+    """
+    Declares a pipeline stage running func(value, **params).
+    """
+    return Stage(func, params, name or getattr(func, "__name__", repr(func)))
+
+def _hash_update(h, value: Any) -> None:
+    if type(value).__module__.startswith("modin"):
+        from src.backend import to_pandas
+        value = to_pandas(value)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(type(value).__name__.encode())
+        h.update(repr(value.dtypes.to_dict() if isinstance(value, pd.DataFrame) else value.dtype).encode())
+        h.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(f"ndarray{value.dtype}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _hash_update(h, item)
+    elif isinstance(value, dict):
+        h.update(f"dict{len(value)}".encode())
+        for k in sorted(value, key=repr):
+            _hash_update(h, k)
+            _hash_update(h, value[k])
+    elif value is None or isinstance(value, (bool, int, float, str, bytes)):
+        h.update(repr(value).encode())
+    else:
+        h.update(pickle.dumps(value))
+
+def fingerprint(value: Any) -> str:
+    """
+    Content hash of a value: frames and arrays by their data, containers recursively.
+    """
+    h = hashlib.sha256()
+    _hash_update(h, value)
+    return h.hexdigest()
+
+def splat(func: Callable[..., U]) -> Callable[[Iterable[Any]], U]:
+    """
+    Adapts a function of several arguments to take them as one tuple, for use as a stage.
+    """
+    @wraps(func)
+    def splatted(args):
+        return func(*args)
+    return splatted
+
+def _project_modules(module: Any, seen: Dict[str, Any]) -> None:
+    """
+    Collects module and every src.* module its globals refer to, transitively.
+    """
+    if module is None or module.__name__ in seen:
+        return
+    seen[module.__name__] = module
+    for obj in vars(module).values():
+        ref = obj if inspect.ismodule(obj) else inspect.getmodule(obj) if callable(obj) else None
+        if ref is not None and ref.__name__.startswith("src."):
+            _project_modules(ref, seen)
+
+@lru_cache(maxsize=None)
+def _module_digest(name: str) -> str:
+    try:
+        source = inspect.getsource(sys.modules[name])
+    except (TypeError, OSError):
+        source = ""
+    return hashlib.sha256(source.encode()).hexdigest()
+
+def function_identity(func: Callable[..., Any]) -> str:
+    """
+    Identifies a stage function by qualified name and the source of its module plus every
+    project module reachable from it, so editing the function or its callees invalidates it.
+    Bound methods also include the state of their instance.
+    """
+    if isinstance(func, partial):
+        return f"partial({function_identity(func.func)},{fingerprint((func.args, func.keywords))})"
+    if inspect.ismethod(func):
+        return f"{function_identity(func.__func__)}@{fingerprint(vars(func.__self__))}"
+    func = inspect.unwrap(func)
+    name = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}"
+    modules: Dict[str, Any] = {}
+    _project_modules(inspect.getmodule(func), modules)
+    return name + ":" + ",".join(_module_digest(m) for m in sorted(modules))
+
+class StageCache:
+    """
+    Pickled stage outputs in a directory, evicted least-recently-used beyond max_bytes.
+    Recency is the file mtime, refreshed on every hit.
+    """
+    def __init__(self, cache_dir: str = STAGE_CACHE_DIR, max_bytes: int = STAGE_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Any:
+        path = self._path(key)
+        with open(path, "rb") as fh:
+            value = pickle.load(fh)
+        os.utime(path)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        def dump(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as fh:
+                pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+        atomic_write(self._path(key), dump)
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Deletes the least recently used entries until the directory fits in max_bytes.
+        Returns the number of entries removed.
+        """
+        entries = [(e.stat().st_mtime_ns, e.stat().st_size, e.path)
+                   for e in os.scandir(self.cache_dir) if e.name.endswith(".pkl")]
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        paths = [e.path for e in os.scandir(self.cache_dir) if e.name.endswith(".pkl")]
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+def stage_keys(value: Any, *stages: Stage) -> List[str]:
+    """
+    Chained cache keys of each stage's output for this input.
+    """
+    from src.backend import get_backend
+    keys = []
+    key = fingerprint(value)
+    for s in stages:
+        h = hashlib.sha256(key.encode())
+        h.update(function_identity(s.func).encode())
+        h.update(get_backend().encode())
+        _hash_update(h, s.params)
+        key = h.hexdigest()
+        keys.append(key)
+    return keys
+
+def _profiled(s: Stage, x: Any) -> Any:
+    with get_profiler().stage(s.name, x) as rec:
+        out = s.func(x, **s.params)
+        rec.output(out)
+    return out
+
+def cached_pipe(value: T, *stages: Stage, cache: Optional[StageCache] = None) -> Any:
+    """
+    pipe() over stages, reusing stored outputs.
+    Only the output of the last stage found in the cache is loaded; the stages
+    after it run with pipe() and store their outputs. cache=None runs uncached.
+    """
+    if cache is None:
+        return pipe(value, *[partial(_profiled, s) for s in stages])
+
+    keys = stage_keys(value, *stages)
+    resume = 0
+    for i in range(len(stages), 0, -1):
+        if keys[i - 1] in cache:
+            with get_profiler().stage(f"{stages[i - 1].name} (cached)") as rec:
+                value = cache.get(keys[i - 1])
+                rec.output(value)
+            resume = i
+            break
+    for s in stages[:resume]:
+        print(f"Stage {s.name}: cached", file=sys.stderr)
+
+    def run(s: Stage, key: str) -> Callable[[Any], Any]:
+        def run_stage(x):
+            print(f"Stage {s.name}: running", file=sys.stderr)
+            out = _profiled(s, x)
+            cache.put(key, out)
+            return out
+        return run_stage
+
+    return pipe(value, *[run(s, k) for s, k in zip(stages[resume:], keys[resume:])])
@@ -0,0 +1,236 @@
+"""
+Streaming ingest of incident-level (NIBRS-style) crime extracts.
+
+An extract has one row per offense, tagged with the reporting agency (ORI) and the
+NIBRS offense code. Such files run to tens of millions of rows a year, so they are
+never loaded whole. They are read in fixed-size batches (CSV chunks or Parquet record
+batches), and each batch is reduced straight away to violent/property counts per
+agency. Only that small running table stays in memory. At the end, agencies are
+resolved to (state, city) and population through the agency table, giving the same
+frame load_fbi_year builds from a CIUS Table 8 spreadsheet.
+
+Offenses are classified with the UCR Part I definitions used by Table 8. Every
+offense row is counted; the UCR hierarchy rule is not applied.
+
+Files: NIBRS_<year>_incidents.csv|parquet, plus NIBRS_<year>_agencies.csv next to
+it (columns ori, state, city, population). load_raw_data picks them up for years
+that have no Table 8 file.
+"""
+import os
+import re
+import resource
+import sys
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from typing import Dict, Iterator, List, Optional, Tuple
+from src.data.ingest import FBI_COLUMNS, clean_city_names, map_states, us_state_abbrev
+
+INCIDENT_FILE_PATTERN = re.compile(r"^NIBRS_(\d{4})_incidents\.(csv|parquet)$")
+AGENCY_FILE_SUFFIX = "_agencies.csv"
+BATCH_ROWS = 1_000_000
+CSV_BLOCK_BYTES = 4 << 20
+
+# Column names in the extracts
+INCIDENT_COLUMNS = {"agency": "ori", "offense": "offense_code", "year": "data_year"}
+AGENCY_COLUMNS = {"agency": "ori", "state": "state", "city": "city", "population": "population"}
+
+VIOLENT, PROPERTY = 0, 1
+# NIBRS Group A codes of the UCR Part I offenses (arson, 200, is outside Table 8's property total)
+OFFENSE_CLASSES: Dict[str, int] = {
+    "09A": VIOLENT,                                     # murder and nonnegligent manslaughter
+    "11A": VIOLENT, "11B": VIOLENT, "11C": VIOLENT,     # rape (revised definition)
+    "120": VIOLENT,                                     # robbery
+    "13A": VIOLENT,                                     # aggravated assault
+    "220": PROPERTY,                                    # burglary
+    **{f"23{c}": PROPERTY for c in "ABCDEFGH"},         # larceny-theft
+    "240": PROPERTY,                                    # motor vehicle theft
+}
+
+def is_incident_file(path: str) -> bool:
+    return INCIDENT_FILE_PATTERN.match(os.path.basename(path)) is not None
+
+def agency_file(incident_path: str) -> str:
+    """
+    The agency table belonging to an incident extract (NIBRS_<year>_agencies.csv).
+    """
+    return re.sub(r"_incidents\.(csv|parquet)$", AGENCY_FILE_SUFFIX, incident_path)
+
+def incident_sources(incident_path: str) -> List[str]:
+    """
+    Every file an incident year is built from (for cache keys).
+    """
+    return [incident_path, agency_file(incident_path)]
+
+def discover_incident_files(raw_dir: str) -> Dict[int, str]:
+    """
+    Finds every NIBRS_<year>_incidents.csv/.parquet under raw_dir, keyed by year.
+    """
+    paths = {}
+    if os.path.isdir(raw_dir):
+        for fname in sorted(os.listdir(raw_dir)):
+            m = INCIDENT_FILE_PATTERN.match(fname)
+            if m:
+                paths[int(m.group(1))] = os.path.join(raw_dir, fname)
+    return dict(sorted(paths.items()))
+
+def _record_end(block: bytes) -> int:
+    """
+    Offset just past the last complete CSV record in block (0 if there is none). A
+    newline ends a record only outside quotes, i.e. after an even number of '"'.
+    """
+    end = block.rfind(b"\n")
+    while end >= 0 and block.count(b'"', 0, end) % 2:
+        end = block.rfind(b"\n", 0, end)
+    return end + 1
+
+def _csv_blocks(path: str, block_bytes: int) -> Iterator[bytes]:
+    """
+    Splits a CSV file into standalone CSV documents (header + whole records) of about block_bytes.
+    """
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        carry = b""
+        while True:
+            data = fh.read(block_bytes)
+            if not data:
+                break
+            block = carry + data
+            end = _record_end(block)
+            carry = block[end:]
+            if end:
+                yield header + block[:end]
+        if carry.strip():
+            yield header + carry
+
+def iter_batches(path: str, columns: List[str], batch_rows: int = BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """
+    Yields the given columns of a CSV or Parquet file as Arrow record batches. Parquet
+    batches hold at most batch_rows rows; CSV is parsed in blocks of CSV_BLOCK_BYTES.
+    Columns the file does not have are left out.
+
+    CSV blocks are cut here rather than by pyarrow's streaming reader, which reads ahead
+    without bound when the consumer is slower than the parser.
+    """
+    if path.endswith(".parquet"):
+        parquet = pq.ParquetFile(path)
+        present = [c for c in columns if c in parquet.schema_arrow.names]
+        yield from parquet.iter_batches(batch_size=batch_rows, columns=present)
+    else:
+        present = [c for c in columns if c in pd.read_csv(path, nrows=0).columns]
+        # Empty cells are nulls, not "" (a blank year must not fail the integer cast)
+        convert = pa_csv.ConvertOptions(include_columns=present, column_types={c: pa.string() for c in present},
+                                        strings_can_be_null=True, null_values=[""])
+        for block in _csv_blocks(path, CSV_BLOCK_BYTES):
+            yield from pa_csv.read_csv(pa.py_buffer(block), convert_options=convert).combine_chunks().to_batches()
+
+def _dictionary_codes(column: pa.Array) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer codes and the distinct values of a column (missing values get code -1).
+    """
+    encoded = pc.dictionary_encode(column)
+    codes = pc.fill_null(encoded.indices, -1).to_numpy(zero_copy_only=False).astype(np.int64)
+    return codes, encoded.dictionary.to_numpy(zero_copy_only=False)
+
+def _years(column: pa.Array) -> pa.Array:
+    """
+    A year column as int64. Blank or whitespace-only strings become null.
+    """
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        column = pc.utf8_trim_whitespace(column)
+        column = pc.if_else(pc.equal(column, ""), pa.scalar(None, column.type), column)
+    return pc.cast(column, pa.int64(), safe=False)
+
+def _classify(offenses: pa.Array) -> np.ndarray:
+    """
+    VIOLENT / PROPERTY / -1 per row. Only the distinct codes of the batch go through the table.
+    """
+    codes, uniques = _dictionary_codes(offenses)
+    classes = np.array([OFFENSE_CLASSES.get(str(u).strip().upper(), -1) for u in uniques] + [-1], dtype=np.int8)
+    # Missing codes are -1, which picks the trailing "other" class
+    return classes[codes]
+
+def count_offenses(path: str, year: Optional[int] = None, batch_rows: int = BATCH_ROWS,
+                   columns: Dict[str, str] = INCIDENT_COLUMNS) -> pd.DataFrame:
+    """
+    Streams an incident extract and returns violent/property offense counts per agency,
+    indexed by agency id. Rows of other years, or with a blank year, are skipped when
+    the extract has a year column.
+    Prints rows read, throughput and peak RSS to stderr.
+    """
+    agency_col, offense_col, year_col = columns["agency"], columns["offense"], columns["year"]
+    counts = pd.DataFrame(columns=["violent_crime", "property_crime"], dtype=np.int64)
+    start = time.perf_counter()
+    n_rows = n_batches = 0
+    for batch in iter_batches(path, [agency_col, offense_col, year_col], batch_rows):
+        n_rows += batch.num_rows
+        n_batches += 1
+        classes = _classify(batch.column(offense_col))
+        keep = classes >= 0
+        if year is not None and year_col in batch.schema.names:
+            # Rows without a year do not match it
+            years = _years(batch.column(year_col))
+            keep &= pc.fill_null(pc.equal(years, year), False).to_numpy(zero_copy_only=False)
+        agency_codes, agencies = _dictionary_codes(batch.column(agency_col))
+        keep &= agency_codes >= 0
+        # One bincount over (agency, class) pairs reduces the whole batch
+        tally = np.bincount(agency_codes[keep] * 2 + classes[keep], minlength=2 * len(agencies)).reshape(-1, 2)
+        part = pd.DataFrame(tally, index=agencies, columns=counts.columns)
+        part = part[part.sum(axis=1) > 0]
+        counts = part if counts.empty else counts.add(part, fill_value=0).astype(np.int64)
+
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Incidents {os.path.basename(path)}: {n_rows:,} rows in {n_batches} batches, {elapsed:.2f}s "
+          f"({n_rows / elapsed if elapsed else 0:,.0f} rows/s), {len(counts):,} agencies, "
+          f"peak RSS {peak_mb:.0f} MB", file=sys.stderr)
+    return counts
+
+def load_agencies(path: str, columns: Dict[str, str] = AGENCY_COLUMNS) -> pd.DataFrame:
+    """
+    Agency table indexed by agency id, with cleaned ['city', 'state', 'population'].
+    States may be given as abbreviations or full names.
+    """
+    agencies = pd.read_csv(path, dtype={columns["agency"]: str})
+    state = agencies[columns["state"]].astype(str).str.strip()
+    is_abbrev = state.str.upper().isin(set(us_state_abbrev.values()))
+    return pd.DataFrame({
+        "city": clean_city_names(agencies[columns["city"]]).to_numpy(),
+        "state": np.where(is_abbrev, state.str.upper(), map_states(state)),
+        "population": pd.to_numeric(agencies[columns["population"]], errors="coerce").to_numpy(),
+    }, index=agencies[columns["agency"]].to_numpy())
+
+def load_incident_year(path: str, year: int, batch_rows: int = BATCH_ROWS) -> pd.DataFrame:
+    """
+    Builds one year of the FBI frame (same columns as load_fbi_year) from an incident
+    extract and its agency table. Agencies of the same city are summed; the city's
+    population is its largest agency's (the municipal police department's jurisdiction).
+    Returns an empty frame if the extract does not exist.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    print(f"Loading NIBRS incidents {year}...", file=sys.stderr)
+    counts = count_offenses(path, year, batch_rows)
+    agencies = load_agencies(agency_file(path))
+
+    unknown = ~counts.index.isin(agencies.index)
+    if unknown.any():
+        print(f"WARNING: {int(unknown.sum())} agencies in {os.path.basename(path)} are not in the agency table; "
+              "their offenses are dropped.", file=sys.stderr)
+    agencies = agencies[~agencies.index.duplicated(keep="first")]
+    df = counts[~unknown].join(agencies, how="inner").dropna(subset=["state", "city"])
+    df = df.groupby(["state", "city"], as_index=False, sort=True).agg(
+        violent_crime=("violent_crime", "sum"), property_crime=("property_crime", "sum"),
+        population=("population", "max"))
+
+    df["year"] = year
+    # Rate per 100k (agencies without a population get no rate and are dropped, as in Table 8)
+    population = df["population"].where(df["population"] > 0)
+    df["violent_crime_rate"] = df["violent_crime"] / population * 100000
+    df["property_crime_rate"] = df["property_crime"] / population * 100000
+    df = df.dropna(subset=["violent_crime_rate"])
+    return df[FBI_COLUMNS].reset_index(drop=True)
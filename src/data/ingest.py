@@ -3,6 +3,16 @@ import os
 import sys
 import numpy as np
 import re
+import json
+import itertools
+import time
+import openpyxl
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.data.linkage import CROSSWALK_FILE, link_places
+from src.data.places import assign_place_ids
+from src.data.schema import apply_schema
+from src.data.cache import cache_key, load_cached, read_frame, store_cached, write_frame, CACHE_DIR
+from src.parallel import map_in_processes
 
 # US State Abbreviation Mapping
 us_state_abbrev = {
@@ -41,178 +51,538 @@ def clean_city_name(name):
         
     return name.strip()
 
-def load_raw_data():
+# Canonicalization tables: raw value -> cleaned value.
+# Shared across sources and calls so each distinct raw name is cleaned once per process.
+_CITY_NAME_TABLE: Dict[str, str] = {}
+_STATE_TABLE: Dict[str, Optional[str]] = {}
+
+def _canonicalize(values: pd.Series, table: Dict[str, Any], clean: Callable[[pd.Series], pd.Series]) -> pd.Series:
     """
-    Loads and normalizes raw datasets.
-    Returns DataFrames with columns: ['city', 'state', 'year', ...]
+    Maps values through a memoized cleaning table.
+    Only distinct values missing from the table are passed (as one Series) to clean.
     """
-    # 1. Load FiSC
-    fisc_path = "data/raw/FiSC_Full_Dataset_2022_Update.xlsx"
-    if not os.path.exists(fisc_path):
-         raise FileNotFoundError(f"FiSC data not found at {fisc_path}")
+    codes, uniques = pd.factorize(values.astype(str))
+    missing = [u for u in uniques if u not in table]
+    if missing:
+        cleaned = clean(pd.Series(missing, dtype=object))
+        table.update(zip(missing, (sys.intern(c) if isinstance(c, str) else c for c in cleaned)))
+    mapped = np.array([table[u] for u in uniques], dtype=object)
+    return pd.Series(mapped[codes], index=values.index, dtype=object)
 
-    # Load Full Excel (Robust Sheet/Header Search)
-    print("Loading FiSC...", file=sys.stderr)
-    xl = pd.ExcelFile(fisc_path, engine='openpyxl')
-    
-    # Sheet Selection
-    target_sheet = xl.sheet_names[0]
-    for s in xl.sheet_names:
+def _clean_city_names_vectorized(names: pd.Series) -> pd.Series:
+    """
+    Column-wise equivalent of clean_city_name for a Series of strings.
+    """
+    names = names.str.strip().str.replace(r'\d+$', '', regex=True).str.strip()
+    lower_names = names.str.lower()
+    # Same precedence as the scalar version: ' city' / ' town' drop 5 chars, ' village' drops 8
+    names = pd.Series(np.select(
+        [lower_names.str.endswith(" city") | lower_names.str.endswith(" town"),
+         lower_names.str.endswith(" village")],
+        [names.str[:-5], names.str[:-8]],
+        default=names,
+    ), index=names.index, dtype=object)
+    return names.str.strip()
+
+def _map_states_vectorized(states: pd.Series) -> pd.Series:
+    states = states.str.title().str.strip().str.replace(r'\d+$', '', regex=True).str.strip()
+    return states.map(us_state_abbrev).astype(object).where(lambda s: s.notna(), None)
+
+def clean_city_names(names: pd.Series) -> pd.Series:
+    """
+    Vectorized clean_city_name over a whole column.
+    """
+    return _canonicalize(names, _CITY_NAME_TABLE, _clean_city_names_vectorized)
+
+def map_states(states: pd.Series) -> pd.Series:
+    """
+    Maps full state names (possibly upper-case or footnoted, e.g. 'OHIO1') to abbreviations.
+    Unknown names map to None.
+    """
+    return _canonicalize(states, _STATE_TABLE, _map_states_vectorized)
+
+def split_fisc_places(places: pd.Series) -> pd.DataFrame:
+    """
+    Splits FiSC place labels ("AK: Anchorage") into ['state', 'city'].
+    Labels without a colon get state None.
+    """
+    raw = places.astype(str)
+    has_colon = raw.str.contains(':', regex=False)
+    head, _, rest = (raw.str.partition(':')[i] for i in range(3))
+    # The city is the second ':'-separated field
+    city_raw = rest.str.partition(':')[0].where(has_colon, raw)
+    return pd.DataFrame({
+        'state': head.str.strip().where(has_colon, None),
+        'city': clean_city_names(city_raw),
+    }, index=places.index)
+
+def parse_acs_places(places: pd.Series) -> pd.DataFrame:
+    """
+    Splits ACS place labels ("Frazee city, Minnesota") into ['city', 'state'].
+    Labels without a comma (or with an unknown state) get state None.
+    """
+    raw = places.astype(str)
+    has_comma = raw.str.contains(',', regex=False)
+    head, _, rest = (raw.str.partition(',')[i] for i in range(3))
+    state_part = rest.str.partition(',')[0].str.strip()
+    state = state_part.map(us_state_abbrev).astype(object)
+    return pd.DataFrame({
+        'city': clean_city_names(head.where(has_comma, raw)),
+        'state': state.where(has_comma & state.notna(), None),
+    }, index=places.index)
+
+RAW_DIR = "data/raw"
+FISC_PATH = "data/raw/FiSC_Full_Dataset_2022_Update.xlsx"
+# Inputs beyond Excel's row limit (e.g. synthetic data) may be CSV with the same layout
+FBI_FILE_PATTERN = re.compile(r"^FBI_CIUS_(\d{4})_Table8\.(xlsx?|csv)$")
+FBI_FALLBACK_PATH = "data/raw/FBI_CIUS_Table8.xls" # Unlabelled 2019 table
+ACS_PATH = "data/raw/ACS_Demographics_2019.csv"
+# Columns of a parsed FBI Table 8 year (counts are kept next to the rates per 100k)
+FBI_COLUMNS = ['city', 'state', 'year', 'population', 'violent_crime', 'property_crime',
+               'violent_crime_rate', 'property_crime_rate']
+
+def find_fisc_file(raw_dir: str = RAW_DIR) -> str:
+    """
+    Path of the FiSC workbook in raw_dir, or of its CSV export if there is no workbook.
+    """
+    stem = os.path.splitext(os.path.basename(FISC_PATH))[0]
+    for ext in (".xlsx", ".csv"):
+        path = os.path.join(raw_dir, stem + ext)
+        if os.path.exists(path):
+            return path
+    return os.path.join(raw_dir, os.path.basename(FISC_PATH))
+
+# CIUS Table 8 ("Offenses Known to Law Enforcement by State by City") layout per
+# edition: header row (0-based, below the title lines) and the header text of the
+# count columns as printed in the file. Only editions whose files have been checked
+# are registered; others are added with register_fbi_layout. A file without an entry,
+# or lacking the registered headers, falls back to sniff_fbi_layout with a warning;
+# the per-year cache means that happens once per file, and the result is remembered
+# in _SNIFFED_FBI_LAYOUTS.
+FBI_TABLE8_HEADER_ROW = 3
+FBI_TABLE8_LAYOUTS: Dict[int, Dict[str, Any]] = {
+    2015: {"header": 3, "violent_crime": "Violent\ncrime", "property_crime": "Property\ncrime",
+           "population": "Population"},
+    2019: {"header": 3, "violent_crime": "Violent\ncrime", "property_crime": "Property\ncrime",
+           "population": "Population"},
+}
+_SNIFFED_FBI_LAYOUTS: Dict[int, Dict[str, Any]] = {}
+
+def _select_fisc_sheet(sheet_names: List[str]) -> str:
+    """
+    Picks the data sheet of the FiSC workbook (skipping an 'About' cover sheet).
+    """
+    target_sheet = sheet_names[0]
+    for s in sheet_names:
         if "data" in s.lower() or "estimates" in s.lower():
             target_sheet = s
             break
-    if target_sheet == xl.sheet_names[0] and len(xl.sheet_names) > 1 and "about" in target_sheet.lower():
-        target_sheet = xl.sheet_names[1]
+    if target_sheet == sheet_names[0] and len(sheet_names) > 1 and "about" in target_sheet.lower():
+        target_sheet = sheet_names[1]
+    return target_sheet
+
+def _is_fisc_header(row_values) -> bool:
+    row_vals = [str(v).lower() for v in row_values]
+    return "city" in row_vals and "year" in row_vals
+
+def _normalize_fisc_column(col) -> str:
+    return str(col).lower().strip().replace(' ', '_')
+
+def _resolve_fisc_columns(columns: List[str]) -> Tuple[Optional[str], str, str]:
+    """
+    Finds the (year, city, police) columns among normalized FiSC headers.
+    """
+    year_col = 'year' if 'year' in columns else next((c for c in columns if 'year' in c), None)
+
+    # FiSC City format: "AK: Anchorage"
+    city_col = next((c for c in columns if 'city' in c and 'name' in c), None) or \
+               next((c for c in columns if 'fisc' in c and 'name' in c), None) or 'city'
+    if city_col not in columns:
+        raise ValueError(f"Could not find city column in FiSC. Cols: {columns}")
+
+    # Prefer 'police' -> 'police_spending'
+    police_col = 'police' if 'police' in columns else next((c for c in columns if 'police' in c), None)
+    if police_col is None:
+        raise ValueError("No police column in FiSC")
+
+    return year_col, city_col, police_col
+
+def _read_fisc_pandas(fisc_path: str, year: int) -> pd.DataFrame:
+    """
+    Reads the whole FiSC sheet through pandas, then filters to one year.
+    Reads the file twice (header sniffing, then full sheet); kept as a reference path.
+    """
+    xl = pd.ExcelFile(fisc_path, engine='openpyxl')
+    target_sheet = _select_fisc_sheet(xl.sheet_names)
     
     # Header Search
     df_head = pd.read_excel(fisc_path, sheet_name=target_sheet, engine='openpyxl', header=None, nrows=20)
-    header_idx = 0
-    found_header = False
+    header_idx = 0 # Fallback
     for i, row in df_head.iterrows():
-        row_vals = [str(v).lower() for v in row.values]
-        if "city" in row_vals and "year" in row_vals:
+        if _is_fisc_header(row.values):
             header_idx = i
-            found_header = True
             break
-            
-    if not found_header:
-        header_idx = 0 # Fallback
         
     fisc_raw = pd.read_excel(fisc_path, sheet_name=target_sheet, engine='openpyxl', header=header_idx)
-    
-    # Normalize Columns
-    fisc_raw.columns = [str(c).lower().strip().replace(' ', '_') for c in fisc_raw.columns]
-    
-    # Filter 2019
-    if 'year' in fisc_raw.columns:
-        fisc = fisc_raw[fisc_raw['year'] == 2019].copy()
-    else:
-        # Try finding year column
-        year_cols = [c for c in fisc_raw.columns if 'year' in c]
-        if year_cols:
-            fisc = fisc_raw[fisc_raw[year_cols[0]] == 2019].copy()
-            fisc = fisc.rename(columns={year_cols[0]: 'year'})
+    fisc_raw.columns = [_normalize_fisc_column(c) for c in fisc_raw.columns]
+
+    year_col, city_col, police_col = _resolve_fisc_columns(list(fisc_raw.columns))
+    if year_col is None:
+        raise ValueError(f"No year column in FiSC. Cols: {list(fisc_raw.columns)}")
+
+    fisc = fisc_raw[fisc_raw[year_col] == year]
+    return pd.DataFrame({
+        'place': fisc[city_col].values,
+        'year': fisc[year_col].values,
+        'police_spending': fisc[police_col].values,
+    })
+
+def _read_fisc_stream(fisc_path: str, year: int, header_search_rows: int = 20) -> pd.DataFrame:
+    """
+    Single pass over the FiSC sheet with openpyxl's read-only row iterator.
+    Only the year, city and police cells are kept, and only for rows of the requested year.
+    """
+    wb = openpyxl.load_workbook(fisc_path, read_only=True, data_only=True)
+    try:
+        ws = wb[_select_fisc_sheet(wb.sheetnames)]
+        # Stored sheet dimensions are not always reliable; let openpyxl scan the rows instead
+        ws.reset_dimensions()
+        rows = ws.iter_rows(values_only=True)
+
+        # Header Search: buffer the first rows in case no header is found (fallback to row 0)
+        head = []
+        header = None
+        for row in rows:
+            head.append(row)
+            if _is_fisc_header(row):
+                header = row
+                break
+            if len(head) >= header_search_rows:
+                break
+        if header is None:
+            header = head[0]
+            pending = head[1:]
         else:
-            fisc = fisc_raw
+            pending = []
 
-    # Map City/State
-    # FiSC City format: "AK: Anchorage"
-    # Find the city column
-    city_col = next((c for c in fisc.columns if 'city' in c and 'name' in c), None) or \
-               next((c for c in fisc.columns if 'fisc' in c and 'name' in c), None) or 'city'
-               
-    if city_col not in fisc.columns:
-        raise ValueError(f"Could not find city column in FiSC. Cols: {fisc.columns}")
+        # Same naming as pandas: blank headers become 'Unnamed: i', duplicates get '.1', '.2'...
+        columns, seen = [], {}
+        for i, c in enumerate(header):
+            name = _normalize_fisc_column(c if c is not None else f"Unnamed: {i}")
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
 
-    # Split "AK: Anchorage"
-    def split_fisc_place(val):
-        s = str(val)
-        if ':' in s:
-            parts = s.split(':')
-            return parts[0].strip(), clean_city_name(parts[1])
-        return None, clean_city_name(s)
-
-    fisc[['state', 'city']] = fisc[city_col].apply(lambda x: pd.Series(split_fisc_place(x)))
-    
-    # Map Police Spending
-    police_cols = [c for c in fisc.columns if 'police' in c]
-    # Prefer 'police' -> 'police_spending'
-    target_pol = 'police' if 'police' in fisc.columns else (police_cols[0] if police_cols else None)
-    if target_pol:
-        fisc = fisc.rename(columns={target_pol: 'police_spending'})
+        year_col, city_col, police_col = _resolve_fisc_columns(columns)
+        if year_col is None:
+            raise ValueError(f"No year column in FiSC. Cols: {columns}")
+        i_year, i_city, i_police = (columns.index(c) for c in (year_col, city_col, police_col))
+        width = max(i_year, i_city, i_police) + 1
+
+        places, years, police = [], [], []
+        for row in itertools.chain(pending, rows):
+            if len(row) < width or row[i_year] != year:
+                continue
+            places.append(row[i_city])
+            years.append(row[i_year])
+            police.append(row[i_police])
+    finally:
+        wb.close()
+
+    return pd.DataFrame({'place': places, 'year': years, 'police_spending': police})
+
+def _read_fisc_csv(fisc_path: str, year: int, chunksize: int = 1_000_000) -> pd.DataFrame:
+    """
+    Reads a CSV export of the FiSC sheet (header on the first line) in chunks,
+    keeping only the year, city and police columns for rows of the requested year.
+    """
+    header = pd.read_csv(fisc_path, nrows=0).columns
+    columns = [_normalize_fisc_column(c) for c in header]
+    year_col, city_col, police_col = _resolve_fisc_columns(columns)
+    if year_col is None:
+        raise ValueError(f"No year column in FiSC. Cols: {columns}")
+    raw_names = {c: header[columns.index(c)] for c in (year_col, city_col, police_col)}
+
+    chunks = []
+    for chunk in pd.read_csv(fisc_path, usecols=list(raw_names.values()), chunksize=chunksize):
+        chunks.append(chunk[chunk[raw_names[year_col]] == year])
+    fisc = pd.concat(chunks)
+    return pd.DataFrame({
+        'place': fisc[raw_names[city_col]].values,
+        'year': fisc[raw_names[year_col]].values,
+        'police_spending': fisc[raw_names[police_col]].values,
+    })
+
+def load_fisc(fisc_path: str = FISC_PATH, year: int = 2019, reader: str = "stream") -> pd.DataFrame:
+    """
+    Loads one year of the FiSC workbook, normalized to ['city', 'state', 'year', 'police_spending'].
+    reader="stream" makes one read-only pass keeping only the needed cells;
+    reader="pandas" loads the full sheet into a DataFrame first.
+    A .csv path is always read with the chunked CSV reader.
+    """
+    print("Loading FiSC...", file=sys.stderr)
+    if fisc_path.endswith(".csv"):
+        fisc = _read_fisc_csv(fisc_path, year)
+    elif reader == "stream":
+        fisc = _read_fisc_stream(fisc_path, year)
+    elif reader == "pandas":
+        fisc = _read_fisc_pandas(fisc_path, year)
     else:
-        raise ValueError("No police column in FiSC")
+        raise ValueError(f"Unknown FiSC reader: {reader}")
+
+    # Split "AK: Anchorage"
+    fisc[['state', 'city']] = split_fisc_places(fisc['place'])
 
     # Select columns
-    fisc = fisc[['city', 'state', 'year', 'police_spending']]
-
-    # 2. Load FBI CIUS (Multi-Year)
-    def load_fbi_year(path, year):
-        if not os.path.exists(path):
-            return pd.DataFrame()
-            
-        print(f"Loading FBI {year}...", file=sys.stderr)
-        try:
-             # Header=3 works for 2015 and 2019 usually
-            fbi = pd.read_excel(path, header=3, engine='xlrd') 
-        except:
-             fbi = pd.read_excel(path, header=3, engine='openpyxl')
-
-        # Cleanup Columns
-        # 2015/2019 Table 8 structure is similar: State, City, Pop, Violent, Property...
-        cols = fbi.columns.tolist()
-        new_cols = cols.copy()
-        new_cols[0] = 'raw_state'
-        new_cols[1] = 'city'
-        fbi.columns = new_cols
-        
-        fbi['raw_state'] = fbi['raw_state'].fillna(method='ffill')
-        
-        # Standardize Cols
-        fbi.columns = [str(c).lower().strip().replace('\n', ' ').replace(' ', '_') for c in fbi.columns]
-        
-        # Map State
-        def map_state(val):
-            val = str(val).title().strip()
-            val = re.sub(r'\d+$', '', val).strip()
-            return us_state_abbrev.get(val, None)
-            
-        fbi['state'] = fbi['raw_state'].apply(map_state)
-        fbi['city'] = fbi['city'].apply(clean_city_name)
-        fbi['year'] = year
-        
-        # Rename Outcome
-        # 2015 might match 2019 names, but let's be robust
-        # Look for 'violent_crime' and 'property_crime' partials
-        viol_col = next((c for c in fbi.columns if 'violent' in c and 'crime' in c and 'rate' not in c), None) 
-        prop_col = next((c for c in fbi.columns if 'property' in c and 'crime' in c and 'rate' not in c), None)
-        pop_col = next((c for c in fbi.columns if 'population' in c), None)
+    return fisc[['city', 'state', 'year', 'police_spending']]
+
+def register_fbi_layout(year: int, header: int = FBI_TABLE8_HEADER_ROW, violent_crime: Optional[str] = None,
+                        property_crime: Optional[str] = None, population: Optional[str] = None) -> None:
+    """
+    Records the Table 8 layout for one edition (column headers as printed, e.g. 'Violent\\ncrime').
+    """
+    FBI_TABLE8_LAYOUTS[year] = {
+        "header": header,
+        "violent_crime": violent_crime,
+        "property_crime": property_crime,
+        "population": population,
+    }
+
+def _fbi_column_name(header) -> str:
+    """
+    Normalized Table 8 column name ("Violent\\ncrime" -> "violent_crime").
+    """
+    return str(header).lower().strip().replace('\n', ' ').replace(' ', '_')
+
+def sniff_fbi_layout(columns: List[str], header: int = FBI_TABLE8_HEADER_ROW) -> Dict[str, Any]:
+    """
+    Guesses the count columns of an unregistered Table 8 edition from its normalized headers.
+    Only a fallback: load_fbi_year uses FBI_TABLE8_LAYOUTS and warns when it has to sniff.
+    """
+    return {
+        "header": header,
+        "violent_crime": next((c for c in columns if 'violent' in c and 'crime' in c and 'rate' not in c), None),
+        "property_crime": next((c for c in columns if 'property' in c and 'crime' in c and 'rate' not in c), None),
+        "population": next((c for c in columns if 'population' in c), None),
+    }
+
+def load_fbi_year(path: str, year: int) -> pd.DataFrame:
+    """
+    Loads one FBI CIUS Table 8 spreadsheet and computes crime rates per 100k.
+    Column names come from FBI_TABLE8_LAYOUTS; unregistered editions are sniffed.
+    Returns an empty frame if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame()
         
-        if viol_col and pop_col:
-            fbi['violent_crime'] = pd.to_numeric(fbi[viol_col], errors='coerce')
-            fbi['population'] = pd.to_numeric(fbi[pop_col], errors='coerce')
-            # Rate per 100k
-            fbi['violent_crime_rate'] = (fbi['violent_crime'] / fbi['population']) * 100000
-            
-        if prop_col and pop_col and 'population' in fbi.columns:
-             fbi['property_crime'] = pd.to_numeric(fbi[prop_col], errors='coerce')
-             fbi['property_crime_rate'] = (fbi['property_crime'] / fbi['population']) * 100000
+    print(f"Loading FBI {year}...", file=sys.stderr)
+    layout = FBI_TABLE8_LAYOUTS.get(year) or _SNIFFED_FBI_LAYOUTS.get(year)
+    header = layout["header"] if layout else FBI_TABLE8_HEADER_ROW
+    if path.endswith(".csv"):
+        fbi = pd.read_csv(path, header=header)
+    else:
+        try:
+            fbi = pd.read_excel(path, header=header, engine='xlrd') 
+        except Exception:
+             fbi = pd.read_excel(path, header=header, engine='openpyxl')
+
+    # Cleanup Columns
+    # Table 8 structure: State, City, Pop, Violent, Property...
+    cols = fbi.columns.tolist()
+    new_cols = cols.copy()
+    new_cols[0] = 'raw_state'
+    new_cols[1] = 'city'
+    fbi.columns = new_cols
+    
+    fbi['raw_state'] = fbi['raw_state'].ffill()
+    
+    # Standardize Cols
+    fbi.columns = [_fbi_column_name(c) for c in fbi.columns]
+
+    if layout is not None:
+        layout = {k: _fbi_column_name(v) if k != "header" and v else v for k, v in layout.items()}
+    registered = layout is not None and all(
+        layout[k] in fbi.columns for k in ("violent_crime", "population") if layout[k])
+    if not registered:
+        if layout is None:
+            print(f"WARNING: FBI {year} has no registered Table 8 layout (see register_fbi_layout); "
+                  "detecting columns from the headers.", file=sys.stderr)
         else:
-             # Fallback if already calculated or missing
-             pass
-            
-        fbi = fbi.dropna(subset=['state', 'city', 'violent_crime_rate'])
+            print(f"WARNING: FBI {year} does not match its registered layout; re-detecting columns.", file=sys.stderr)
+        layout = sniff_fbi_layout(list(fbi.columns), header)
+        _SNIFFED_FBI_LAYOUTS[year] = layout
+    
+    # Map State
+    fbi['state'] = map_states(fbi['raw_state'])
+    fbi['city'] = clean_city_names(fbi['city'])
+    fbi['year'] = year
+    
+    viol_col, prop_col, pop_col = layout["violent_crime"], layout["property_crime"], layout["population"]
+    
+    if viol_col and pop_col:
+        fbi['violent_crime'] = pd.to_numeric(fbi[viol_col], errors='coerce')
+        fbi['population'] = pd.to_numeric(fbi[pop_col], errors='coerce')
+        # Rate per 100k
+        fbi['violent_crime_rate'] = (fbi['violent_crime'] / fbi['population']) * 100000
         
-        # Ensure property_crime_rate exists (fill with NaN if missing so merge doesn't break, but ideally we have it)
-        if 'property_crime_rate' not in fbi.columns:
-             fbi['property_crime_rate'] = np.nan
-             
-        return fbi[['city', 'state', 'year', 'violent_crime_rate', 'property_crime_rate']]
-
-    fbi_2019 = load_fbi_year("data/raw/FBI_CIUS_2019_Table8.xls", 2019)
-    if not os.path.exists("data/raw/FBI_CIUS_2019_Table8.xls"):
-         fbi_2019 = load_fbi_year("data/raw/FBI_CIUS_Table8.xls", 2019)
-         
-    fbi_2015 = load_fbi_year("data/raw/FBI_CIUS_2015_Table8.xls", 2015)
+    if prop_col and pop_col and prop_col in fbi.columns:
+         fbi['property_crime'] = pd.to_numeric(fbi[prop_col], errors='coerce')
+         fbi['property_crime_rate'] = (fbi['property_crime'] / fbi['population']) * 100000
+        
+    fbi = fbi.dropna(subset=['state', 'city', 'violent_crime_rate'])
     
-    fbi = pd.concat([fbi_2019, fbi_2015])
+    # Ensure property_crime_rate exists (fill with NaN if missing so merge doesn't break, but ideally we have it)
+    if 'property_crime_rate' not in fbi.columns:
+         fbi['property_crime'] = np.nan
+         fbi['property_crime_rate'] = np.nan
+         
+    return fbi[FBI_COLUMNS]
+
+def discover_fbi_files(raw_dir: str = RAW_DIR) -> Dict[int, str]:
+    """
+    Finds every FBI_CIUS_<year>_Table8.xls(x)/.csv under raw_dir, keyed by year (ascending).
+    The unlabelled FBI_CIUS_Table8.xls is used as 2019 when no labelled 2019 file exists.
+    Years without a Table 8 are filled from NIBRS_<year>_incidents extracts (src.data.incidents).
+    """
+    from src.data.incidents import discover_incident_files
+    fallback = os.path.join(raw_dir, os.path.basename(FBI_FALLBACK_PATH))
+    paths = {}
+    if os.path.isdir(raw_dir):
+        for fname in sorted(os.listdir(raw_dir)):
+            m = FBI_FILE_PATTERN.match(fname)
+            if m:
+                paths[int(m.group(1))] = os.path.join(raw_dir, fname)
+    if 2019 not in paths and os.path.exists(fallback):
+        paths[2019] = fallback
+    for year, path in discover_incident_files(raw_dir).items():
+        paths.setdefault(year, path)
+    return dict(sorted(paths.items()))
+
+def stack_fbi_years(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates per-year FBI frames into one long frame.
+    """
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=FBI_COLUMNS)
+    return pd.concat(frames).reset_index(drop=True)
+
+class FbiPanelBuilder:
+    """
+    Maintains the long-format FBI panel (one row per agency-year) incrementally.
+
+    Each year is parsed into its own cached artifact (fbi_<year>). The stacked panel
+    is cached too, with a manifest of the per-year keys it was built from, so adding
+    or replacing one year's file parses only that file and appends it to the panel.
+    """
+    PANEL_NAME = "fbi_panel"
+
+    def __init__(self, fbi_paths: Dict[int, str], use_cache: bool = True, rebuild: bool = False,
+                 cache_dir: str = CACHE_DIR):
+        from src.data.incidents import incident_sources, is_incident_file
+        self.fbi_paths = dict(sorted(fbi_paths.items()))
+        # Files each year is built from: an incident extract also depends on its agency table
+        self.year_sources = {year: incident_sources(path) if is_incident_file(path) else [path]
+                             for year, path in self.fbi_paths.items()}
+        self.use_cache = use_cache
+        self.rebuild = rebuild
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, f"{self.PANEL_NAME}.json")
+        self.panel_path = os.path.join(cache_dir, f"{self.PANEL_NAME}.arrow")
+        self.panel = None
+        self.year_frames: Dict[int, pd.DataFrame] = {}
+        self.stale_years: List[int] = list(self.fbi_paths)
+        self.dropped_years: List[int] = []
+        # Keyed on the explicit registry only, so registering a layout re-parses that year
+        self.year_params = {year: {"year": year, "layout": FBI_TABLE8_LAYOUTS.get(year)} for year in self.fbi_paths}
+        self.year_keys = {
+            year: cache_key(self._year_name(year), self.year_sources[year], self.year_params[year])
+            for year in self.fbi_paths
+        } if use_cache else {}
+        if use_cache:
+            self._plan()
 
-    # 3. Load ACS
-    acs_path = "data/raw/ACS_Demographics_2019.csv"
+    @staticmethod
+    def _year_name(year: int) -> str:
+        return f"fbi_{year}"
+
+    def _plan(self):
+        built_from = {}
+        if not self.rebuild and os.path.exists(self.manifest_path) and os.path.exists(self.panel_path):
+            with open(self.manifest_path) as fh:
+                built_from = {int(y): k for y, k in json.load(fh)["years"].items()}
+
+        # Years already in the panel with an unchanged key need no work at all
+        self.stale_years = [y for y, k in self.year_keys.items() if built_from.get(y) != k]
+        self.dropped_years = [y for y in built_from if y not in self.year_keys or y in self.stale_years]
+        if built_from:
+            self.panel = read_frame(self.panel_path)
+
+        if self.rebuild:
+            return
+        for year in self.stale_years:
+            cached = load_cached(self._year_name(year), self.year_sources[year], self.year_params[year], self.cache_dir)
+            if cached is not None:
+                self.year_frames[year] = cached
+
+    def pending_tasks(self) -> Dict[str, Tuple[Callable[..., pd.DataFrame], Tuple]]:
+        """
+        Loader tasks for the years that must be parsed from their spreadsheets
+        (or streamed from their incident extracts).
+        """
+        from src.data.incidents import is_incident_file, load_incident_year
+        return {
+            self._year_name(year): (load_incident_year if is_incident_file(self.fbi_paths[year]) else load_fbi_year,
+                                    (self.fbi_paths[year], year))
+            for year in self.stale_years if year not in self.year_frames
+        }
+
+    def build(self, parsed: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Returns the panel, given the frames produced by pending_tasks() (keyed by task name).
+        """
+        for year in self.stale_years:
+            if year in self.year_frames:
+                continue
+            df = parsed[self._year_name(year)]
+            if self.use_cache:
+                df = store_cached(self._year_name(year), self.year_sources[year], df,
+                                  self.year_params[year], self.cache_dir)
+            self.year_frames[year] = df
+
+        if not self.use_cache:
+            return stack_fbi_years([self.year_frames[y] for y in self.fbi_paths])
+
+        if self.panel is not None and not self.stale_years and not self.dropped_years:
+            print("Loading fbi from cache...", file=sys.stderr)
+            return self.panel
+
+        frames = []
+        if self.panel is not None:
+            frames.append(self.panel[~self.panel['year'].isin(self.dropped_years)])
+        frames += [self.year_frames[y] for y in self.stale_years]
+        panel = stack_fbi_years(frames)
+        if not panel.empty:
+            panel = panel.sort_values('year', kind='stable').reset_index(drop=True)
+
+        write_frame(panel, self.panel_path)
+        with open(self.manifest_path, "w") as fh:
+            json.dump({"years": {str(y): k for y, k in self.year_keys.items()}}, fh, indent=2)
+        return read_frame(self.panel_path)
+
+def load_acs(acs_path: str = ACS_PATH) -> pd.DataFrame:
+    """
+    Loads the ACS demographics extract and splits "City city, State" into city/state.
+    """
     print("Loading ACS...", file=sys.stderr)
     acs = pd.read_csv(acs_path)
     
     # Columns: city_raw, population_density, median_income...
     # Parse city_raw: "Frazee city, Minnesota"
-    def parse_acs_place(val):
-        if ',' in str(val):
-            parts = val.split(',')
-            city_part = parts[0].strip() # "Frazee city"
-            state_part = parts[1].strip() # "Minnesota"
-            return clean_city_name(city_part), us_state_abbrev.get(state_part, None)
-        return clean_city_name(val), None
-
-    acs[['city', 'state']] = acs['city_raw'].apply(lambda x: pd.Series(parse_acs_place(x)))
+    acs[['city', 'state']] = parse_acs_places(acs['city_raw'])
     
     # Dropna
     acs = acs.dropna(subset=['city', 'state'])
@@ -220,5 +590,108 @@ def load_raw_data():
     # Select cols (keep covariates)
     # columns are: city_raw, population_density, median_income, poverty_rate, male_15_24, city, year
     acs = acs[['city', 'state', 'year', 'population_density', 'median_income', 'poverty_rate', 'male_15_24']]
-    
-    return fisc, fbi, acs
+    return acs.reset_index(drop=True)
+
+def _timed_call(func: Callable[..., pd.DataFrame], args: Tuple) -> Tuple[pd.DataFrame, float]:
+    start = time.perf_counter()
+    df = func(*args)
+    return df, time.perf_counter() - start
+
+def run_loaders(tasks: Dict[str, Tuple[Callable[..., pd.DataFrame], Tuple]], parallel: bool = False,
+                max_workers: Optional[int] = None) -> Tuple[Dict[str, pd.DataFrame], Dict[str, float]]:
+    """
+    Runs independent loaders, one after another or in a process pool.
+    Returns ({task: frame}, {task: seconds spent parsing}).
+    """
+    results, timings = {}, {}
+    if parallel and len(tasks) > 1:
+        parts = map_in_processes(_timed_call, list(tasks.values()), max_workers or len(tasks))
+        for name, (df, seconds) in zip(tasks, parts):
+            results[name], timings[name] = df, seconds
+    else:
+        for name, (func, args) in tasks.items():
+            results[name], timings[name] = _timed_call(func, args)
+    return results, timings
+
+def load_raw_data(fisc_year: int = 2019, use_cache: bool = True, rebuild: bool = False,
+                  cache_dir: str = CACHE_DIR, parallel: bool = False, max_workers: Optional[int] = None,
+                  timings: Optional[Dict[str, float]] = None, fbi_years: Optional[List[int]] = None,
+                  raw_dir: str = RAW_DIR, link: bool = True):
+    """
+    Loads and normalizes raw datasets.
+    Returns DataFrames with columns: ['city', 'state', 'year', ..., 'place_id'],
+    cast to the dtypes in src.data.schema (the memory saved per frame is printed).
+
+    FiSC spending is kept for fisc_year only. FBI tables are picked up for every
+    FBI_CIUS_<year>_Table8 file in raw_dir (or only fbi_years, if given); years with
+    only a NIBRS_<year>_incidents extract are aggregated from it.
+
+    Normalized frames are cached as Arrow files under cache_dir, keyed by the
+    path, size, mtime and content hash of their source files. Pass rebuild=True
+    to re-parse the raw files and overwrite the cache, or use_cache=False to bypass it.
+
+    FBI and ACS places whose names differ from FiSC's only in spelling are renamed to
+    the FiSC name (see src.data.linkage; link=False skips this). The crosswalk is kept
+    in cache_dir when use_cache is set.
+
+    parallel=True parses FiSC, ACS and each FBI year in separate processes.
+    Per-source parse times are printed to stderr and, if given, written into timings.
+    """
+    fisc_path = find_fisc_file(raw_dir)
+    acs_path = os.path.join(raw_dir, os.path.basename(ACS_PATH))
+    if not os.path.exists(fisc_path):
+         raise FileNotFoundError(f"FiSC data not found at {fisc_path}")
+
+    start = time.perf_counter()
+    fbi_paths = discover_fbi_files(raw_dir)
+    if fbi_years is not None:
+        fbi_paths = {y: p for y, p in fbi_paths.items() if y in fbi_years}
+    sources = {"fisc": [fisc_path], "acs": [acs_path]}
+    params = {"fisc": {"year": fisc_year}, "acs": {}}
+
+    frames = {}
+    if use_cache and not rebuild:
+        for name in sources:
+            cached = load_cached(name, sources[name], params[name], cache_dir)
+            if cached is not None:
+                frames[name] = cached
+
+    # FBI years are cached one artifact per year; only new or changed years are parsed
+    fbi_builder = FbiPanelBuilder(fbi_paths, use_cache=use_cache, rebuild=rebuild, cache_dir=cache_dir)
+
+    # Parse whatever the cache could not serve; each FBI year is its own task
+    missing = [name for name in sources if name not in frames]
+    tasks = {}
+    if "fisc" in missing:
+        tasks["fisc"] = (load_fisc, (fisc_path, fisc_year))
+    tasks.update(fbi_builder.pending_tasks())
+    if "acs" in missing:
+        tasks["acs"] = (load_acs, (acs_path,))
+    parsed, parse_times = run_loaders(tasks, parallel=parallel, max_workers=max_workers)
+
+    for name in missing:
+        frames[name] = parsed[name]
+        if use_cache:
+            frames[name] = store_cached(name, sources[name], frames[name], params[name], cache_dir)
+    frames["fbi"] = fbi_builder.build(parsed)
+
+    # "St. Louis" in one source and "Saint Louis" in another become one place before ids are assigned
+    if link:
+        link_start = time.perf_counter()
+        frames = link_places(frames, "fisc", os.path.join(cache_dir, CROSSWALK_FILE) if use_cache else None,
+                             rebuild=rebuild)
+        parse_times["linkage"] = time.perf_counter() - link_start
+
+    # Compact dtypes (see src.data.schema), then one integer place_id per (state, city)
+    # across all three sources, for the joins downstream
+    for name in ("fisc", "fbi", "acs"):
+        frames[name] = apply_schema(frames[name], name, report=True)
+    registry = assign_place_ids(frames["fisc"], frames["fbi"], frames["acs"])
+    print(f"Place registry: {len(registry)} places", file=sys.stderr)
+
+    parse_times["total"] = time.perf_counter() - start
+    print("Ingest timings: " + ", ".join(f"{k} {v:.2f}s" for k, v in parse_times.items()), file=sys.stderr)
+    if timings is not None:
+        timings.update(parse_times)
+
+    return frames["fisc"], frames["fbi"], frames["acs"]
@@ -0,0 +1,295 @@
+"""
+Fuzzy linkage of place names across sources.
+
+Cleaned names still differ between FiSC, the FBI tables and the ACS for some places:
+"St. Louis" / "Saint Louis", "Clinton Charter Township" / "Clinton", "Wilkes-Barre" /
+"Wilkes Barre", accents, stray footnote digits. The join on (state, city) drops them.
+Here every name of a source that has no exact match in the reference source (FiSC)
+is linked to a reference name of the same state:
+
+1. Names with the same normalized key (place_key: word forms unified, municipal-type
+   words and punctuation dropped) are linked outright, unless the source already has
+   that reference place under its own name in the same year.
+2. The rest are compared by character n-grams through an inverted index over the
+   reference names. Postings are keyed by (state, n-gram), so a name is only scored
+   against same-state names sharing at least one n-gram, never against all pairs.
+   The best candidate is linked if its Dice similarity reaches MIN_SIMILARITY and no
+   other candidate ties it. The same-year exclusion of step 1 applies here too.
+
+Links (and names that found no link) are kept in a crosswalk CSV under the ingest cache.
+Later runs reuse its rows while the reference names of their state are unchanged, so
+only new names are compared. Link rates and timings per source pair go to stderr.
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+import unicodedata
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import Dict, List, Optional, Set, Tuple
+from src.data.cache import atomic_write
+from src.data.places import PLACE_KEYS
+
+NGRAM = 3
+MIN_SIMILARITY = 0.8
+# Bumped when the linkage rules change, so crosswalk rows made under old rules are redone
+LINK_RULES = 2
+CROSSWALK_FILE = "place_crosswalk.csv"
+CROSSWALK_COLUMNS = ["source", "reference", "state", "city", "linked_city", "score", "method", "block"]
+
+# Spellings of the same word, mapped to one form before comparing
+_WORD_FORMS = {"st": "saint", "ste": "sainte", "ft": "fort", "mt": "mount", "pt": "point",
+               "twp": "township", "boro": "borough", "hts": "heights", "spgs": "springs"}
+# Municipal-type words some sources add around a place name ("City of X", "X Township")
+_PLACE_TYPES = {"city", "town", "township", "village", "borough", "charter", "municipality", "cdp", "plantation"}
+
+def place_key(name) -> str:
+    """
+    Normalized comparison key of a cleaned city name: ASCII, lower case, trailing
+    footnote digits and punctuation dropped, word forms unified, leading "<type> of"
+    and trailing municipal-type words removed, spaces removed.
+    E.g. 'St. Louis', 'Saint Louis' and 'City of Saint Louis' all give 'saintlouis'.
+    """
+    name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().lower().strip()
+    name = re.sub(r"\d+$", "", name)
+    words = [_WORD_FORMS.get(w, w) for w in re.findall(r"[a-z0-9]+", name)]
+    while len(words) > 2 and words[0] in _PLACE_TYPES and (words[1] == "of" or words[1] in _PLACE_TYPES):
+        words = words[2:] if words[1] == "of" else words[1:]
+    while len(words) > 1 and words[-1] in _PLACE_TYPES:
+        words = words[:-1]
+    return "".join(words)
+
+def ngrams(key: str, n: int = NGRAM) -> Set[str]:
+    """
+    Character n-grams of a key, padded with '#' so the first and last letters count.
+    """
+    padded = f"#{key}#"
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+def _block_digest(names: List[str], n: int, min_similarity: float) -> str:
+    """
+    Identifies a state's reference names and the linkage settings (crosswalk rows are
+    reused only while it is unchanged).
+    """
+    blob = "\n".join([f"{n}:{min_similarity}:{LINK_RULES}"] + sorted(names)).encode()
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+class NameIndex:
+    """
+    Reference places (state, city) with their normalized keys and an inverted index
+    from (state, n-gram) to the places containing it. Build once, then link any number
+    of sources against it.
+    """
+    def __init__(self, places: pd.DataFrame, n: int = NGRAM, min_similarity: float = MIN_SIMILARITY):
+        places = places[PLACE_KEYS].astype(object).dropna().drop_duplicates()
+        self.places = places.sort_values(PLACE_KEYS, kind="stable").reset_index(drop=True)
+        self.n = n
+        self.min_similarity = min_similarity
+        self.positions = pd.MultiIndex.from_frame(self.places)
+        self.keys = self.places["city"].map(place_key).to_numpy(dtype=object)
+        self.states = self.places["state"].to_numpy(dtype=object)
+
+        # Normalized key -> reference position; keys shared by two places of a state are ambiguous (-1)
+        self.by_key: Dict[Tuple[str, str], int] = {}
+        for pos, (state, key) in enumerate(zip(self.states, self.keys)):
+            self.by_key[(state, key)] = -1 if (state, key) in self.by_key else pos
+
+        self.vocab: Dict[Tuple[str, str], int] = {}
+        grams = [ngrams(k, n) for k in self.keys]
+        for state, gs in zip(self.states, grams):
+            for g in gs:
+                self.vocab.setdefault((state, g), len(self.vocab))
+        self.sizes = np.array([len(gs) for gs in grams], dtype=np.float64)
+        # Row v of postings lists the reference places holding (state, n-gram) v
+        incidence = self._incidence(self.states, grams, len(self.places))
+        self.postings = incidence.T.tocsr()
+
+        self.blocks = {state: _block_digest(list(names), n, min_similarity)
+                       for state, names in self.places.groupby("state", sort=False)["city"]}
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _incidence(self, states: np.ndarray, grams: List[Set[str]], n_rows: int) -> sparse.csr_matrix:
+        """
+        Binary (name x indexed n-gram) matrix; n-grams outside the index are left out.
+        """
+        rows, cols = [], []
+        for i, (state, gs) in enumerate(zip(states, grams)):
+            for g in gs:
+                v = self.vocab.get((state, g))
+                if v is not None:
+                    rows.append(i)
+                    cols.append(v)
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_rows, len(self.vocab)))
+
+    def contains(self, places: pd.DataFrame) -> np.ndarray:
+        """
+        Whether each (state, city) row is a reference place.
+        """
+        return self.positions.get_indexer(pd.MultiIndex.from_frame(places[PLACE_KEYS])) >= 0
+
+    def link(self, places: pd.DataFrame, occupied: Optional[Dict[int, int]] = None) -> pd.DataFrame:
+        """
+        Links each (state, city) row to a reference place of its state. occupied maps
+        reference positions the source already has under their own name to a bit mask of
+        the periods (years) it has them in; such a place is no candidate, normalized or fuzzy,
+        for a name occurring in one of those periods (places["periods"], same bits; any
+        period if absent).
+        Returns places with linked_city (None if unlinked), score and method
+        ("normalized", "fuzzy" or "none").
+        """
+        periods = places["periods"].to_numpy() if "periods" in places.columns else None
+        places = places[PLACE_KEYS].astype(object).reset_index(drop=True)
+        states = places["state"].to_numpy(dtype=object)
+        keys = places["city"].map(place_key).to_numpy(dtype=object)
+        target = np.full(len(places), -1, dtype=np.int64)
+        score = np.zeros(len(places))
+        method = np.full(len(places), "none", dtype=object)
+
+        occupied = occupied or {}
+        for i, (state, key) in enumerate(zip(states, keys)):
+            pos = self.by_key.get((state, key), -1)
+            if pos in occupied and (periods is None or occupied[pos] & int(periods[i])):
+                continue
+            if pos >= 0:
+                target[i], score[i], method[i] = pos, 1.0, "normalized"
+
+        pending = np.flatnonzero(target < 0)
+        if len(pending) and len(self.vocab):
+            grams = [ngrams(k, self.n) for k in keys[pending]]
+            query = self._incidence(states[pending], grams, len(pending))
+            # Only pairs sharing an n-gram come out of the product
+            overlap = (query @ self.postings).tocoo()
+            q, r = overlap.row, overlap.col
+            sizes = np.array([len(gs) for gs in grams], dtype=np.float64)
+            dice = 2 * overlap.data / (sizes[q] + self.sizes[r])
+            ok = dice >= self.min_similarity
+            if occupied:
+                # Few pairs pass the threshold, so this check runs per pair
+                ok[ok] = [r_ not in occupied or (periods is not None and not occupied[r_] & int(periods[pending[q_]]))
+                          for q_, r_ in zip(q[ok], r[ok])]
+            q, r, dice = q[ok], r[ok], dice[ok]
+            order = np.lexsort((r, -dice, q))
+            q, r, dice = q[order], r[order], dice[order]
+            first = np.flatnonzero(np.r_[True, q[1:] != q[:-1]]) if len(q) else np.zeros(0, dtype=np.int64)
+            # A best candidate tied with the runner-up is ambiguous and left unlinked
+            runner_up = first + 1
+            tied = (runner_up < len(q)) & (q[np.minimum(runner_up, len(q) - 1)] == q[first]) & \
+                   (dice[np.minimum(runner_up, len(q) - 1)] == dice[first])
+            best = first[~tied]
+            rows = pending[q[best]]
+            target[rows], score[rows], method[rows] = r[best], dice[best], "fuzzy"
+
+        linked = target >= 0
+        places["linked_city"] = np.where(linked, self.places["city"].to_numpy(dtype=object)[target], None)
+        places["score"] = score
+        places["method"] = method
+        return places
+
+def read_crosswalk(path: str) -> pd.DataFrame:
+    """
+    The persisted crosswalk (empty if there is none yet).
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=CROSSWALK_COLUMNS)
+    crosswalk = pd.read_csv(path, dtype=str, keep_default_na=False)
+    crosswalk["linked_city"] = crosswalk["linked_city"].replace("", None)
+    crosswalk["score"] = pd.to_numeric(crosswalk["score"])
+    return crosswalk[CROSSWALK_COLUMNS]
+
+def write_crosswalk(crosswalk: pd.DataFrame, path: str) -> None:
+    """
+    Writes the crosswalk CSV (see atomic_write).
+    """
+    atomic_write(path, lambda tmp_path: crosswalk.sort_values(["source", "reference", "state", "city"])
+                 .to_csv(tmp_path, index=False))
+
+def apply_links(df: pd.DataFrame, links: pd.DataFrame, source: str) -> pd.DataFrame:
+    """
+    Renames linked places of df to their reference names. A rename that would collide
+    with a row already carrying that name (same year, if df has one) is not applied.
+    """
+    links = links[links["linked_city"].notna()]
+    if links.empty or df.empty:
+        return df
+    places = df[PLACE_KEYS].astype(object)
+    hit = pd.MultiIndex.from_frame(links[PLACE_KEYS]).get_indexer(pd.MultiIndex.from_frame(places))
+    renamed = hit >= 0
+    city = places["city"].to_numpy(dtype=object).copy()
+    city[renamed] = links["linked_city"].to_numpy(dtype=object)[hit[renamed]]
+    keys = PLACE_KEYS + (["year"] if "year" in df.columns else [])
+    candidate = pd.DataFrame({"state": places["state"].to_numpy(dtype=object), "city": city},
+                             index=df.index).assign(**({"year": df["year"]} if "year" in df.columns else {}))
+    collides = candidate.duplicated(keys, keep=False).to_numpy() & renamed
+    if collides.any():
+        print(f"WARNING: {source}: {int(collides.sum())} linked rows would duplicate a place already present; "
+              "keeping their own names.", file=sys.stderr)
+        city[collides] = places["city"].to_numpy(dtype=object)[collides]
+    df = df.copy()
+    df["city"] = city
+    return df
+
+def link_places(frames: Dict[str, pd.DataFrame], reference: str = "fisc", crosswalk_path: Optional[str] = None,
+                rebuild: bool = False, min_similarity: float = MIN_SIMILARITY) -> Dict[str, pd.DataFrame]:
+    """
+    Renames the places of every frame other than reference to the reference's name for
+    the same place (see the module docstring) and returns the frames. With crosswalk_path,
+    links are read from and added to that CSV (rebuild=True starts it afresh).
+    Prints per source pair the share of reference places found, the link counts by
+    method, and the time taken.
+    """
+    index = NameIndex(frames[reference], min_similarity=min_similarity)
+    use_crosswalk = crosswalk_path is not None
+    crosswalk = read_crosswalk(crosswalk_path) if use_crosswalk and not rebuild else \
+        pd.DataFrame(columns=CROSSWALK_COLUMNS)
+    updated = False
+    out = dict(frames)
+    for name, df in frames.items():
+        if name == reference or df.empty:
+            continue
+        start = time.perf_counter()
+        # Distinct names with a bit mask of the periods (years) they occur in
+        rows = df[PLACE_KEYS].astype(object).assign(period=df["year"] if "year" in df.columns else 0)
+        rows = rows.dropna().drop_duplicates()
+        # Beyond 63 periods bits are shared, which only makes the exclusion below stricter
+        rows["periods"] = np.left_shift(1, pd.factorize(rows["period"])[0] % 63).astype(np.int64)
+        names = rows.groupby(PLACE_KEYS, sort=False)["periods"].sum().reset_index()
+        exact = index.contains(names)
+        queries = names[~exact].reset_index(drop=True)
+        queries["block"] = queries["state"].map(index.blocks).fillna("")
+
+        # Crosswalk rows for this pair whose state's reference names have not changed
+        known = crosswalk[(crosswalk["source"] == name) & (crosswalk["reference"] == reference)]
+        known = queries[PLACE_KEYS + ["block"]].merge(known.drop(columns=["source", "reference"]),
+                                                      on=PLACE_KEYS + ["block"], how="inner")
+        new = queries[~pd.MultiIndex.from_frame(queries[PLACE_KEYS]).isin(
+            pd.MultiIndex.from_frame(known[PLACE_KEYS]))] if len(known) else queries
+        present = index.positions.get_indexer(pd.MultiIndex.from_frame(names.loc[exact, PLACE_KEYS]))
+        fresh = index.link(new, occupied=dict(zip(present, names.loc[exact, "periods"])))
+        fresh["block"] = new["block"].to_numpy()
+        links = fresh if known.empty else known if fresh.empty else pd.concat([known, fresh], ignore_index=True)
+        out[name] = apply_links(df, links, name)
+
+        if use_crosswalk and len(new):
+            stale = (crosswalk["source"] == name) & (crosswalk["reference"] == reference) & \
+                pd.MultiIndex.from_frame(crosswalk[PLACE_KEYS]).isin(pd.MultiIndex.from_frame(new[PLACE_KEYS]))
+            added = fresh.assign(source=name, reference=reference)[CROSSWALK_COLUMNS]
+            kept = crosswalk[~stale]
+            crosswalk = pd.concat([kept, added], ignore_index=True) if len(kept) else added
+            updated = True
+
+        elapsed = time.perf_counter() - start
+        found = index.contains(out[name][PLACE_KEYS].astype(object).dropna().drop_duplicates())
+        counts = links["method"].value_counts()
+        print(f"Place linkage {name}->{reference}: {int(found.sum())}/{len(index)} {reference} places found "
+              f"({int(exact.sum())} exact names, {counts.get('normalized', 0)} normalized, "
+              f"{counts.get('fuzzy', 0)} fuzzy links, {counts.get('none', 0)} unlinked; "
+              f"{len(known)} from the crosswalk, {len(new)} compared), {elapsed:.3f}s", file=sys.stderr)
+
+    if updated:
+        write_crosswalk(crosswalk, crosswalk_path)
+    return out
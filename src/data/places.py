@@ -0,0 +1,77 @@
+import sys
+import numpy as np
+import pandas as pd
+from typing import Sequence
+
+# Place registry: every distinct (state, cleaned city) pair seen at ingest gets a compact
+# int32 place_id (pairs sorted by state, then city). Joins, panel filters and
+# groupby-shifts then run on one integer column instead of string city/state keys.
+# Rows whose state or city is missing get MISSING_PLACE.
+
+PLACE_KEYS = ["state", "city"]
+MISSING_PLACE = -1
+
+class PlaceRegistry:
+    """
+    Maps (state, city) to place_id. Built once from the ingested frames.
+    """
+    def __init__(self, places: pd.DataFrame):
+        # Plain strings, so the id order is lexical whatever the input dtype (object or category)
+        places = places[PLACE_KEYS].astype(object).dropna().drop_duplicates()
+        places = places.sort_values(PLACE_KEYS, kind="stable").reset_index(drop=True)
+        self.index = pd.MultiIndex.from_frame(places)
+
+    @classmethod
+    def from_frames(cls, *frames: pd.DataFrame) -> "PlaceRegistry":
+        return cls(pd.concat([f[PLACE_KEYS] for f in frames if not f.empty], ignore_index=True))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def ids(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        place_id for each row of df (MISSING_PLACE for unknown or incomplete keys).
+        """
+        if df.empty:
+            return np.empty(0, dtype=np.int32)
+        return self.index.get_indexer(pd.MultiIndex.from_frame(df[PLACE_KEYS])).astype(np.int32)
+
+    def assign(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Sets df['place_id'] in place and returns df.
+        """
+        df["place_id"] = self.ids(df)
+        return df
+
+    def labels(self) -> pd.DataFrame:
+        """
+        One row per place: place_id, state, city.
+        """
+        labels = self.index.to_frame(index=False)
+        labels.insert(0, "place_id", np.arange(len(labels), dtype=np.int32))
+        return labels
+
+def assign_place_ids(*frames: pd.DataFrame) -> PlaceRegistry:
+    """
+    Builds the registry over all frames and adds a place_id column to each of them.
+    """
+    registry = PlaceRegistry.from_frames(*frames)
+    for df in frames:
+        registry.assign(df)
+    return registry
+
+def drop_duplicate_keys(df: pd.DataFrame, keys: Sequence[str], source: str) -> pd.DataFrame:
+    """
+    Keeps the first row per key and reports any conflicts on stderr, so a join on
+    keys cannot multiply rows. Rows without a place are dropped.
+    """
+    df = df[df["place_id"] != MISSING_PLACE] if "place_id" in keys else df
+    duplicated = df.duplicated(list(keys), keep=False)
+    if duplicated.any():
+        conflicts = df.loc[duplicated].drop_duplicates(list(keys))
+        shown = list(keys) + [c for c in PLACE_KEYS if c in df.columns and c not in keys]
+        examples = ", ".join(str(tuple(r)) for r in conflicts[shown].head(5).itertuples(index=False))
+        print(f"WARNING: {source}: {len(conflicts)} duplicate {'/'.join(keys)} keys "
+              f"({int(duplicated.sum())} rows); keeping the first row of each. E.g. {examples}", file=sys.stderr)
+        df = df[~df.duplicated(list(keys), keep="first")]
+    return df
@@ -1,90 +1,194 @@
-import modin.pandas as pd
+import pandas as pd
 import numpy as np
 import sys
-from typing import Optional, List
+from typing import Dict, List, Optional, Sequence, Tuple
 from src.data.functional import pipe
+from src.data.places import assign_place_ids, drop_duplicate_keys
+from src.data.schema import apply_schema
+from src.backend import dataframe_module
 
-def load_and_merge(fisc: pd.DataFrame, cius: pd.DataFrame, acs: pd.DataFrame) -> pd.DataFrame:
+# Covariates of the propensity model
+COVARIATES = ["population_density", "median_income", "poverty_rate", "male_15_24"]
+# Pre and post years of the difference-in-differences
+DID_YEARS = (2015, 2019)
+
+def panel_features(df: pd.DataFrame, variables: List[str], lags: Sequence[int] = (1,), leads: Sequence[int] = (),
+                   diffs: Sequence[int] = (), unit: str = "place_id", time: str = "year") -> pd.DataFrame:
     """
-    Merges the three datasets on matching City and Year.
+    Adds lags, leads and differences of several variables in one vectorized pass.
+
+    Offsets are in units of the time column, not rows: {var}_lag_k is the value of the
+    same unit at time - k, {var}_lead_k at time + k, and {var}_diff_k = var - {var}_lag_k.
+    A unit missing that period (an unbalanced panel, a skipped year) gets NaN, as do
+    offsets that run past the start or end of its series. df must have one row per
+    (unit, time); rows keep their order. Returns df with the new columns.
+
+    Each (unit, time) pair is encoded as one integer key and the rows are sorted by key
+    once; every offset is then one searchsorted of sorted keys, shared by all variables.
     """
-    # Functional merge pipeline
-    # 1. Merge FiSC and FBI (Longitudinal)
-    # We need both 2015 and 2019 to exist for a city to do DiD.
-    # Inner join on city/year will give us rows for both years if they exist in both.
-    df_panel = fisc.merge(cius, on=["city", "year"], how="inner")
-    
-    # 2. Calculate Delta Crime (2019 - 2015)
-    # Pivot or Self-Join
-    # Let's filter for just the years we care about to simplify
-    df_panel = df_panel[df_panel['year'].isin([2015, 2019])].copy()
-    
-    # Check if we have enough data
-    counts = df_panel['city'].value_counts()
-    valid_cities = counts[counts == 2].index # Cities present in BOTH years
-    df_panel = df_panel[df_panel['city'].isin(valid_cities)]
-    
-    if df_panel.empty:
-        # Fallback for 2019 only if no historical matches (e.g. if 2015 load failed)
-        print("WARNING: No overlapping cities 2015-2019. DiD impossible. Reverting to Cross-Section.", file=sys.stderr)
-        merged_1 = fisc.merge(cius, on=["city", "year"], how="inner")
-        merged = merged_1.merge(acs, on=["city", "year"], how="inner")
-        # Add dummy delta
-        if not 'violent_crime_rate' in merged.columns:
+    codes = pd.factorize(df[unit].to_numpy(), sort=False)[0].astype(np.int64)
+    t = df[time].to_numpy().astype(np.int64)
+    if (codes < 0).any():
+        raise ValueError(f"panel_features: missing values in {unit}")
+    t_min, t_max = (int(t.min()), int(t.max())) if len(t) else (0, 0)
+    keys = codes * (t_max - t_min + 1) + (t - t_min)
+    # Everything below runs in key order, where the shifted keys are sorted too
+    order = np.argsort(keys, kind="stable")
+    keys, t = keys[order], t[order]
+    if len(keys) and (np.diff(keys) == 0).any():
+        raise ValueError(f"panel_features: duplicate ({unit}, {time}) rows")
+
+    def column(v: str) -> np.ndarray:
+        # Nullable (extension) columns come out as float with NaN for <NA>
+        x = (df[v].to_numpy(dtype=np.float64, na_value=np.nan) if pd.api.types.is_extension_array_dtype(df[v])
+             else df[v].to_numpy())
+        return x[order].astype(np.result_type(x.dtype, np.float32), copy=False)
+    values = {v: column(v) for v in variables}
+
+    def shifted(k: int) -> Dict[str, np.ndarray]:
+        # Row of (unit, time - k) for every row, shared by all variables; the key arithmetic
+        # stays inside the unit because targets outside [t_min, t_max] are rejected first
+        target = keys - k
+        pos = np.minimum(np.searchsorted(keys, target), max(len(keys) - 1, 0))
+        missing = ~((t - k >= t_min) & (t - k <= t_max) & (keys[pos] == target))
+        out = {}
+        for v, x in values.items():
+            out[v] = x[pos]
+            out[v][missing] = np.nan
+        return out
+
+    def unsorted(x: np.ndarray) -> np.ndarray:
+        back = np.empty_like(x)
+        back[order] = x
+        return back
+
+    new = {}
+    for k in sorted(set(lags) | set(diffs)):
+        lagged = shifted(k)
+        for v in variables:
+            if k in lags:
+                new[f"{v}_lag_{k}"] = unsorted(lagged[v])
+            if k in diffs:
+                new[f"{v}_diff_{k}"] = unsorted(values[v] - lagged[v])
+    for k in leads:
+        led = shifted(-k)
+        for v in variables:
+            new[f"{v}_lead_{k}"] = unsorted(led[v])
+    for name, col in new.items():
+        df[name] = col
+    return df
+
+def load_and_merge(fisc: pd.DataFrame, cius: pd.DataFrame, acs: pd.DataFrame,
+                   years: Tuple[int, int] = DID_YEARS) -> pd.DataFrame:
+    """
+    Builds the DiD analysis frame: one row per place with FBI crime in both years,
+    the change between them, spending (FiSC) and demographics (ACS) for the later year.
+    All joins run on the integer place_id assigned at ingest (see src.data.places).
+    """
+    pre, post = years
+    if not all("place_id" in f.columns for f in (fisc, cius, acs)):
+        # Frames that did not come through load_raw_data: register their places now
+        fisc, cius, acs = fisc.copy(), cius.copy(), acs.copy()
+        assign_place_ids(fisc, cius, acs)
+
+    # 1. FBI panel for the two years, one row per place-year (rows and columns in one copy)
+    crime = cius.loc[cius['year'].isin([pre, post]), ['place_id', 'city', 'state', 'year',
+                                                      'violent_crime_rate', 'property_crime_rate']]
+    crime = drop_duplicate_keys(crime, ['place_id', 'year'], "FBI")
+
+    # 2. Delta Crime (post - pre): the lag is the same place's value post - pre years earlier,
+    # so places missing either year get no delta (violent_crime_rate is never missing at ingest)
+    gap = post - pre
+    crime = panel_features(crime, ['violent_crime_rate', 'property_crime_rate'], lags=(gap,), diffs=(gap,))
+    crime = crime.rename(columns={
+        f'violent_crime_rate_lag_{gap}': 'violent_crime_lag', f'violent_crime_rate_diff_{gap}': 'delta_violent_crime',
+        f'property_crime_rate_lag_{gap}': 'property_crime_lag', f'property_crime_rate_diff_{gap}': 'delta_property_crime',
+    })
+    at_post = crime['year'] == post
+    # Keep only post rows of places present in BOTH years (they carry the Delta)
+    df_post = crime[at_post & crime['violent_crime_lag'].notna()]
+
+    # Supplementary frames: one row per place for the later year
+    spending = drop_duplicate_keys(fisc.loc[fisc['year'] == post, ['place_id', 'police_spending']], ['place_id'], "FiSC")
+    demographics = drop_duplicate_keys(acs.loc[acs['year'] == post, ['place_id'] + COVARIATES], ['place_id'], "ACS")
+
+    if df_post.empty:
+        # Fallback for the later year only if no place has both years (e.g. if the earlier load failed)
+        print(f"WARNING: No overlapping cities {pre}-{post}. DiD impossible. Reverting to Cross-Section.", file=sys.stderr)
+        cross = crime.loc[at_post, ['place_id', 'city', 'state', 'year', 'violent_crime_rate', 'property_crime_rate']]
+        if cross.empty:
              # handle case where merge failed
-             return pd.DataFrame()
-        merged['delta_violent_crime'] = 0 
-        return merged
-
-    # Compute Delta
-    # Sort and Shift
-    df_panel = df_panel.sort_values(by=['city', 'year'])
-    df_panel['violent_crime_lag'] = df_panel.groupby('city')['violent_crime_rate'].shift(1) # 2015 value shifts to 2019 row
-    df_panel['delta_violent_crime'] = df_panel['violent_crime_rate'] - df_panel['violent_crime_lag']
-    
-    # Add Property Delta (Placebo)
-    df_panel['property_crime_lag'] = df_panel.groupby('city')['property_crime_rate'].shift(1)
-    df_panel['delta_property_crime'] = df_panel['property_crime_rate'] - df_panel['property_crime_lag']
-    
-    # Keep only 2019 rows (which now have the Delta)
-    df_2019 = df_panel[df_panel['year'] == 2019].copy()
-    
-    # 3. Merge ACS (2019 only)
-    merged = df_2019.merge(acs, on=["city", "year"], how="inner")
+             return dataframe_module().DataFrame()
+        merged = cross.merge(spending, on='place_id', how='inner', validate='one_to_one')
+        merged = merged.merge(demographics, on='place_id', how='inner', validate='one_to_one')
+        return apply_schema(merged, "analysis")
+
+    # 3. Attach spending and demographics
+    merged = df_post.merge(spending, on='place_id', how='inner', validate='one_to_one')
+    merged = merged.merge(demographics, on='place_id', how='inner', validate='one_to_one')
     
-    return merged
+    # Dtypes carried through from ingest; this only enforces them
+    return apply_schema(merged, "analysis")
 
 def create_lagged_variables(df: pd.DataFrame, lag_vars: List[str], lags: int = 1) -> pd.DataFrame:
     """
-    Creates lagged versions of specified variables by City.
+    Creates lagged versions of specified variables by place (lags in years, see panel_features).
+    Returns the rows that have every lag, ordered by place and year.
     """
-    # Ensure ordered by year
-    df = df.sort_values(by=["city", "year"])
-    
-    for var in lag_vars:
-        df[f"{var}_lag_{lags}"] = df.groupby("city")[var].shift(lags)
-        
-    return df.dropna() # Drop rows without valid lags
+    unit = "place_id" if "place_id" in df.columns else "city"
+    df = panel_features(df.copy(), lag_vars, lags=(lags,), unit=unit)
+    df = df.sort_values(by=[unit, "year"])
+    return df.dropna(subset=[f"{var}_lag_{lags}" for var in lag_vars]) # Drop rows without valid lags
 
-def binarize_treatment(df: pd.DataFrame, treatment_col: str = "police_spending") -> pd.DataFrame:
+def digitize_codes(values: np.ndarray, edges: np.ndarray, codes: np.ndarray) -> np.ndarray:
     """
-    Converts continuous spending into Binary Treatment groups (Top vs Bottom Quartile).
-    Drops middle quartiles.
+    Treatment code of each value in one vectorized pass: the bin index from np.digitize
+    (bin k holds edges[k-1] <= value < edges[k]) looked up in codes, which has one entry
+    per bin (len(edges) + 1). Missing values get -1.
     """
-    q1 = df[treatment_col].quantile(0.25)
-    q4 = df[treatment_col].quantile(0.75)
-    
-    def assign_group(val):
-        if val >= q4:
-            return 1 # High Investment
-        elif val <= q1:
-            return 0 # Low Investment
-        else:
-            return -1 # Middle (Exclude)
-            
-    # Apply logic
-    df["treatment"] = df[treatment_col].apply(assign_group)
-    
+    values = np.asarray(values, dtype=np.float64)
+    out = np.asarray(codes, dtype=np.int8)[np.digitize(values, edges)]
+    out[np.isnan(values)] = -1
+    return out
+
+def assign_treatment(df: pd.DataFrame, treatment_col: str = "police_spending", n_arms: Optional[int] = None,
+                     quantiles: Optional[List[float]] = None, cutpoints: Optional[List[float]] = None,
+                     exclude: Tuple[int, ...] = (), out_col: str = "treatment") -> pd.DataFrame:
+    """
+    Codes continuous spending into ordered arms 0..k. Arms are bounded by exactly one of:
+    n_arms equal-count bins (e.g. 5 for quintiles), quantiles of treatment_col, or fixed
+    cutpoints in treatment_col units. Arms listed in exclude are dropped, like the middle
+    of binarize_treatment. Returns the kept rows with out_col set.
+    """
+    if sum(x is not None for x in (n_arms, quantiles, cutpoints)) != 1:
+        raise ValueError("Give exactly one of n_arms, quantiles or cutpoints")
+    if n_arms is not None:
+        quantiles = np.linspace(0, 1, n_arms + 1)[1:-1]
+    edges = (df[treatment_col].quantile(list(quantiles)).to_numpy() if cutpoints is None
+             else np.asarray(cutpoints, dtype=np.float64))
+    if np.any(np.diff(edges) < 0):
+        raise ValueError(f"Arm edges must be increasing: {edges}")
+
+    codes = np.arange(len(edges) + 1)
+    codes[list(exclude)] = -1
+    df[out_col] = digitize_codes(df[treatment_col].to_numpy(), edges, codes)
+    return df[df[out_col] != -1].copy()
+
+def binarize_treatment(df: pd.DataFrame, treatment_col: str = "police_spending",
+                       low_q: float = 0.25, high_q: float = 0.75) -> pd.DataFrame:
+    """
+    Converts continuous spending into Binary Treatment groups (Top vs Bottom Quartile by default).
+    Units at or above the high_q quantile are treated, at or below low_q are controls;
+    the middle is dropped.
+    """
+    q1 = df[treatment_col].quantile(low_q)
+    q4 = df[treatment_col].quantile(high_q)
+
+    # Bins: <= q1 (control), between (excluded), >= q4 (treated). The first edge is
+    # nudged up one ulp so that values equal to q1 land in the control bin.
+    edges = np.array([min(np.nextafter(q1, np.inf), q4), q4])
+    df["treatment"] = digitize_codes(df[treatment_col].to_numpy(), edges, np.array([0, -1, 1]))
+
     # Filter
     final_df = df[df["treatment"] != -1].copy()
     return final_df
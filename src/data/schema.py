@@ -0,0 +1,82 @@
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+# Column dtypes of the normalized frames.
+# Place labels repeat across years and sources, so they are categorical; place_id and
+# year are small integers; rates, spending and covariates are float32 (7 significant
+# digits, well beyond the precision of the sources). Estimation code upcasts to
+# float64 when it pulls arrays out. Crime counts use nullable Int32, because agencies
+# that did not report a count must stay missing rather than become 0 or turn the
+# column into float.
+PLACE_DTYPES = {"city": "category", "state": "category", "place_id": "int32", "year": "int16"}
+COVARIATE_DTYPES = {c: "float32" for c in ["population_density", "median_income", "poverty_rate", "male_15_24"]}
+RATE_DTYPES = {"violent_crime_rate": "float32", "property_crime_rate": "float32"}
+
+SCHEMAS: Dict[str, Dict[str, str]] = {
+    "fisc": dict(PLACE_DTYPES, police_spending="float32"),
+    "fbi": dict(PLACE_DTYPES, population="Int32", violent_crime="Int32", property_crime="Int32", **RATE_DTYPES),
+    "acs": dict(PLACE_DTYPES, **COVARIATE_DTYPES),
+    # load_and_merge output: one row per place
+    "analysis": dict(PLACE_DTYPES, police_spending="float32",
+                     violent_crime_lag="float32", delta_violent_crime="float32",
+                     property_crime_lag="float32", delta_property_crime="float32",
+                     **RATE_DTYPES, **COVARIATE_DTYPES),
+}
+
+# Columns every frame of that kind must carry; the rest of the schema applies if present
+REQUIRED = {
+    "fisc": ["city", "state", "year", "police_spending"],
+    "fbi": ["city", "state", "year", "violent_crime_rate", "property_crime_rate"],
+    "acs": ["city", "state", "year"] + list(COVARIATE_DTYPES),
+    "analysis": ["city", "state", "year", "police_spending", "violent_crime_rate"] + list(COVARIATE_DTYPES),
+}
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """
+    Resident size of df in MB, counting the Python strings behind object columns.
+    """
+    return df.memory_usage(index=True, deep=True).sum() / 2 ** 20
+
+def _cast(col: pd.Series, dtype: str) -> pd.Series:
+    if dtype == "category":
+        return col.astype(object).where(col.notna(), None).astype("category")
+    if dtype.startswith("int"):
+        if col.isna().any():
+            raise ValueError(f"Column {col.name!r} has missing values but the schema requires {dtype}")
+        info = np.iinfo(dtype)
+        if len(col) and (col.min() < info.min or col.max() > info.max):
+            raise ValueError(f"Column {col.name!r} does not fit in {dtype}")
+    if dtype.startswith("Int"):
+        # Nullable counts: coerce stray strings/floats, keep missing as <NA>
+        return pd.to_numeric(col, errors="coerce").round().astype(dtype)
+    return col.astype(dtype)
+
+def apply_schema(df: pd.DataFrame, name: str, report: bool = False) -> pd.DataFrame:
+    """
+    Casts the columns of df named in SCHEMAS[name] to their schema dtypes and returns the
+    new frame; df itself is not modified, and a frame that already conforms is returned
+    as is. Raises ValueError if a required column is missing or an integer column does
+    not fit. report=True prints the memory saved.
+    """
+    if name not in SCHEMAS:
+        raise ValueError(f"Unknown schema {name!r}; expected one of {sorted(SCHEMAS)}")
+    if df.empty and len(df.columns) == 0:
+        return df
+    missing = [c for c in REQUIRED[name] if c not in df.columns]
+    if missing:
+        raise ValueError(f"{name} frame is missing columns {missing}")
+
+    schema = SCHEMAS[name]
+    casts = {c: _cast(df[c], schema[c]) for c in df.columns if c in schema and str(df[c].dtype) != schema[c]}
+    if not casts and not report:
+        # Already conforming: no copy
+        return df
+    before = memory_mb(df) if report else 0.0
+    out = df.assign(**casts) if casts else df
+    if report:
+        after = memory_mb(out)
+        print(f"Schema {name}: {len(out)} rows, {before:.2f} MB -> {after:.2f} MB "
+              f"({before / after if after else 1:.1f}x smaller)", file=sys.stderr)
+    return out
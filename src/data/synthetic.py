@@ -0,0 +1,204 @@
+"""
+Synthetic FiSC / FBI Table 8 / ACS inputs with a planted treatment effect.
+
+Files are written in the layouts load_raw_data parses (same names, headers, place
+label formats, Table 8 title rows and blank state cells, footnote digits), so the
+whole pipeline runs on them unchanged. Small scales are written as Excel like the
+real inputs; larger ones as CSV with the same layout (Excel stops at 1,048,576 rows).
+
+Planted effect: cities whose police spending is at or above the median get
+`att` more violent crimes per 100k in the last year than they would otherwise.
+Any top-vs-bottom split around the median (e.g. the quartiles of binarize_treatment)
+therefore has a true ATT of `att`. Spending depends on income and poverty, which
+also drive crime, so the naive difference is biased and matching has work to do.
+
+Run with:
+    python -m src.data.synthetic --units 100000 --out data/synthetic/n100000
+"""
+import argparse
+import json
+import os
+import string
+import sys
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Sequence
+from src.data.ingest import ACS_PATH, FISC_PATH, us_state_abbrev
+
+PLANTED_ATT = 50.0
+SYNTHETIC_YEARS = (2015, 2019)
+# Above this many units the inputs are written as CSV instead of Excel
+EXCEL_MAX_UNITS = 20_000
+# Title rows above the Table 8 header (load_fbi_year reads header=3)
+FBI_TITLE_ROWS = ["Table 8", "Offenses Known to Law Enforcement", "by State by City, {year}"]
+# "District Of Columbia" does not survive str.title() in map_states, so DC is left out
+SYNTHETIC_STATES = [s for s in us_state_abbrev if s != "District of Columbia"]
+
+def _unit_names(n: int) -> np.ndarray:
+    """
+    Distinct letter-only names ("Synaaab", ...), so no cleaning step can merge two units.
+    """
+    width = max(1, int(np.ceil(np.log(max(n, 2)) / np.log(26))))
+    digits = (np.arange(n)[:, None] // 26 ** np.arange(width)[::-1]) % 26
+    letters = np.array(list(string.ascii_lowercase))[digits]
+    stems = np.ascontiguousarray(letters).view(f"<U{width}").ravel()
+    return np.char.add("Syn", stems).astype(object)
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    return (x - x.mean()) / x.std()
+
+def simulate_units(n_units: int, seed: int = 0, att: float = PLANTED_ATT,
+                   years: Sequence[int] = SYNTHETIC_YEARS) -> pd.DataFrame:
+    """
+    One row per city: place labels, covariates, spending, treatment and per-year crime.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_units
+    states = np.array(SYNTHETIC_STATES, dtype=object)[rng.integers(0, len(SYNTHETIC_STATES), n)]
+    units = pd.DataFrame({
+        "state_name": states,
+        "state": pd.Series(states).map(us_state_abbrev).to_numpy(),
+        "name": _unit_names(n),
+        "population": np.maximum(np.round(rng.lognormal(10, 1, n)), 5000).astype(np.int64),
+        "population_density": rng.lognormal(7, 1, n),
+        "median_income": np.maximum(rng.normal(55000, 15000, n), 10000),
+        "poverty_rate": rng.beta(2, 10, n),
+        "male_15_24": rng.beta(5, 60, n),
+    })
+    z_inc, z_pov = _zscore(units["median_income"].to_numpy()), _zscore(units["poverty_rate"].to_numpy())
+    z_dens, z_male = _zscore(np.log(units["population_density"].to_numpy())), _zscore(units["male_15_24"].to_numpy())
+
+    # Spending per capita: richer and poorer-than-average cities both spend more
+    units["police_spending"] = np.exp(5.5 + 0.4 * z_inc + 0.3 * z_pov + rng.normal(0, 0.4, n))
+    units["treated"] = units["police_spending"] >= np.median(units["police_spending"])
+
+    base = 350 + 80 * z_pov - 40 * z_inc + 30 * z_dens + 20 * z_male + rng.normal(0, 40, n)
+    trend = 10 + 20 * z_pov
+    first, last = min(years), max(years)
+    for year in years:
+        share = (year - first) / (last - first) if last > first else 1.0
+        violent = base + share * trend + rng.normal(0, 30, n)
+        if year == last:
+            violent = violent + att * units["treated"].to_numpy()
+        units[f"violent_crime_rate_{year}"] = np.maximum(violent, 1.0)
+        units[f"property_crime_rate_{year}"] = np.maximum(3 * base + share * trend + rng.normal(0, 90, n), 1.0)
+    return units
+
+def _fbi_frame(units: pd.DataFrame, year: int, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Table 8 rows: grouped by state, state label only on the first row of each group,
+    footnote digits on some city and state labels, counts rather than rates.
+    """
+    units = units.sort_values(["state_name", "name"], kind="stable")
+    pop = units["population"].to_numpy()
+    first_of_state = ~units["state_name"].duplicated().to_numpy()
+    state_label = units["state_name"].str.upper().to_numpy().astype(object)
+    state_label[rng.random(len(units)) < 0.1] += "1"
+    city = units["name"].to_numpy().astype(object)
+    footnoted = rng.random(len(units)) < 0.15
+    city[footnoted] = city[footnoted] + "3"
+    return pd.DataFrame({
+        "State": np.where(first_of_state, state_label, None),
+        "City": city,
+        "Population": pop,
+        "Violent\ncrime": np.round(units[f"violent_crime_rate_{year}"].to_numpy() * pop / 1e5).astype(np.int64),
+        "Murder and\nnonnegligent\nmanslaughter": rng.poisson(1, len(units)),
+        "Property\ncrime": np.round(units[f"property_crime_rate_{year}"].to_numpy() * pop / 1e5).astype(np.int64),
+    })
+
+def _acs_frame(units: pd.DataFrame, year: int) -> pd.DataFrame:
+    suffix = np.array([" city", " town", " village"], dtype=object)[np.arange(len(units)) % 3]
+    return pd.DataFrame({
+        "city_raw": units["name"].to_numpy() + suffix + ", " + units["state_name"].to_numpy(),
+        "population_density": units["population_density"],
+        "median_income": units["median_income"],
+        "poverty_rate": units["poverty_rate"],
+        "male_15_24": units["male_15_24"],
+        "year": year,
+    })
+
+def _fisc_frame(units: pd.DataFrame, year: int) -> pd.DataFrame:
+    # Spending grows ~2% a year up to the reported level in the last year
+    growth = 1.02 ** (year - max(SYNTHETIC_YEARS))
+    return pd.DataFrame({
+        "year": year,
+        "id_city": np.arange(len(units)),
+        "city": units["name"],
+        "city_name": units["state"] + ": " + units["name"],
+        "police": units["police_spending"] * growth,
+    })
+
+def write_synthetic(out_dir: str, n_units: int, seed: int = 0, att: float = PLANTED_ATT,
+                    years: Sequence[int] = SYNTHETIC_YEARS, fmt: str = "auto") -> Dict[str, Any]:
+    """
+    Writes FiSC, FBI Table 8 (one file per year) and ACS inputs for n_units cities to out_dir,
+    plus synthetic.json describing them. fmt: "excel", "csv" or "auto" (by EXCEL_MAX_UNITS).
+    Returns the metadata written to synthetic.json.
+    """
+    if fmt == "auto":
+        fmt = "excel" if n_units <= EXCEL_MAX_UNITS else "csv"
+    if fmt not in ("excel", "csv"):
+        raise ValueError(f"Unknown synthetic format: {fmt}")
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed + 1)
+    units = simulate_units(n_units, seed, att, years)
+    stem = os.path.splitext(os.path.basename(FISC_PATH))[0]
+
+    print(f"Writing {n_units} synthetic units ({fmt}) to {out_dir}...", file=sys.stderr)
+    if fmt == "excel":
+        fisc_path = os.path.join(out_dir, stem + ".xlsx")
+        with pd.ExcelWriter(fisc_path, engine="openpyxl") as writer:
+            pd.DataFrame({"About": ["Synthetic FiSC extract"]}).to_excel(writer, sheet_name="About", index=False)
+            pd.DataFrame([["Fiscally Standardized Cities (synthetic)"], [None]]).to_excel(
+                writer, sheet_name="FiSC Data", index=False, header=False)
+            fisc = pd.concat([_fisc_frame(units, y) for y in years])
+            fisc.to_excel(writer, sheet_name="FiSC Data", index=False, startrow=2)
+    else:
+        fisc_path = os.path.join(out_dir, stem + ".csv")
+        for i, year in enumerate(years):
+            _fisc_frame(units, year).to_csv(fisc_path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+
+    fbi_paths = {}
+    for year in years:
+        fbi = _fbi_frame(units, year, rng)
+        titles = [t.format(year=year) for t in FBI_TITLE_ROWS]
+        if fmt == "excel":
+            path = os.path.join(out_dir, f"FBI_CIUS_{year}_Table8.xlsx")
+            with pd.ExcelWriter(path, engine="openpyxl") as writer:
+                pd.DataFrame([[t] for t in titles]).to_excel(writer, index=False, header=False)
+                fbi.to_excel(writer, index=False, startrow=len(titles))
+        else:
+            path = os.path.join(out_dir, f"FBI_CIUS_{year}_Table8.csv")
+            with open(path, "w", newline="") as fh:
+                fh.write("".join(f"{t}\n" for t in titles))
+                fbi.to_csv(fh, index=False)
+        fbi_paths[year] = path
+
+    acs_path = os.path.join(out_dir, os.path.basename(ACS_PATH))
+    _acs_frame(units, max(years)).to_csv(acs_path, index=False)
+
+    meta = {
+        "n_units": n_units,
+        "seed": seed,
+        "att": att,
+        "years": list(years),
+        "format": fmt,
+        "treatment": "police_spending >= median",
+        "files": {"fisc": fisc_path, "fbi": {str(y): p for y, p in fbi_paths.items()}, "acs": acs_path},
+    }
+    with open(os.path.join(out_dir, "synthetic.json"), "w") as fh:
+        json.dump(meta, fh, indent=2)
+    return meta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic FiSC/FBI/ACS inputs with a planted ATT.")
+    parser.add_argument("--units", type=int, default=10_000)
+    parser.add_argument("--out", default=None, help="Output directory (default data/synthetic/n<units>).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--att", type=float, default=PLANTED_ATT)
+    parser.add_argument("--format", choices=["auto", "excel", "csv"], default="auto")
+    args = parser.parse_args(argv)
+    write_synthetic(args.out or f"data/synthetic/n{args.units}", args.units, args.seed, args.att, fmt=args.format)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import numpy as np
+from typing import Optional, Tuple
+
+# Matching engines on several covariates at once (Mahalanobis distance).
+# Control covariates are whitened, so that Euclidean distance between whitened rows is
+# the Mahalanobis distance, and indexed in a KD-tree once. Nearest and radius queries
+# then visit O(log n_c) leaves instead of every control, and the same index serves
+# any k, covariate radius or propensity caliper.
+
+def pooled_covariance(X: np.ndarray, treat: np.ndarray) -> np.ndarray:
+    """
+    Pooled within-group covariance of the columns of X: deviations are taken from the
+    treated and control means separately, so the treatment contrast does not inflate it.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    treat = np.asarray(treat)
+    centered = X.copy()
+    for g in (0, 1):
+        rows = treat == g
+        if rows.any():
+            centered[rows] -= X[rows].mean(axis=0)
+    return centered.T @ centered / max(len(X) - 2, 1)
+
+def whitening_matrix(cov: np.ndarray) -> np.ndarray:
+    """
+    W such that ||(x - y) @ W|| is the Mahalanobis distance under cov. Directions with
+    (numerically) zero variance are dropped instead of failing on a singular matrix.
+    """
+    cov = np.atleast_2d(np.asarray(cov, dtype=np.float64))
+    eigval, eigvec = np.linalg.eigh(cov)
+    keep = eigval > eigval.max() * 1e-12
+    return eigvec[:, keep] / np.sqrt(eigval[keep])
+
+class CovariateIndex:
+    """
+    Whitened control covariates in a KD-tree (tree="ball" for a BallTree), plus the
+    controls' PS logits, sorted, when a propensity caliper is to be enforced.
+    Build once, then query with any k, radius or caliper. Indices refer to rows of control_X.
+    """
+    def __init__(self, control_X: np.ndarray, cov: np.ndarray, control_logit: Optional[np.ndarray] = None,
+                 tree: str = "kd", leaf_size: int = 40):
+        from sklearn.neighbors import BallTree, KDTree
+        if tree not in ("kd", "ball"):
+            raise ValueError(f"Unknown tree: {tree}")
+        self.W = whitening_matrix(cov)
+        self.points = self.whiten(control_X)
+        self.n = len(self.points)
+        self.tree = (KDTree if tree == "kd" else BallTree)(self.points, leaf_size=leaf_size)
+        self.logit = None
+        if control_logit is not None:
+            self.logit = np.asarray(control_logit, dtype=np.float64)
+            self.logit_order = np.argsort(self.logit, kind="stable")
+            self.sorted_logit = self.logit[self.logit_order]
+
+    def whiten(self, X: np.ndarray) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.W
+
+    def knn(self, X: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest controls of each row of X. Returns (distances, indices) of shape (n, k), sorted by distance.
+        """
+        if k > self.n:
+            raise ValueError(f"Expected n_neighbors <= n_controls, got {k} > {self.n}")
+        return self.tree.query(self.whiten(X), k=k)
+
+    def radius(self, X: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        All controls within radius of each row of X, in the CSR layout of radius_1d.
+        """
+        indices, distances = self.tree.query_radius(self.whiten(X), r=radius, return_distance=True, sort_results=True)
+        counts = np.array([len(i) for i in indices], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        if not counts.sum():
+            return offsets, np.zeros(0, dtype=np.int64), np.zeros(0)
+        return offsets, np.concatenate(indices).astype(np.int64), np.concatenate(distances)
+
+    def caliper_band(self, logit: np.ndarray, caliper: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        [lo, hi) positions in the sorted control logits within caliper of each logit.
+        """
+        if self.logit is None:
+            raise ValueError("The index was built without control PS logits")
+        logit = np.asarray(logit, dtype=np.float64)
+        # Widened by one ulp; callers filter on the exact difference
+        lo = np.searchsorted(self.sorted_logit, np.nextafter(logit - caliper, -np.inf), side="left")
+        hi = np.searchsorted(self.sorted_logit, np.nextafter(logit + caliper, np.inf), side="right")
+        return lo, hi
+
+def _first_k(ok: np.ndarray, k: int) -> np.ndarray:
+    """
+    Mask of the first k True entries of each row.
+    """
+    return ok & (np.cumsum(ok, axis=1) <= k)
+
+def _band_nearest(index: CovariateIndex, Z: np.ndarray, logit: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                  k: int, caliper: float, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Brute force over each unit's caliper band: (row, control, distance) of its k nearest
+    eligible controls. Used for units whose band is small.
+    """
+    counts = hi - lo
+    row = np.repeat(np.arange(len(Z)), counts)
+    starts = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+    control = index.logit_order[starts + np.arange(counts.sum())]
+    dist = np.sqrt(((Z[row] - index.points[control]) ** 2).sum(axis=1))
+    ok = (np.abs(index.logit[control] - logit[row]) <= caliper) & (dist <= radius)
+    row, control, dist = row[ok], control[ok], dist[ok]
+    order = np.lexsort((dist, row))
+    row, control, dist = row[order], control[order], dist[order]
+    # Rank within each row's run, keep the first k
+    first = np.searchsorted(row, row, side="left")
+    keep = np.arange(len(row)) - first < k
+    return row[keep], control[keep], dist[keep]
+
+def nearest_covariates(index: CovariateIndex, X: np.ndarray, k: int = 1, logit: Optional[np.ndarray] = None,
+                       caliper: Optional[float] = None, radius: Optional[float] = None
+                       ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The k nearest controls (Mahalanobis) of each row of X among those within radius
+    and, given logit and caliper, within caliper on the PS logit.
+    Returns (distances, indices) of shape (n, k), sorted by distance; slots without an
+    eligible control have index -1 and distance inf.
+
+    The propensity caliper is enforced exactly: a unit whose caliper band holds few
+    controls is matched by brute force over that band; the others query the tree for
+    a growing number of neighbours until k of them fall inside the caliper. Since the
+    PS is a function of the same covariates, a handful of neighbours nearly always suffices.
+    """
+    n, limit = len(X), np.inf if radius is None else radius
+    distances = np.full((n, k), np.inf)
+    indices = np.full((n, k), -1, dtype=np.int64)
+    if n == 0 or index.n == 0:
+        return distances, indices
+
+    if caliper is None:
+        d, i = index.knn(X, min(k, index.n))
+        ok = d <= limit
+        distances[:, :d.shape[1]] = np.where(ok, d, np.inf)
+        indices[:, :d.shape[1]] = np.where(ok, i, -1)
+        return distances, indices
+
+    logit = np.asarray(logit, dtype=np.float64)
+    Z = index.whiten(X)
+    lo, hi = index.caliper_band(logit, caliper)
+    band = hi - lo
+    pending = np.flatnonzero(band > 0)
+    n_query = min(max(4 * k, 16), index.n)
+    while len(pending):
+        small = band[pending] <= n_query
+        brute = pending[small]
+        if len(brute):
+            row, control, dist = _band_nearest(index, Z[brute], logit[brute], lo[brute], hi[brute],
+                                               k, caliper, limit)
+            slot = np.arange(len(row)) - np.searchsorted(row, row, side="left")
+            distances[brute[row], slot] = dist
+            indices[brute[row], slot] = control
+
+        rest = pending[~small]
+        if not len(rest):
+            break
+        d, i = index.tree.query(Z[rest], k=n_query)
+        ok = (np.abs(index.logit[i] - logit[rest, None]) <= caliper) & (d <= limit)
+        # Done once k eligible neighbours are found, the whole index was searched,
+        # or the farthest neighbour is already beyond the radius
+        done = (ok.sum(axis=1) >= k) | (n_query >= index.n) | (d[:, -1] > limit)
+        take = _first_k(ok, k) & done[:, None]
+        r, c = np.nonzero(take)
+        slot = np.cumsum(take, axis=1)[r, c] - 1
+        distances[rest[r], slot] = d[r, c]
+        indices[rest[r], slot] = i[r, c]
+        pending = rest[~done]
+        n_query = min(n_query * 4, index.n)
+    return distances, indices
+
+def radius_covariates(index: CovariateIndex, X: np.ndarray, radius: float, logit: Optional[np.ndarray] = None,
+                      caliper: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every control within Mahalanobis radius of each row of X (and, given logit and
+    caliper, within caliper on the PS logit), from one tree radius query.
+    Returns CSR (offsets, indices, distances) as radius_1d, sorted by distance.
+    """
+    offsets, indices, distances = index.radius(X, radius)
+    if caliper is None:
+        return offsets, indices, distances
+    row = np.repeat(np.arange(len(X)), np.diff(offsets))
+    ok = np.abs(index.logit[indices] - np.asarray(logit, dtype=np.float64)[row]) <= caliper
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(row[ok], minlength=len(X)))])
+    return offsets, indices[ok], distances[ok]
+
+def match_covariates(X: np.ndarray, treat: np.ndarray, logit: Optional[np.ndarray] = None,
+                     caliper_val: Optional[float] = None, radius: Optional[float] = None, n_neighbors: int = 1,
+                     method: str = "nearest", index: Optional[CovariateIndex] = None):
+    """
+    Mahalanobis matching of treated to control units on the rows of X, optionally within
+    a PS-logit caliper (caliper_val) and/or a Mahalanobis radius. Returns the same tuple
+    as match_scores. index must be built on the controls of (X, treat) in row order;
+    by default one is built with the pooled within-group covariance.
+    """
+    treated_pos = np.flatnonzero(treat == 1)
+    control_pos = np.flatnonzero(treat == 0)
+    if index is None:
+        index = CovariateIndex(X[control_pos], pooled_covariance(X, treat),
+                               None if logit is None else logit[control_pos])
+    t_logit = None if logit is None else logit[treated_pos]
+
+    if method == "radius":
+        if radius is None:
+            raise ValueError("Radius matching on covariates needs a radius")
+        offsets, c_idx, c_dist = radius_covariates(index, X[treated_pos], radius, t_logit, caliper_val)
+    else:
+        distances, indices = nearest_covariates(index, X[treated_pos], n_neighbors, t_logit, caliper_val, radius)
+        filled = indices >= 0
+        offsets = np.concatenate([[0], np.cumsum(filled.sum(axis=1))])
+        c_idx, c_dist = indices[filled], distances[filled]
+    counts = np.diff(offsets)
+    keep = counts > 0
+    return treated_pos, control_pos, keep, c_idx, np.repeat(np.cumsum(keep) - 1, counts), c_dist
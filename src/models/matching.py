@@ -1,103 +1,525 @@
-import modin.pandas as pd
-import pandas as pandas_std # For some sklearn compatibility if needed
+import pandas as pd
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
-from typing import List, Dict, Any
+from scipy import stats
+from src.models.sorted_matching import knn_1d, greedy_1d, radius_1d
+from src.models.covariate_matching import CovariateIndex, match_covariates, pooled_covariance
+from src.models.ols import DesignMatrix, OLSResults, parse_formula
+from src.models.psm import fit_logit, fit_logit_batch, logistic
+from src.parallel import map_in_processes
+from typing import List, Dict, Any, Optional, Tuple
+
+# Added to PS before the logit transform to avoid inf
+EPSILON = 1e-10
+
+def ps_to_logit(ps: np.ndarray) -> np.ndarray:
+    return np.log((ps + EPSILON) / (1 - ps + EPSILON))
+
+def match_scores(logit: np.ndarray, treat: np.ndarray, caliper_val: float, n_neighbors: int = 1,
+                 method: str = "nearest", replace: bool = True, engine: str = "sorted"):
+    """
+    Matches treated to control units on a 1-D score.
+    Returns (treated_pos, control_pos, keep, control_idx, control_match, distance):
+    positions of treated/control units, the mask of treated units kept, and the long-form
+    controls (control_idx relative to control_pos, control_match indexing the kept treated units).
+    """
+    treated_pos = np.flatnonzero(treat == 1)
+    control_pos = np.flatnonzero(treat == 0)
+    t_scores, c_scores = logit[treated_pos], logit[control_pos]
+
+    if method == "radius":
+        # Variable-ratio: every control within the caliper
+        offsets, c_idx, c_dist = radius_1d(t_scores, c_scores, caliper_val)
+        counts = np.diff(offsets)
+        keep = counts > 0
+        return treated_pos, control_pos, keep, c_idx, np.repeat(np.cumsum(keep) - 1, counts), c_dist
+
+    if not replace:
+        # Greedy without replacement; picks outside the caliper are never made
+        distances, indices = greedy_1d(t_scores, c_scores, n_neighbors, caliper=caliper_val)
+        keep = indices[:, 0] >= 0
+        filled = indices[keep] >= 0
+        return (treated_pos, control_pos, keep, indices[keep][filled],
+                np.nonzero(filled)[0], distances[keep][filled])
+
+    if engine == "sklearn":
+        # We use sklearn NearestNeighbors with Euclidean distance on the 1D Logit PS
+        # This is equivalent to Mahalanobis on 1D.
+        from sklearn.neighbors import NearestNeighbors
+        nn = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean')
+        nn.fit(c_scores.reshape(-1, 1))
+        distances, indices = nn.kneighbors(t_scores.reshape(-1, 1))
+    else:
+        distances, indices = knn_1d(t_scores, c_scores, n_neighbors)
+
+    # A treated unit is kept if its nearest control is within the caliper
+    keep = distances[:, 0] <= caliper_val
+    n_kept = int(keep.sum())
+    return (treated_pos, control_pos, keep, indices[keep].ravel(),
+            np.repeat(np.arange(n_kept), indices.shape[1]), distances[keep].ravel())
+
+def group_means(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Mean of values per group id in [0, n_groups), skipping NaNs (NaN for empty groups).
+    """
+    valid = ~np.isnan(values)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=n_groups)
+    counts = np.bincount(groups[valid], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+# Bootstrap replicates are fitted this many at a time, bounding the (block, n) weight matrices
+BOOT_BLOCK = 256
+# Batched matching handles this many (replicate, unit) entries at a time
+MATCH_BLOCK_ELEMENTS = 1 << 22
+
+def att_from_scores(ps: np.ndarray, d: np.ndarray, y: np.ndarray, caliper: Optional[float], n_neighbors: int,
+                     method: str, replace: bool, trim_threshold: float, distance: str = "ps",
+                     radius: Optional[float] = None, Xc: Optional[np.ndarray] = None) -> float:
+    """
+    Common-support trim -> matching (on the PS logit, or on the covariates Xc when
+    distance="mahalanobis") -> ATT, given fitted propensity scores.
+    """
+    support = (ps > trim_threshold) & (ps < 1 - trim_threshold)
+    logit, d, y = ps_to_logit(ps[support]), d[support], y[support]
+    if len(logit) < 2:
+        return np.nan
+    caliper_val = None if caliper is None else caliper * np.std(logit, ddof=1)
+    if distance == "mahalanobis":
+        treated_pos, control_pos, keep, c_idx, c_match, _ = match_covariates(
+            Xc[support], d, logit, caliper_val, radius, n_neighbors, method)
+    else:
+        treated_pos, control_pos, keep, c_idx, c_match, _ = match_scores(
+            logit, d, caliper_val, n_neighbors, method, replace)
+    if not keep.any():
+        return np.nan
+    diffs = y[treated_pos[keep]] - group_means(y[control_pos[c_idx]], c_match, int(keep.sum()))
+    return np.nan if np.isnan(diffs).all() else float(np.nanmean(diffs))
+
+def _nearest_att_batch(ps: np.ndarray, d: np.ndarray, y: np.ndarray, caliper: float, n_neighbors: int,
+                       trim_threshold: float) -> np.ndarray:
+    """
+    att_from_scores for nearest-neighbour PS matching with replacement, for a batch of
+    samples at once (one per row of ps, d, y). Each row's logits are shifted into a range
+    of their own, wider than twice the spread of all logits, so one knn_1d call over the
+    stacked batch only ever pairs units of the same row. Rows with fewer than n_neighbors
+    controls on the common support get NaN.
+    """
+    support = (ps > trim_threshold) & (ps < 1 - trim_threshold)
+    logit = np.where(support, ps_to_logit(ps), np.nan)
+    n_support = support.sum(axis=1)
+    # Per-row SD of the supported logits (ddof=1), without nanstd's warnings on short rows
+    mean = np.nansum(logit, axis=1) / np.maximum(n_support, 1)
+    sd = np.sqrt(np.nansum((logit - mean[:, None]) ** 2, axis=1) / np.maximum(n_support - 1, 1))
+    caliper_val = caliper * sd
+
+    treated, control = support & (d == 1), support & (d == 0)
+    att = np.full(len(ps), np.nan)
+    ok = (n_support >= 2) & treated.any(axis=1) & (control.sum(axis=1) >= n_neighbors)
+    if not ok.any():
+        return att
+    rt, it = np.nonzero(treated & ok[:, None])
+    rc, ic = np.nonzero(control & ok[:, None])
+    t_logit, c_logit = logit[rt, it], logit[rc, ic]
+    lo, hi = min(t_logit.min(), c_logit.min()), max(t_logit.max(), c_logit.max())
+    gap = 2 * (hi - lo) + 1
+    _, idx = knn_1d(t_logit + rt * gap, c_logit + rc * gap, n_neighbors)
+    # Distances on the unshifted logits
+    keep = np.abs(c_logit[idx[:, 0]] - t_logit) <= caliper_val[rt]
+
+    kept = np.flatnonzero(keep)
+    controls = idx[kept].ravel()
+    diffs = y[rt[kept], it[kept]] - group_means(y[rc[controls], ic[controls]],
+                                                np.repeat(np.arange(len(kept)), n_neighbors), len(kept))
+    valid = ~np.isnan(diffs)
+    sums = np.bincount(rt[kept][valid], weights=diffs[valid], minlength=len(ps))
+    counts = np.bincount(rt[kept][valid], minlength=len(ps))
+    att[counts > 0] = sums[counts > 0] / counts[counts > 0]
+    return att
+
+def pipeline_att(X: np.ndarray, d: np.ndarray, y: np.ndarray, **config) -> float:
+    """
+    PS fit -> common-support trim -> matching -> ATT, on plain arrays.
+    X must already contain the constant column.
+    """
+    beta = fit_logit(X, d)
+    if np.isnan(beta).any():
+        return np.nan
+    return att_from_scores(logistic(X @ beta), d, y, Xc=X[:, 1:], **config)
+
+def _bootstrap_chunk(X: np.ndarray, d: np.ndarray, y: np.ndarray, resamples: np.ndarray,
+                     config: Dict[str, Any], beta0: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    ATT for each row of resamples. The propensity models of a block of replicates are fitted
+    together on the full design, with each replicate's draw counts as frequency weights
+    (the same likelihood as fitting the resampled rows), warm-started from beta0.
+    Nearest-neighbour PS matching with replacement (the default) then trims and matches
+    the whole block at once (_nearest_att_batch); greedy, radius and Mahalanobis matching
+    go through att_from_scores one replicate at a time.
+    """
+    n = X.shape[0]
+    replicates = np.full(len(resamples), np.nan)
+    batched = config["distance"] == "ps" and config["method"] == "nearest" and config["replace"]
+    for start in range(0, len(resamples), BOOT_BLOCK):
+        block = resamples[start:start + BOOT_BLOCK]
+        rows = np.repeat(np.arange(len(block)), n)
+        counts = np.bincount(rows * n + block.ravel(), minlength=len(block) * n).reshape(len(block), n)
+        betas = fit_logit_batch(X, d, weights=counts, beta0=beta0)
+        if batched:
+            fitted = ~np.isnan(betas).any(axis=1)
+            step = max(1, MATCH_BLOCK_ELEMENTS // max(n, 1))
+            for sub in range(0, len(block), step):
+                j = np.arange(sub, min(sub + step, len(block)))
+                j = j[fitted[j]]
+                if len(j):
+                    # Fitted scores of every unit under each replicate's model, gathered at its draws
+                    ps = logistic(X @ betas[j].T).T[np.arange(len(j))[:, None], block[j]]
+                    replicates[start + j] = _nearest_att_batch(ps, d[block[j]], y[block[j]], config["caliper"],
+                                                               config["n_neighbors"], config["trim_threshold"])
+            continue
+        for j, idx in enumerate(block):
+            if not np.isnan(betas[j]).any():
+                replicates[start + j] = att_from_scores(logistic(X[idx] @ betas[j]), d[idx], y[idx],
+                                                         Xc=X[idx, 1:], **config)
+    return replicates
+
+class MatchedSet:
+    """
+    Index representation of a matched sample.
+
+    Positions refer to rows of `data` (the frame that was matched). Controls are stored
+    in long form, one entry per (treated unit, matched control) pair, so 1:1, k:1 and
+    variable-ratio matches share one layout:
+    - treated_pos[j], match_id[j]: the j-th matched treated unit
+    - control_pos[i], control_match[i], distance[i]: the i-th control, the j it belongs to, and its distance
+    """
+    def __init__(self, data: pd.DataFrame, treated_pos: np.ndarray, match_id: np.ndarray,
+                 control_pos: np.ndarray, control_match: np.ndarray, distance: np.ndarray):
+        self.data = data
+        self.treated_pos = np.asarray(treated_pos, dtype=np.int64)
+        self.match_id = np.asarray(match_id, dtype=np.int64)
+        self.control_pos = np.asarray(control_pos, dtype=np.int64)
+        self.control_match = np.asarray(control_match, dtype=np.int64)
+        self.distance = np.asarray(distance, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.treated_pos)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.treated_pos) == 0
+
+    def _values(self, col: str) -> np.ndarray:
+        return self.data[col].to_numpy(dtype=np.float64)
+
+    def control_means(self, col: str) -> np.ndarray:
+        """
+        Mean of col over each matched treated unit's controls (NaNs skipped, like groupby().mean()).
+        """
+        return group_means(self._values(col)[self.control_pos], self.control_match, len(self))
+
+    def outcome_differences(self, col: str) -> np.ndarray:
+        """
+        Per-match differences Y_treated - mean(Y_controls), in match order.
+        """
+        return self._values(col)[self.treated_pos] - self.control_means(col)
+
+    def rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Positions in data of every row of the matched sample (treated units, then controls)
+        and the match each row belongs to: the rows of to_frame(), without building it.
+        """
+        positions = np.concatenate([self.treated_pos, self.control_pos])
+        group = np.concatenate([np.arange(len(self.treated_pos)), self.control_match])
+        return positions, group
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materializes the matched sample: each treated row followed by its controls,
+        with 'match_id' and 'role' columns. Built with a single fancy-index into data.
+        """
+        n_t, n_c = len(self.treated_pos), len(self.control_pos)
+        positions = np.concatenate([self.treated_pos, self.control_pos])
+        group = np.concatenate([np.arange(n_t), self.control_match])
+        is_control = np.concatenate([np.zeros(n_t, dtype=np.int8), np.ones(n_c, dtype=np.int8)])
+        # Stable sort on (group, is_control) keeps controls in match order within a group
+        order = np.lexsort((is_control, group))
+
+        frame = self.data.iloc[positions[order]].reset_index(drop=True)
+        frame["match_id"] = self.match_id[group[order]]
+        frame["role"] = np.where(is_control[order] == 1, "Control", "Treated")
+        return frame
 
 class CausalMatcher:
-    def __init__(self, caliper: float = 0.2):
+    """
+    Propensity score matcher on the logit scale, or Mahalanobis matcher on covariates.
+
+    engine: "sorted" (1-D sort/searchsorted engine) or "sklearn" (NearestNeighbors tree).
+    method: "nearest" (k:1), or "radius" (every control within the caliper).
+    replace: match with replacement; replace=False does greedy matching ("sorted" only).
+    distance: "ps" (PS logit) or "mahalanobis" (the given covariates, through a KD-tree
+    over the whitened controls; see src.models.covariate_matching). With "mahalanobis",
+    caliper is an optional PS-logit caliper (None: none) and radius an optional caliper
+    on the Mahalanobis distance, which method="radius" requires. A prebuilt
+    CovariateIndex over the controls can be passed as index to reuse it across matchers.
+    """
+    def __init__(self, caliper: Optional[float] = 0.2, engine: str = "sorted", method: str = "nearest",
+                 replace: bool = True, distance: str = "ps", covariates: Optional[List[str]] = None,
+                 radius: Optional[float] = None, index: Optional[CovariateIndex] = None):
+        if engine not in ("sorted", "sklearn"):
+            raise ValueError(f"Unknown matching engine: {engine}")
+        if method not in ("nearest", "radius"):
+            raise ValueError(f"Unknown matching method: {method}")
+        if distance not in ("ps", "mahalanobis"):
+            raise ValueError(f"Unknown matching distance: {distance}")
+        if engine == "sklearn" and (method != "nearest" or not replace):
+            raise ValueError("The sklearn engine only supports nearest-neighbour matching with replacement")
+        if distance == "ps" and caliper is None:
+            raise ValueError("PS matching needs a caliper")
+        if distance == "mahalanobis":
+            if not covariates:
+                raise ValueError("Mahalanobis matching needs covariates")
+            if not replace:
+                raise ValueError("Mahalanobis matching is with replacement only")
+            if method == "radius" and radius is None:
+                raise ValueError("Radius matching on covariates needs a radius")
         self.caliper = caliper
-        self.matched_df = None
-        
-    def match_nearest_neighbor(self, df: pd.DataFrame, treatment_col: str, ps_col: str, n_neighbors: int = 1) -> pd.DataFrame:
+        self.engine = engine
+        self.method = method
+        self.replace = replace
+        self.distance = distance
+        self.covariates = list(covariates) if covariates else None
+        self.radius = radius
+        self.index = index
+        self.matched_set = None
+        self._matched_df = None
+        self._designs: Dict[Tuple[str, ...], DesignMatrix] = {}
+
+    @property
+    def matched_df(self) -> pd.DataFrame:
+        """
+        DataFrame view of the matched set, materialized on first access.
+        """
+        if self._matched_df is None and self.matched_set is not None:
+            self._matched_df = self.matched_set.to_frame()
+        return self._matched_df
+
+    def match(self, df: pd.DataFrame, treatment_col: str, ps_col: str, n_neighbors: int = 1) -> MatchedSet:
         """
         Performs Nearest Neighbor matching on the Propensity Score (Logit scale advised).
+        Returns the matched sample as index arrays into df.
         """
         # Convert PS to Logit scale for better matching properties
-        # epsilon to avoid inf
-        epsilon = 1e-10
-        df["ps_logit"] = np.log((df[ps_col] + epsilon) / (1 - df[ps_col] + epsilon))
-        
-        treated = df[df[treatment_col] == 1].copy()
-        control = df[df[treatment_col] == 0].copy()
+        df["ps_logit"] = ps_to_logit(df[ps_col])
         
-        if self.matched_df is not None:
-             return self.matched_df
+        if self.matched_set is not None:
+             return self.matched_set
 
-        # Use Sklearn for Nearest Neighbor Matching
-        # Logit Propensity Score matching with Caliper
-        
-        # We use sklearn NearestNeighbors with Euclidean distance on the 1D Logit PS
-        # This is equivalent to Mahalanobis on 1D.
-        
-        nn = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean')
-        nn.fit(control[["ps_logit"]])
-        distances, indices = nn.kneighbors(treated[["ps_logit"]])
-            
-        
-        # Filter by Caliper... (Rest of logic remains same)
-        
         # Filter by Caliper (standard deviation of the propensity score)
         # Standard definition of caliper is 0.2 * SD of PS Logit
-        caliper_val = self.caliper * df["ps_logit"].std()
-        
-        matched_data = []
-        
-        for i, (dist, idx) in enumerate(zip(distances, indices)):
-            # If within caliper
-            if dist[0] <= caliper_val:
-                # Add Treated Unit
-                t_row = treated.iloc[i].to_dict()
-                t_row["match_id"] = i
-                t_row["role"] = "Treated"
-                matched_data.append(t_row)
-                
-                # Add Control Unit(s)
-                # Note: indices are relative to the control dataframe
-                for matched_idx in idx:
-                    c_row = control.iloc[matched_idx].to_dict()
-                    c_row["match_id"] = i
-                    c_row["role"] = "Control"
-                    matched_data.append(c_row)
-                    
-        self.matched_df = pd.DataFrame(matched_data)
+        caliper_val = None if self.caliper is None else self.caliper * df["ps_logit"].std()
+
+        logit = df["ps_logit"].to_numpy(dtype=np.float64)
+        treat = df[treatment_col].to_numpy()
+        if self.distance == "mahalanobis":
+            X = df[self.covariates].to_numpy(dtype=np.float64)
+            if self.index is None:
+                control = treat == 0
+                self.index = CovariateIndex(X[control], pooled_covariance(X, treat), logit[control])
+            treated_pos, control_pos, keep, control_idx, control_match, distance = match_covariates(
+                X, treat, logit, caliper_val, self.radius, n_neighbors, self.method, self.index)
+        else:
+            treated_pos, control_pos, keep, control_idx, control_match, distance = match_scores(
+                logit, treat, caliper_val, n_neighbors, self.method, self.replace, self.engine)
+
+        self.matched_set = MatchedSet(
+            data=df,
+            treated_pos=treated_pos[keep],
+            match_id=np.flatnonzero(keep),
+            control_pos=control_pos[control_idx],
+            control_match=control_match,
+            distance=distance,
+        )
+        self._matched_df = None
+        self._designs = {}
+        return self.matched_set
+
+    def match_nearest_neighbor(self, df: pd.DataFrame, treatment_col: str, ps_col: str, n_neighbors: int = 1) -> pd.DataFrame:
+        """
+        Performs Nearest Neighbor matching on the Propensity Score (Logit scale advised).
+        Returns the matched sample as a DataFrame (see match() for the index form).
+        """
+        self.match(df, treatment_col, ps_col, n_neighbors)
         return self.matched_df
 
     def calculate_att(self, outcome_col: str) -> float:
         """
         Calculates simple ATT from matched data.
         """
-        if self.matched_df is None or self.matched_df.empty:
+        if self.matched_set is None or self.matched_set.empty:
             return np.nan
             
-        treated = self.matched_df[self.matched_df["role"] == "Treated"]
-        control = self.matched_df[self.matched_df["role"] == "Control"]
-        
-        # Group by match_id to handle potential many-to-one (though current logic is 1:1 if n=1)
-        # Average control outcome per match
-        control_means = control.groupby("match_id")[outcome_col].mean()
-        treated_means = treated.set_index("match_id")[outcome_col]
-        
-        diffs = treated_means - control_means
-        return diffs.mean()
+        # Average control outcome per match, then average the per-match differences
+        diffs = self.matched_set.outcome_differences(outcome_col)
+        if np.isnan(diffs).all():
+            return np.nan
+        return float(np.nanmean(diffs))
+
+    def bootstrap_att(self, df: pd.DataFrame, treatment_col: str, covariates: List[str], outcome_col: str,
+                      n_boot: int = 2000, alpha: float = 0.05, trim_threshold: float = 0.05,
+                      n_neighbors: int = 1, seed: Optional[int] = 0, n_jobs: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Bootstrap confidence interval for the ATT.
+
+        Each replicate resamples rows of df (the pre-PS analysis sample) and re-runs the whole
+        pipeline: propensity fit, common-support trim, caliper matching with this matcher's
+        settings, ATT. The resampling indices for all replicates are drawn as one (n_boot, n)
+        matrix; n_jobs > 1 splits its rows across a process pool. Propensity models are fitted
+        in batches (fit_logit_batch), warm-started from the full-sample fit, and for
+        nearest-neighbour PS matching with replacement each block of replicates is also
+        trimmed and matched at once (see _bootstrap_chunk).
+
+        Replicates refit the PS with fit_logit and match with the sorted 1-D engine whatever
+        self.engine is (the engines differ only in how exact ties are broken).
+        att is the full-sample run of that same pipeline with this call's arguments, so it is
+        the estimate the SE and CI belong to (not calculate_att, whose matched set may come
+        from another frame or n_neighbors).
+        Returns att, se, ci_low/ci_high (percentile), n_valid, replicates.
+        """
+        X = np.column_stack([np.ones(len(df)), df[covariates].to_numpy(dtype=np.float64)])
+        d = df[treatment_col].to_numpy(dtype=np.float64)
+        y = df[outcome_col].to_numpy(dtype=np.float64)
+        config = dict(caliper=self.caliper, n_neighbors=n_neighbors, method=self.method,
+                      replace=self.replace, trim_threshold=trim_threshold, distance=self.distance, radius=self.radius)
+        if self.distance == "mahalanobis" and list(self.covariates) != list(covariates):
+            raise ValueError("Mahalanobis bootstrap matches on the PS covariates; pass the same covariates")
 
-    def bias_adjustment(self, formula: str, outcome_col: str) -> float:
+        rng = np.random.default_rng(seed)
+        resamples = rng.integers(0, len(df), size=(n_boot, len(df)))
+        # Replicate fits start from the full-sample coefficients
+        beta_full = fit_logit(X, d)
+        beta0 = None if np.isnan(beta_full).any() else beta_full
+
+        if n_jobs and n_jobs > 1:
+            chunks = np.array_split(resamples, n_jobs)
+            parts = map_in_processes(_bootstrap_chunk, [(X, d, y, c, config, beta0) for c in chunks], n_jobs)
+            replicates = np.concatenate(parts)
+        else:
+            replicates = _bootstrap_chunk(X, d, y, resamples, config, beta0)
+
+        valid = replicates[~np.isnan(replicates)]
+        ci_low, ci_high = (np.percentile(valid, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+                           if len(valid) else (np.nan, np.nan))
+        return {
+            "att": pipeline_att(X, d, y, **config),
+            "se": float(np.std(valid, ddof=1)) if len(valid) > 1 else np.nan,
+            "ci_low": float(ci_low),
+            "ci_high": float(ci_high),
+            "n_valid": int(len(valid)),
+            "replicates": replicates,
+        }
+
+    def abadie_imbens_se(self, outcome_col: str, treatment_col: str = "treatment", n_same: int = 1,
+                         alpha: float = 0.05) -> Dict[str, float]:
+        """
+        Abadie-Imbens (2006) analytic standard error for the matched ATT:
+
+            V = 1/N1^2 * [ sum_treated (Y_i - Yhat0_i - ATT)^2 + sum_controls (K_i^2 - sum_t w_ti^2) * s2_i ]
+
+        where w_ti = 1/M_t is the weight of control i in treated unit t's match, K_i = sum_t w_ti
+        (K_M(K_M - 1)/M^2 for fixed M), and s2_i is the conditional outcome variance, estimated by
+        matching each control to its n_same nearest other controls on the PS logit (on the
+        covariates, through the same index, for Mahalanobis matching).
+        The propensity score is treated as known.
+        """
+        ms = self.matched_set
+        if ms is None or ms.empty:
+            return {"att": np.nan, "se": np.nan, "ci_low": np.nan, "ci_high": np.nan}
+
+        y = ms._values(outcome_col)
+        diffs = ms.outcome_differences(outcome_col)
+        valid = ~np.isnan(diffs)
+        n1 = int(valid.sum())
+        att = float(diffs[valid].mean())
+
+        # Per-pair weights 1/M_t, restricted to matches with a defined difference
+        m_t = np.bincount(ms.control_match, minlength=len(ms)).astype(np.float64)
+        pair_ok = valid[ms.control_match]
+        w = 1.0 / m_t[ms.control_match[pair_ok]]
+        units = ms.control_pos[pair_ok]
+        uniq, inv = np.unique(units, return_inverse=True)
+        k_w = np.bincount(inv, weights=w)
+        k_w2 = np.bincount(inv, weights=w ** 2)
+
+        # Conditional variance of each used control from its nearest other controls
+        pool = np.flatnonzero(ms.data[treatment_col].to_numpy() == 0)
+        k = min(n_same + 1, len(pool))
+        if self.distance == "mahalanobis":
+            _, nbr = self.index.knn(ms.data[self.covariates].to_numpy(dtype=np.float64)[uniq], k)
+        else:
+            logit = ms._values("ps_logit")
+            _, nbr = knn_1d(logit[uniq], logit[pool], k)
+        nbr = pool[nbr]
+        # Drop each unit itself from its neighbour list (keep the first k - 1 others)
+        pick = np.argsort(nbr == uniq[:, None], axis=1, kind="stable")[:, :max(k - 1, 1)]
+        neighbours = np.take_along_axis(nbr, pick, axis=1)
+        j = neighbours.shape[1]
+        s2 = j / (j + 1.0) * (y[uniq] - np.nanmean(y[neighbours], axis=1)) ** 2
+
+        var = (np.sum((diffs[valid] - att) ** 2) + np.nansum((k_w ** 2 - k_w2) * s2)) / n1 ** 2
+        se = float(np.sqrt(var))
+        z = stats.norm.ppf(1 - alpha / 2)
+        return {"att": att, "se": se, "ci_low": float(att - z * se), "ci_high": float(att + z * se)}
+
+    def design_matrix(self, terms: List[str]) -> DesignMatrix:
+        """
+        Regression design (Intercept + terms) over the rows of the matched sample, built once
+        per matched set and term list. Carries "match_id" and, if data has it, "state" as
+        cluster variables.
+        """
+        key = tuple(terms)
+        if key not in self._designs:
+            ms = self.matched_set
+            positions, group = ms.rows()
+            groups = {"match_id": ms.match_id[group]}
+            if "state" in ms.data.columns:
+                groups["state"] = ms.data["state"].to_numpy()[positions]
+            self._designs[key] = DesignMatrix.from_frame(ms.data, terms, positions, groups)
+        return self._designs[key]
+
+    def bias_adjustments(self, outcomes: List[str], terms: List[str], cov_type: str = "nonrobust",
+                         cluster: Optional[str] = None) -> Dict[str, OLSResults]:
+        """
+        Regression adjustment for several outcomes at once: each outcome is regressed on the
+        terms (treatment + covariates) in the matched sample, against one cached design and
+        one QR factorization. cov_type: "nonrobust", "HC1" or "cluster" (cluster="match_id"
+        or "state"). Returns {outcome: OLSResults}.
+        """
+        design = self.design_matrix(terms)
+        positions, _ = self.matched_set.rows()
+        values = {o: self.matched_set._values(o)[positions] for o in outcomes}
+        return design.fit(values, cov_type=cov_type, cluster=cluster)
+
+    def bias_adjustment(self, formula: str, outcome_col: str, cov_type: str = "nonrobust",
+                        cluster: Optional[str] = None) -> OLSResults:
         """
         Implements regression adjustment on the matched sample.
         Run E[Y|X, D=1] - E[Y|X, D=0] using the matched pairs.
+        formula is an additive "y ~ treatment + x1 + ..."; the treatment coefficient
+        is the bias-adjusted ATT.
         """
-        import statsmodels.formula.api as smf
-        
-        if self.matched_df is None or self.matched_df.empty:
+        if self.matched_set is None or self.matched_set.empty:
             return np.nan
-        
-        # Simple Bias Adjustment: Regress Outcome on Treatment + Covariates in the matched set
-        # The coefficient on Treatment is the bias-adjusted ATT
-        
-        model = smf.ols(formula=formula, data=self.matched_df).fit()
-        
-        # Extract coefficient for treatment (assumed to be named 'treatment' or similar in formula)
-        # We need to parse the treatment variable name from the formula or pass it
-        # Assuming the treatment column name used in matching is present
-        # Ideally, we return the whole summary, but for now just the param
-        return model
+        outcome, terms = parse_formula(formula)
+        if outcome != outcome_col:
+            raise ValueError(f"Formula outcome {outcome!r} does not match outcome_col {outcome_col!r}")
+        return self.bias_adjustments([outcome], terms, cov_type, cluster)[outcome]
+
+def fit_matcher(df: pd.DataFrame, treatment_col: str, ps_col: str, caliper: float = 0.2,
+                n_neighbors: int = 1, **options) -> CausalMatcher:
+    """
+    Matches df with a new CausalMatcher(caliper, **options) and returns the fitted matcher.
+    Pipeline-stage form of CausalMatcher.match.
+    """
+    matcher = CausalMatcher(caliper=caliper, **options)
+    matcher.match(df, treatment_col, ps_col, n_neighbors)
+    return matcher
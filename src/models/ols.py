@@ -0,0 +1,170 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy import stats
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Least squares on a design matrix that is built once and reused.
+# The QR factorization of X is computed once per set of complete rows, and every
+# outcome fitted against it, in one call or many, costs one Q'Y product and a
+# triangular solve. Covariance types and their small-sample corrections follow
+# statsmodels' OLS defaults:
+# - "nonrobust": s^2 (X'X)^-1, t inference
+# - "HC1": White sandwich scaled by n / (n - p), normal inference
+# - "cluster": sandwich over cluster score sums scaled by G/(G-1) * (n-1)/(n-p), normal inference
+
+COV_TYPES = ("nonrobust", "HC1", "cluster")
+_TERM = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def parse_formula(formula: str) -> Tuple[str, List[str]]:
+    """
+    Splits an additive formula "y ~ a + b + c" into ("y", ["a", "b", "c"]).
+    Only plain column names are supported (no transformations or interactions).
+    """
+    lhs, sep, rhs = formula.partition("~")
+    terms = [t.strip() for t in rhs.split("+")]
+    outcome = lhs.strip()
+    if not sep or not all(_TERM.match(t) for t in [outcome] + terms):
+        raise ValueError(f"Expected an additive formula 'y ~ a + b', got {formula!r}")
+    return outcome, terms
+
+class OLSResults:
+    """
+    One fitted outcome. Attribute names follow statsmodels' results (params, bse, tvalues,
+    pvalues, conf_int(), nobs, df_resid), with coefficients as Series indexed by term.
+    """
+    def __init__(self, names: List[str], params: np.ndarray, cov: np.ndarray, nobs: int, df_resid: int,
+                 cov_type: str, use_t: bool, df_inference: float):
+        self.names = names
+        self.params = pd.Series(params, index=names)
+        self.cov_params = pd.DataFrame(cov, index=names, columns=names)
+        self.nobs = nobs
+        self.df_resid = df_resid
+        self.cov_type = cov_type
+        self.use_t = use_t
+        self.df_inference = df_inference
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.bse = pd.Series(np.sqrt(np.diag(cov)), index=names)
+            self.tvalues = self.params / self.bse
+        dist = self._dist()
+        self.pvalues = pd.Series(2 * dist.sf(np.abs(self.tvalues.to_numpy())), index=names)
+
+    def _dist(self):
+        return stats.t(self.df_inference) if self.use_t else stats.norm
+
+    def conf_int(self, alpha: float = 0.05) -> pd.DataFrame:
+        """
+        Confidence intervals, columns 0 (lower) and 1 (upper), as statsmodels returns them.
+        """
+        q = self._dist().ppf(1 - alpha / 2)
+        return pd.DataFrame({0: self.params - q * self.bse, 1: self.params + q * self.bse})
+
+class DesignMatrix:
+    """
+    A regression design (constant first, then the terms) plus optional cluster labels.
+    Factorizations are cached per set of complete rows, so fitting further outcomes or
+    covariance types against the same design never rebuilds or refactors X.
+    """
+    def __init__(self, X: np.ndarray, names: List[str], groups: Optional[Dict[str, np.ndarray]] = None):
+        self.X = np.asarray(X, dtype=np.float64)
+        self.names = list(names)
+        self.groups = groups or {}
+        self._factors: Dict[bytes, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, terms: Sequence[str], positions: Optional[np.ndarray] = None,
+                   groups: Optional[Dict[str, np.ndarray]] = None) -> "DesignMatrix":
+        """
+        Design over the rows of df at positions (default: all), with an Intercept column.
+        """
+        values = df[list(terms)].to_numpy(dtype=np.float64)
+        if positions is not None:
+            values = values[positions]
+        X = np.column_stack([np.ones(len(values)), values])
+        return cls(X, ["Intercept"] + list(terms), groups)
+
+    def __len__(self) -> int:
+        return len(self.X)
+
+    def _factor(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (X_rows, projector, (X'X)^-1) for a boolean row mask, where beta = projector @ Y.
+        Uses the QR of X, or the pseudo-inverse if X is rank deficient (as statsmodels does).
+        """
+        key = np.packbits(rows).tobytes()
+        if key not in self._factors:
+            X = self.X[rows]
+            q, r = np.linalg.qr(X)
+            diag = np.abs(np.diag(r))
+            if len(diag) and diag.min() > diag.max() * 1e-10 and len(X) >= X.shape[1]:
+                r_inv = np.linalg.solve(r, np.eye(len(r)))
+                self._factors[key] = (X, r_inv @ q.T, r_inv @ r_inv.T)
+            else:
+                pinv = np.linalg.pinv(X)
+                self._factors[key] = (X, pinv, pinv @ pinv.T)
+        return self._factors[key]
+
+    def _cluster_labels(self, cluster: Union[str, np.ndarray]) -> np.ndarray:
+        if isinstance(cluster, str):
+            if cluster not in self.groups:
+                raise ValueError(f"Unknown cluster variable {cluster!r}; available: {sorted(self.groups)}")
+            cluster = self.groups[cluster]
+        return pd.factorize(np.asarray(cluster))[0]
+
+    def fit(self, outcomes: Dict[str, np.ndarray], cov_type: str = "nonrobust",
+            cluster: Optional[Union[str, np.ndarray]] = None, use_t: Optional[bool] = None) -> Dict[str, OLSResults]:
+        """
+        Fits every outcome (name -> values aligned with the design rows). Rows with a missing
+        value in X or in an outcome are dropped for that outcome; outcomes sharing a missing
+        pattern are solved together. cluster names a design group (e.g. "match_id") or gives labels.
+        use_t defaults to statsmodels' choice: t for nonrobust, normal otherwise.
+        """
+        if cov_type not in COV_TYPES:
+            raise ValueError(f"Unknown cov_type {cov_type!r}; expected one of {COV_TYPES}")
+        if cov_type == "cluster" and cluster is None:
+            raise ValueError("cov_type='cluster' needs cluster labels")
+        use_t = cov_type == "nonrobust" if use_t is None else use_t
+        labels = self._cluster_labels(cluster) if cov_type == "cluster" else None
+
+        names = list(outcomes)
+        Y = np.column_stack([np.asarray(outcomes[n], dtype=np.float64) for n in names] or [np.zeros((len(self), 0))])
+        x_ok = ~np.isnan(self.X).any(axis=1)
+        patterns: Dict[bytes, List[int]] = {}
+        for j in range(Y.shape[1]):
+            patterns.setdefault(np.packbits(x_ok & ~np.isnan(Y[:, j])).tobytes(), []).append(j)
+
+        results = {}
+        for cols in patterns.values():
+            rows = x_ok & ~np.isnan(Y[:, cols[0]])
+            X, projector, xtx_inv = self._factor(rows)
+            Yr = Y[rows][:, cols]
+            beta = projector @ Yr
+            resid = Yr - X @ beta
+            n, p = X.shape
+            df_resid = n - p
+            for c, j in enumerate(cols):
+                cov, df_inference = self._covariance(X, xtx_inv, resid[:, c], df_resid, cov_type,
+                                                     None if labels is None else labels[rows])
+                results[names[j]] = OLSResults(self.names, beta[:, c], cov, n, df_resid, cov_type, use_t, df_inference)
+        return {n: results[n] for n in names}
+
+    @staticmethod
+    def _covariance(X: np.ndarray, xtx_inv: np.ndarray, e: np.ndarray, df_resid: int, cov_type: str,
+                    labels: Optional[np.ndarray]) -> Tuple[np.ndarray, float]:
+        n, p = X.shape
+        if df_resid <= 0:
+            return np.full((p, p), np.nan), np.nan
+        if cov_type == "nonrobust":
+            return (e @ e / df_resid) * xtx_inv, df_resid
+        if cov_type == "HC1":
+            scores = X * e[:, None]
+            return n / df_resid * xtx_inv @ (scores.T @ scores) @ xtx_inv, df_resid
+        # Cluster: sum the scores within each cluster first
+        codes, uniques = pd.factorize(labels)
+        n_groups = len(uniques)
+        scores = X * e[:, None]
+        sums = np.column_stack([np.bincount(codes, weights=scores[:, k], minlength=n_groups) for k in range(p)])
+        if n_groups < 2:
+            return np.full((p, p), np.nan), np.nan
+        scale = n_groups / (n_groups - 1) * (n - 1) / df_resid
+        return scale * xtx_inv @ (sums.T @ sums) @ xtx_inv, n_groups - 1
@@ -1,7 +1,6 @@
-import modin.pandas as pd
+import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 def estimate_propensity_score(df: pd.DataFrame, treatment: str, covariates: List[str]) -> pd.DataFrame:
     """
@@ -10,18 +9,94 @@ def estimate_propensity_score(df: pd.DataFrame, treatment: str, covariates: List
     """
     # Define X and y
     # Add constant for intercept
-    X = df[covariates]
-    X = sm.add_constant(X)
-    y = df[treatment]
+    X = np.column_stack([np.ones(len(df)), df[covariates].to_numpy(dtype=np.float64)])
+    y = df[treatment].to_numpy(dtype=np.float64)
     
     # Fit Logistic Regression
-    model = sm.Logit(y, X).fit(disp=0)
+    beta = fit_logit(X, y)
+    if np.isnan(beta).any():
+        raise ValueError("Propensity model did not converge (perfect separation?)")
     
     # Predict
-    df["propensity_score"] = model.predict(X)
+    df["propensity_score"] = logistic(X @ beta)
     
     return df
 
+def logistic(eta: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-eta))
+
+def fit_logit_batch(X: np.ndarray, y: np.ndarray, weights: Optional[np.ndarray] = None,
+                    beta0: Optional[np.ndarray] = None, max_iter: int = 50, tol: float = 1e-8) -> np.ndarray:
+    """
+    Fits B logistic regressions at once by Newton-Raphson (IRLS).
+
+    X: shared design (n, p) or stacked designs (B, n, p), constant included by the caller.
+    y: outcomes (n,) or (B, n). weights: frequency weights (B, n), e.g. bootstrap counts.
+    beta0: warm start, (p,) for all models or (B, p).
+    With a shared design every step is a few matrix products over the whole batch:
+    the Hessians are s @ vec(x x') instead of B separate X' W X products.
+    Returns coefficients of shape (B, p); models that do not converge get a row of NaN.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    shared = X.ndim == 2
+    n, p = X.shape[-2:]
+    sizes = [X.shape[0] if not shared else 1, y.shape[0] if y.ndim == 2 else 1,
+             weights.shape[0] if weights is not None else 1,
+             beta0.shape[0] if beta0 is not None and np.ndim(beta0) == 2 else 1]
+    B = max(sizes)
+
+    y = np.broadcast_to(y, (B, n))
+    w = np.ones((B, n)) if weights is None else np.broadcast_to(np.asarray(weights, dtype=np.float64), (B, n))
+    beta = np.zeros((B, p)) if beta0 is None else np.array(np.broadcast_to(beta0, (B, p)), dtype=np.float64)
+    if shared:
+        # Row-wise outer products, so sum_i s_i x_i x_i' is one matrix product
+        outer = (X[:, :, None] * X[:, None, :]).reshape(n, p * p)
+
+    active = np.ones(B, dtype=bool)
+    converged = np.zeros(B, dtype=bool)
+    for _ in range(max_iter):
+        idx = np.nonzero(active)[0]
+        if len(idx) == 0:
+            break
+        b, wb, yb = beta[idx], w[idx], y[idx]
+        if shared:
+            mu = logistic(b @ X.T)
+            grad = (wb * (yb - mu)) @ X
+            hess = ((wb * mu * (1.0 - mu)) @ outer).reshape(-1, p, p)
+        else:
+            Xb = X[idx]
+            mu = logistic(np.einsum("bnp,bp->bn", Xb, b))
+            grad = np.einsum("bn,bnp->bp", wb * (yb - mu), Xb)
+            hess = np.einsum("bn,bnp,bnq->bpq", wb * mu * (1.0 - mu), Xb, Xb, optimize=True)
+
+        step = np.full((len(idx), p), np.nan)
+        try:
+            step = np.linalg.solve(hess, grad[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            # Some Hessian in the batch is singular: solve one at a time and drop those models
+            for j in range(len(idx)):
+                try:
+                    step[j] = np.linalg.solve(hess[j], grad[j])
+                except np.linalg.LinAlgError:
+                    pass
+
+        beta[idx] = b + step
+        failed = ~np.all(np.isfinite(beta[idx]), axis=1)
+        done = ~failed & (np.max(np.abs(step), axis=1) < tol)
+        converged[idx[done]] = True
+        active[idx[failed | done]] = False
+
+    beta[~converged] = np.nan
+    return beta
+
+def fit_logit(X: np.ndarray, y: np.ndarray, max_iter: int = 50, tol: float = 1e-8) -> np.ndarray:
+    """
+    Logistic regression by Newton-Raphson on a design matrix X (constant included by the caller).
+    Returns the coefficient vector, or all-NaN if the fit does not converge (e.g. perfect separation).
+    """
+    return fit_logit_batch(X, y, max_iter=max_iter, tol=tol)[0]
+
 def trim_common_support(df: pd.DataFrame, threshold: float = 0.05) -> pd.DataFrame:
     """
     Removes observations with extreme propensity scores to ensure positivity.
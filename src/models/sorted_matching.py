@@ -0,0 +1,130 @@
+import numpy as np
+from typing import Optional, Tuple
+
+# Matching engines for a single scalar score (e.g. the propensity logit).
+# Controls are sorted once; every query is then a searchsorted plus a small
+# fixed-width window, so matching costs O((n_t + n_c) log n_c) instead of a tree build.
+# Ties at equal distance go to the lower score, and among equal scores to the control
+# nearest the query in sorted order (sklearn's tree may break such ties differently).
+
+def _sort_controls(control: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(control, kind="stable")
+    return order, control[order]
+
+def knn_1d(treated: np.ndarray, control: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k nearest controls for every treated score, with replacement.
+    Returns (distances, indices), each of shape (n_treated, k), sorted by distance;
+    indices refer to positions in control. Same layout as NearestNeighbors.kneighbors.
+    """
+    treated = np.asarray(treated, dtype=np.float64)
+    control = np.asarray(control, dtype=np.float64)
+    n_c = len(control)
+    if k > n_c:
+        raise ValueError(f"Expected n_neighbors <= n_controls, got {k} > {n_c}")
+    order, sorted_c = _sort_controls(control)
+
+    pos = np.searchsorted(sorted_c, treated)
+
+    if k == 1:
+        # Only the two neighbours of the insertion point can be nearest
+        left = np.maximum(pos - 1, 0)
+        right = np.minimum(pos, n_c - 1)
+        d_left = np.where(pos > 0, treated - sorted_c[left], np.inf)
+        d_right = np.where(pos < n_c, sorted_c[right] - treated, np.inf)
+        take_left = d_left <= d_right
+        dist = np.where(take_left, d_left, d_right)
+        nearest = np.where(take_left, left, right)
+        return dist[:, None], order[nearest][:, None]
+
+    # The k nearest sorted controls always lie within [pos - k, pos + k). The window runs
+    # outwards, pos - 1 down to pos - k then pos up, so that equal distances keep the tie order
+    window = pos[:, None] + np.r_[-1:-k - 1:-1, 0:k][None, :]
+    valid = (window >= 0) & (window < n_c)
+    window = np.clip(window, 0, n_c - 1)
+
+    dist = np.abs(sorted_c[window] - treated[:, None])
+    dist[~valid] = np.inf
+    # argsort is stable, so equal distances keep their window order
+    best = np.argsort(dist, axis=1, kind="stable")[:, :k]
+    rows = np.arange(len(treated))[:, None]
+    return dist[rows, best], order[window[rows, best]]
+
+def greedy_1d(treated: np.ndarray, control: np.ndarray, k: int = 1, caliper: Optional[float] = None,
+              treated_order: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy matching without replacement: treated units are visited in treated_order
+    (default: as given) and each takes its k nearest controls not yet used.
+    Picks farther than caliper are not made.
+    Returns (distances, indices) of shape (n_treated, k); unmatched slots have index -1 and distance inf.
+    """
+    treated = np.asarray(treated, dtype=np.float64)
+    control = np.asarray(control, dtype=np.float64)
+    n_t, n_c = len(treated), len(control)
+    order, sorted_c = _sort_controls(control)
+    limit = np.inf if caliper is None else caliper
+
+    # Union-find "next available" pointers in both directions over sorted positions.
+    # Slots -1 and n_c are sentinels meaning "nothing left on this side".
+    left = np.arange(-1, n_c + 1)   # left[i + 1]: nearest available position <= i
+    right = np.arange(-1, n_c + 1)  # right[i + 1]: nearest available position >= i
+
+    def find(parent, i):
+        root = i
+        while parent[root + 1] != root:
+            root = parent[root + 1]
+        while parent[i + 1] != root:
+            parent[i + 1], i = root, parent[i + 1]
+        return root
+
+    distances = np.full((n_t, k), np.inf)
+    indices = np.full((n_t, k), -1, dtype=np.int64)
+    starts = np.searchsorted(sorted_c, treated)
+    visit = np.arange(n_t) if treated_order is None else np.asarray(treated_order)
+
+    for t in visit:
+        score = treated[t]
+        for slot in range(k):
+            lo = find(left, starts[t] - 1)
+            hi = find(right, starts[t]) if starts[t] < n_c else n_c
+            d_lo = score - sorted_c[lo] if lo >= 0 else np.inf
+            d_hi = sorted_c[hi] - score if hi < n_c else np.inf
+            if lo < 0 and hi >= n_c:
+                break  # every control is used
+            pick, d = (lo, d_lo) if d_lo <= d_hi else (hi, d_hi)
+            if not d <= limit:
+                break
+            distances[t, slot] = d
+            indices[t, slot] = order[pick]
+            # Retire the position: point it at its neighbours
+            left[pick + 1] = pick - 1
+            right[pick + 1] = pick + 1
+    return distances, indices
+
+def radius_1d(treated: np.ndarray, control: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All controls within radius of each treated score, with replacement.
+    Returns CSR-style (offsets, indices, distances): the matches of treated unit t are
+    indices[offsets[t]:offsets[t + 1]], sorted by distance.
+    """
+    treated = np.asarray(treated, dtype=np.float64)
+    control = np.asarray(control, dtype=np.float64)
+    order, sorted_c = _sort_controls(control)
+
+    # Bounds are widened by one ulp, then filtered on the exact distance
+    lo = np.searchsorted(sorted_c, np.nextafter(treated - radius, -np.inf), side="left")
+    hi = np.searchsorted(sorted_c, np.nextafter(treated + radius, np.inf), side="right")
+    counts = hi - lo
+
+    owner = np.repeat(np.arange(len(treated)), counts)
+    starts = np.repeat(lo - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+    sorted_pos = starts + np.arange(counts.sum())
+    dist = np.abs(sorted_c[sorted_pos] - treated[owner])
+
+    keep = dist <= radius
+    owner, sorted_pos, dist = owner[keep], sorted_pos[keep], dist[keep]
+    by_distance = np.lexsort((dist, owner))
+    owner, sorted_pos, dist = owner[by_distance], sorted_pos[by_distance], dist[by_distance]
+
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(owner, minlength=len(treated)))])
+    return offsets, order[sorted_pos], dist
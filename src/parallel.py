@@ -0,0 +1,18 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Tuple
+
+# Process pool shared by ingest, the bootstrap, the multiverse and the rematching test.
+# Workers are spawned rather than forked: the parent may already host Ray/Modin threads.
+
+def map_in_processes(func: Callable[..., Any], arg_tuples: Iterable[Tuple], n_jobs: int) -> List[Any]:
+    """
+    func(*args) for every tuple of arg_tuples in a pool of n_jobs spawned processes.
+    func must be a module-level function. Returns the results in the order of arg_tuples.
+    """
+    arg_tuples = list(arg_tuples)
+    if not arg_tuples:
+        return []
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=ctx) as pool:
+        return list(pool.map(func, *zip(*arg_tuples)))
@@ -0,0 +1,195 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+# Per-stage timing and memory trace.
+# Code marks stages with `with get_profiler().stage("match", df) as rec: ...; rec.output(result)`.
+# The default profiler is disabled and hands out one shared no-op stage, so the
+# instrumentation costs a function call and an empty `with` when profiling is off.
+#
+# Peak memory is per stage. The process counters (VmHWM, reset through
+# /proc/self/clear_refs, and the tracemalloc peak) are read and reset whenever a stage
+# opens or closes, and each reading is folded into every stage still open, so a nested
+# stage never hides its parent's peak. Without clear_refs (non-Linux) the RSS column is
+# the growth of the process high-water mark during the stage instead.
+
+_PROC_STATUS = "/proc/self/status"
+_PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+def _rss_high_water_mb() -> Optional[float]:
+    """
+    VmHWM (peak RSS since the last reset) in MB, or None where /proc is unavailable.
+    """
+    try:
+        with open(_PROC_STATUS) as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _reset_rss_high_water() -> bool:
+    """
+    Resets VmHWM to the current RSS. False if the kernel does not allow it.
+    """
+    try:
+        with open(_PROC_CLEAR_REFS, "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux: the process high-water mark so far
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def count_rows(obj: Any) -> Optional[Any]:
+    """
+    Row count of a frame, array or matched set (also via a fitted matcher);
+    a list of counts for a tuple of frames.
+    """
+    if obj is None or isinstance(obj, dict):
+        return None
+    if isinstance(obj, tuple):
+        return [count_rows(item) for item in obj]
+    if hasattr(obj, "matched_set"):
+        return count_rows(obj.matched_set)
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def output(self, obj: Any) -> None:
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    def __init__(self, profiler: "Profiler", name: str, rows_in: Any):
+        self.profiler = profiler
+        self.record = {"stage": name, "rows_in": count_rows(rows_in), "rows_out": None}
+        self.cprofile = cProfile.Profile() if name == profiler.cprofile_stage else None
+
+    def output(self, obj: Any) -> None:
+        self.record["rows_out"] = count_rows(obj)
+
+    def __enter__(self):
+        self.record["depth"] = len(self.profiler._open)
+        self.profiler._fold_peaks()
+        self.profiler._open.append(self)
+        self.peaks: Dict[str, float] = {}
+        self._max_rss = _max_rss_mb()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.record["wall_s"] = time.perf_counter() - self._wall
+        self.record["cpu_s"] = time.process_time() - self._cpu
+        self.profiler._fold_peaks()
+        if self.profiler.rss_resettable:
+            self.record["peak_rss_mb"] = self.peaks.get("rss")
+        else:
+            self.record["rss_hwm_growth_mb"] = _max_rss_mb() - self._max_rss
+        if self.profiler.trace_memory:
+            self.record["tracemalloc_peak_mb"] = self.peaks.get("python", 0.0) / 2 ** 20
+        self.profiler._open.pop()
+        self.profiler.records.append(self.record)
+        if self.cprofile is not None:
+            self.profiler._dump_cprofile(self.cprofile)
+        return False
+
+class Profiler:
+    """
+    Collects one record per stage: wall and CPU seconds, the stage's peak RSS, optional
+    tracemalloc peak, and input/output row counts. cprofile_stage names one stage to run under
+    cProfile; its stats are written to cprofile_path (.prof) plus a text summary.
+    """
+    def __init__(self, enabled: bool = False, trace_memory: bool = False,
+                 cprofile_stage: Optional[str] = None, cprofile_path: str = "outputs/profile.prof"):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_path = cprofile_path
+        self.records: List[Dict[str, Any]] = []
+        self._open: List[_Stage] = []
+        self._start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.rss_resettable = enabled and _rss_high_water_mb() is not None and _reset_rss_high_water()
+
+    def _fold_peaks(self) -> None:
+        """
+        Reads the peak counters since their last reset into every open stage, then resets them.
+        """
+        readings = {}
+        if self.rss_resettable:
+            readings["rss"] = _rss_high_water_mb()
+            _reset_rss_high_water()
+        if self.trace_memory:
+            readings["python"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        for stage in self._open:
+            for key, value in readings.items():
+                if value is not None:
+                    stage.peaks[key] = max(stage.peaks.get(key, value), value)
+
+    def stage(self, name: str, rows_in: Any = None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows_in)
+
+    def _dump_cprofile(self, profile: cProfile.Profile) -> None:
+        os.makedirs(os.path.dirname(self.cprofile_path) or ".", exist_ok=True)
+        profile.dump_stats(self.cprofile_path)
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(30)
+        with open(os.path.splitext(self.cprofile_path)[0] + ".txt", "w") as fh:
+            fh.write(text.getvalue())
+        print(f"cProfile stats for stage {self.cprofile_stage} written to {self.cprofile_path}", file=sys.stderr)
+
+    def trace(self) -> Dict[str, Any]:
+        return {
+            "total_wall_s": time.perf_counter() - self._start,
+            "trace_memory": self.trace_memory,
+            "stages": self.records,
+        }
+
+    def write(self, path: str) -> None:
+        """
+        Writes the trace as JSON (no-op when disabled).
+        """
+        if not self.enabled:
+            return
+        with open(path, "w") as fh:
+            json.dump(self.trace(), fh, indent=2)
+        print(f"Stage trace written to {path}", file=sys.stderr)
+
+_profiler = Profiler()
+
+def get_profiler() -> Profiler:
+    return _profiler
+
+def set_profiler(profiler: Profiler) -> Profiler:
+    global _profiler
+    _profiler = profiler
+    return profiler
@@ -0,0 +1,168 @@
+import os
+import sys
+import numpy as np
+from typing import List
+from src.api import AnalysisResult, RegressionResult
+
+# Markdown report over an AnalysisResult (see src.api). Rendering does no analysis:
+# every number comes from the result object, so a result can be re-rendered (or
+# served as JSON instead) without touching the data again.
+
+REPORT_PATH = "outputs/results.md"
+# Rows of the Rosenbaum table
+REPORT_GAMMAS = [1.0, 1.25, 1.5, 2.0, 3.0, 5.0]
+
+def _fmt(value: float, width: int = 10) -> str:
+    if value is None or not np.isfinite(value):
+        return f"{'nan':>{width}}"
+    text = f"{value:.4g}" if value != 0 and (abs(value) < 1e-3 or abs(value) >= 1e5) else f"{value:.4f}"
+    return f"{text:>{width}}"
+
+def coefficient_table(reg: RegressionResult) -> str:
+    """
+    Fixed-width coefficient table (coef, std err, t, P>|t|, 95% CI), one row per term.
+    """
+    terms = list(reg.params)
+    name_width = max(len(t) for t in terms) + 2
+    header = f"{'':<{name_width}}" + "".join(f"{h:>12}" for h in ["coef", "std err", "t", "P>|t|", "[0.025", "0.975]"])
+    rule = "=" * len(header)
+    lines = [rule, header, "-" * len(header)]
+    for t in terms:
+        values = [reg.params[t], reg.bse[t], reg.tvalues[t]]
+        lines.append(f"{t:<{name_width}}" + "".join(_fmt(v, 12) for v in values) + f"{reg.pvalues[t]:>12.3f}"
+                     + _fmt(reg.ci_low[t], 12) + _fmt(reg.ci_high[t], 12))
+    lines.append(rule)
+    return "\n".join(lines)
+
+def render_markdown(result: AnalysisResult) -> str:
+    """
+    The analysis report as Markdown.
+    """
+    s, p = result.sample, result.params
+    did = s.using_did
+    out: List[str] = []
+    add = out.append
+
+    add("# The Marginal Utility of Force: Analysis Report")
+    add("## Executive Summary")
+    add("This report investigates the causal impact of police spending on violent crime rates using Propensity Score "
+        f"Matching (PSM), comparing High Investment (Top {1 - p.high_q:.0%}) vs Low Investment (Bottom {p.low_q:.0%}) "
+        "cities in 2019.")
+
+    add("\n## 1. Data Overview")
+    add("| Dataset | Source | Description |")
+    add("|---|---|---|")
+    add(f"| FiSC | Lincoln Inst. | {s.fisc_cities} cities (Spending) |")
+    add(f"| FBI UCR | Table 8 | 2015 & 2019 (Crime Trends) |")
+    add(f"| ACS | Census | {s.acs_locations} locations (Demographics) |")
+    add(f"\n**Total Analyzed Sample**: {s.n_analyzed} cities (after merging and filtering).")
+
+    add("\n## 2. Methodology")
+    add("- **Design**: Difference-in-Differences (DiD) with Propensity Score Matching." if did
+        else "- **Design**: Cross-Sectional Propensity Score Matching.")
+    add(f"- **Treatment**: Police spending per capita at or above the {p.high_q:.0%} quantile (2019).")
+    add(f"- **Control**: Police spending per capita at or below the {p.low_q:.0%} quantile (2019).")
+    add(f"- **Outcome**: {'Change in Violent Crime Rate (2019 - 2015)' if did else 'Violent Crime Rate (2019)'}"
+        f" (`{s.outcome}`).")
+    add(f"- **Covariates**: {', '.join(s.covariates)}")
+    if p.distance == "mahalanobis":
+        calipers = [f"PS caliper {p.caliper} SD" if p.caliper is not None else "no PS caliper"]
+        if p.radius is not None:
+            calipers.append(f"distance caliper {p.radius}")
+        add(f"- **Matching**: 1:1 nearest neighbour on the Mahalanobis distance of the covariates, "
+            f"{', '.join(calipers)}, common-support trim {p.trim}.")
+    else:
+        add(f"- **Matching**: 1:1 nearest neighbour on the PS logit, caliper {p.caliper} SD, "
+            f"common-support trim {p.trim}.")
+
+    add("\n## 3. Matching Statistics")
+    add(f"- **Treated Units**: {s.n_treated}")
+    add(f"- **Control Units**: {s.n_control}")
+    add(f"- **Matched Pairs**: {s.n_matched}")
+    if result.att is None:
+        add("\n> **Critical Error**: No matches found.")
+        return "\n".join(out) + "\n"
+
+    att = result.att
+    add("\n## 4. Causal Estimates")
+    add("### Average Treatment Effect on the Treated (ATT)")
+    add(f"**Estimate**: `{att.estimate:.4f}`")
+    add(f"- **Abadie-Imbens SE**: `{att.se:.4f}` (95% CI `[{att.ci_low:.4f}, {att.ci_high:.4f}]`)")
+    if att.bootstrap is not None:
+        b = att.bootstrap
+        add(f"- **Bootstrap SE** ({b['n_valid']} replicates of PS fit, trimming and matching): "
+            f"`{b['se']:.4f}` (95% percentile CI `[{b['ci_low']:.4f}, {b['ci_high']:.4f}]`)")
+    if did:
+        add("Interpretation: High police spending is associated with this *change* in violent crime rate (2015-2019) "
+            "relative to low-spending cities. A negative value would indicate a deterrent effect.")
+    else:
+        add("Interpretation: High police spending is associated with higher crime levels.")
+
+    reg = result.regression
+    if reg is not None:
+        add("\n### Bias-Adjusted Regression (Doubly Robust)")
+        add("```")
+        add(coefficient_table(reg))
+        add("```")
+        if reg.cov_type != "nonrobust":
+            add(f"Standard errors: {reg.cov_type}.")
+        if did:
+            coef = reg.params["treatment"]
+            add("\n#### Analysis of Regression Results (Doubly Robust)")
+            add("This table presents the causal analysis of the *change* in violent crime (2015-2019).")
+            add("- **Intercept**: Represents the baseline trend for the reference group (Control) when all other "
+                "covariates are zero (theoretical baseline).")
+            add(f"- **treatment**: The main causal estimator (DiD). A coefficient of {coef:.2f} means high-spending "
+                "cities saw this much more (or less) crime growth than low-spending cities.")
+            add("- **population_density**: Controls for whether denser cities had different crime trends than sparse ones.")
+            add("- **median_income**: Controls for whether wealthier cities were on a different crime trajectory.")
+            add("- **poverty_rate**: Adjusts for the trend differential in high-poverty areas.")
+            add("- **male_15_24**: Adjusts for trends driven by demographic shifts (young male population share).")
+            if coef < 0:
+                add("\n> **Result**: The coefficient is negative, suggesting that increasing police spending REDUCED "
+                    "the growth of violent crime compared to the control group.")
+            else:
+                add("\n> **Result**: The coefficient remains positive, suggesting no deterrent effect "
+                    "(or persistent reverse causality).")
+
+    add("\n## 5. Sensitivity Analysis")
+    if result.placebo is not None and result.placebo.estimate is not None:
+        add(f"- **Placebo Test ({'Change in ' if did else ''}Property Crime)**: `{result.placebo.estimate:.4f}`")
+        add("  > **Interpretation**: Tests if the treatment also affects property crime trends. A significant effect "
+            "here might suggest broad unobserved confounding (e.g., gentrification) rather than specific policing "
+            "effects on violence.")
+    else:
+        add("- **Placebo Test**: Not available/calculated.")
+
+    perm = result.randomization
+    if perm is not None:
+        add(f"- **Randomization Test** ({perm.n_perm:,} {'(all) ' if perm.exact else ''}within-pair sign flips): "
+            f"p-value `{perm.p_value:.5f}`, permutation SE `{perm.null_se:.4f}`")
+        add("  > **Interpretation**: Share of random treated/control relabellings within the matched pairs that give "
+            "an ATT at least as far from zero as the observed one, under the sharp null of no effect.")
+
+    sens = result.sensitivity
+    if sens is not None:
+        # Upper-bound p-value: if it stays below alpha at Gamma=1.5, hidden bias of that size cannot explain the effect
+        p_val = sens.p_upper_at(1.5)
+        add(f"- **Rosenbaum Bounds (Gamma=1.5)**: p-value < `{p_val:.4f}`")
+        if p_val < sens.alpha:
+            add("  > **[NOTE]** The result is robust to hidden bias of magnitude Gamma=1.5.")
+        else:
+            add("  > **[WARNING]** The result may be sensitive to hidden bias at Gamma=1.5.")
+        add(f"- **Critical Gamma (p_upper > {sens.alpha:.2f})**: `{sens.critical_gamma:.3f}`")
+        add("\n| Gamma | p-value (upper) | p-value (lower) |")
+        add("|---|---|---|")
+        for g in REPORT_GAMMAS:
+            add(f"| {g:.2f} | {sens.p_upper_at(g):.4f} | {sens.p_lower_at(g):.4f} |")
+    return "\n".join(out) + "\n"
+
+def write_report(result: AnalysisResult, path: str = REPORT_PATH) -> str:
+    """
+    Renders result to path and returns the path.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as fh:
+        fh.write(render_markdown(result))
+    print(f"Report written to {path}", file=sys.stderr)
+    return path
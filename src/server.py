@@ -0,0 +1,132 @@
+"""
+Local analysis server.
+
+Loads and merges the data once, then answers analysis requests against the resident
+AnalysisSession (src.api) over HTTP on localhost:
+
+    GET  /health              -> {"status": "ok", "rows": {...}}
+    GET  /params              -> default AnalysisParams
+    POST /analyze             -> AnalysisResult as JSON; body: JSON object of AnalysisParams fields
+    POST /analyze?format=md   -> the Markdown report for that result
+
+Run with:
+    python -m src.server --port 8765
+    curl -s -X POST localhost:8765/analyze -d '{"caliper": 0.1, "n_boot": 0}'
+"""
+import argparse
+import dataclasses
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+from urllib.parse import parse_qs, urlparse
+from src.api import AnalysisParams, AnalysisSession, jsonable
+from src.backend import BACKENDS, set_backend, to_backend
+from src.data.functional import StageCache
+from src.report import render_markdown
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Server requests default to no bootstrap; pass "n_boot" to ask for one
+SERVER_DEFAULTS = {"n_boot": 0}
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    # Set by serve(): the shared session and the lock serializing runs on it
+    session: AnalysisSession = None
+    lock = threading.Lock()
+
+    def _send(self, status: int, body: str, content_type: str = "application/json") -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(jsonable(payload)))
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            s = self.session
+            self._send_json(200, {"status": "ok",
+                                  "rows": {"fisc": len(s.fisc), "fbi": len(s.cius), "acs": len(s.acs),
+                                           "merged": len(s.merged)}})
+        elif path == "/params":
+            self._send_json(200, dataclasses.asdict(AnalysisParams(**SERVER_DEFAULTS)))
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/analyze":
+            self._send_json(404, {"error": f"unknown path {url.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("request body must be a JSON object")
+            params = AnalysisParams.from_dict(dict(SERVER_DEFAULTS, **body))
+        except ValueError as e:  # includes JSONDecodeError
+            self._send_json(400, {"error": str(e)})
+            return
+
+        start = time.perf_counter()
+        try:
+            with self.lock:
+                result = self.session.run(params)
+        except (KeyError, ValueError) as e:
+            # e.g. an unknown covariate or outcome column, or a propensity model that did not converge
+            self._send_json(422, {"error": f"{type(e).__name__}: {e}"})
+            return
+        result.timings["request_s"] = time.perf_counter() - start
+
+        if parse_qs(url.query).get("format", ["json"])[0] in ("md", "markdown"):
+            self._send(200, render_markdown(result), "text/markdown; charset=utf-8")
+        else:
+            self._send_json(200, result.to_dict())
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+def serve(session: AnalysisSession, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """
+    Creates the server for session (call serve_forever() on it). Runs are serialized
+    on one lock, since they share the resident frames.
+    """
+    handler = type("BoundAnalysisHandler", (AnalysisHandler,), {"session": session, "lock": threading.Lock()})
+    return ThreadingHTTPServer((host, port), handler)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve analyses over a resident, preprocessed dataset.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas")
+    parser.add_argument("--stage-cache", action="store_true",
+                        help="Also read/write the on-disk stage cache (off: everything stays in memory).")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the raw inputs without the ingest cache.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    from src.data.ingest import load_raw_data
+    frames = load_raw_data(use_cache=not args.no_cache)
+    set_backend(args.backend, n_rows=sum(len(f) for f in frames))
+    session = AnalysisSession(*[to_backend(f) for f in frames], cache=StageCache() if args.stage_cache else None)
+    server = serve(session, args.host, args.port)
+    print(f"Data resident after {time.perf_counter() - start:.2f}s; serving on http://{args.host}:{args.port}",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from scipy.spatial.distance import cdist
+from src.models.covariate_matching import (CovariateIndex, match_covariates, nearest_covariates,
+                                           pooled_covariance, radius_covariates)
+
+N_CONTROL, N_TREATED, N_COV = 600, 150, 3
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(7)
+    control = rng.normal(size=(N_CONTROL, N_COV)) @ np.array([[1.0, 0.3, 0.0], [0.0, 1.0, 0.5], [0.0, 0.0, 2.0]])
+    treated = rng.normal(0.3, 1.0, size=(N_TREATED, N_COV))
+    # Logits only loosely tied to the covariates, so nearest covariate neighbours are often
+    # outside a tight caliper and the tree query has to grow
+    c_logit = 0.3 * control[:, 0] + rng.normal(size=N_CONTROL)
+    t_logit = 0.3 * treated[:, 0] + rng.normal(size=N_TREATED)
+    X = np.vstack([treated, control])
+    treat = np.r_[np.ones(N_TREATED), np.zeros(N_CONTROL)]
+    cov = pooled_covariance(X, treat)
+    return treated, control, t_logit, c_logit, cov
+
+def brute_force_candidates(data, caliper, radius):
+    """
+    Mahalanobis distance of every treated-control pair (inf where a caliper excludes it).
+    """
+    treated, control, t_logit, c_logit, cov = data
+    dist = cdist(treated, control, metric="mahalanobis", VI=np.linalg.inv(cov))
+    if caliper is not None:
+        dist[np.abs(t_logit[:, None] - c_logit[None, :]) > caliper] = np.inf
+    if radius is not None:
+        dist[dist > radius] = np.inf
+    return dist
+
+@pytest.mark.parametrize("k", [1, 3, 20])
+@pytest.mark.parametrize("caliper", [None, 0.02, 0.1, 0.5, 5.0])
+@pytest.mark.parametrize("radius", [None, 0.8, 2.0])
+def test_nearest_matches_brute_force(data, k, caliper, radius):
+    treated, control, t_logit, c_logit, cov = data
+    index = CovariateIndex(control, cov, c_logit)
+    distances, indices = nearest_covariates(index, treated, k, t_logit if caliper is not None else None,
+                                            caliper, radius)
+
+    dist = brute_force_candidates(data, caliper, radius)
+    order = np.argsort(dist, axis=1, kind="stable")[:, :k]
+    expected_dist = np.take_along_axis(dist, order, axis=1)
+    expected_idx = np.where(np.isfinite(expected_dist), order, -1)
+
+    np.testing.assert_array_equal(indices, expected_idx)
+    np.testing.assert_allclose(distances, expected_dist, rtol=1e-9, atol=1e-12)
+    # Slots without an eligible control are -1 / inf
+    assert np.array_equal(indices < 0, np.isinf(distances))
+
+@pytest.mark.parametrize("caliper", [None, 0.05, 0.5])
+@pytest.mark.parametrize("radius", [0.5, 1.5])
+def test_radius_matches_brute_force(data, caliper, radius):
+    treated, control, t_logit, c_logit, cov = data
+    index = CovariateIndex(control, cov, c_logit)
+    offsets, indices, distances = radius_covariates(index, treated, radius,
+                                                    t_logit if caliper is not None else None, caliper)
+
+    dist = brute_force_candidates(data, caliper, radius)
+    assert offsets[0] == 0 and offsets[-1] == len(indices) == len(distances)
+    for i in range(N_TREATED):
+        got_idx = indices[offsets[i]:offsets[i + 1]]
+        got_dist = distances[offsets[i]:offsets[i + 1]]
+        expected = np.flatnonzero(np.isfinite(dist[i]))
+        # Sorted by distance
+        assert np.all(np.diff(got_dist) >= 0)
+        np.testing.assert_array_equal(np.sort(got_idx), expected)
+        np.testing.assert_allclose(np.sort(got_dist), np.sort(dist[i, expected]), rtol=1e-9, atol=1e-12)
+
+def test_ball_tree_gives_the_same_matches(data):
+    treated, control, t_logit, c_logit, cov = data
+    kd = nearest_covariates(CovariateIndex(control, cov, c_logit), treated, 3, t_logit, 0.1, 2.0)
+    ball = nearest_covariates(CovariateIndex(control, cov, c_logit, tree="ball"), treated, 3, t_logit, 0.1, 2.0)
+    np.testing.assert_array_equal(kd[1], ball[1])
+    np.testing.assert_allclose(kd[0], ball[0])
+
+def test_match_covariates_layout(data):
+    treated, control, t_logit, c_logit, cov = data
+    X = np.vstack([treated, control])
+    treat = np.r_[np.ones(N_TREATED), np.zeros(N_CONTROL)]
+    logit = np.r_[t_logit, c_logit]
+    treated_pos, control_pos, keep, c_idx, c_match, c_dist = match_covariates(X, treat, logit, 0.1, None, 2)
+
+    dist = brute_force_candidates(data, 0.1, None)
+    order = np.argsort(dist, axis=1, kind="stable")[:, :2]
+    expected_dist = np.take_along_axis(dist, order, axis=1)
+    np.testing.assert_array_equal(keep, np.isfinite(expected_dist[:, 0]))
+    # Long form: one entry per filled slot, c_match numbering the kept treated units
+    filled = np.isfinite(expected_dist[keep])
+    np.testing.assert_array_equal(c_idx, order[keep][filled])
+    np.testing.assert_array_equal(c_match, np.nonzero(filled)[0])
+    np.testing.assert_allclose(c_dist, expected_dist[keep][filled], rtol=1e-9)
@@ -0,0 +1,66 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from src.data import incidents
+from src.data.incidents import count_offenses, load_incident_year
+
+# Offense rows of two agencies. Blank years, a whitespace-only year and another year must
+# not count towards 2019; the narrative column holds quoted newlines (and a quoted "")
+INCIDENTS = (
+    'ori,offense_code,data_year,narrative\n'
+    'OH001,13A,2019,"plain"\n'
+    'OH001,220,,"blank year"\n'
+    'OH001,120,2019,"line one\nline two"\n'
+    'OH002,240,2019,"said ""stop""\nthen left"\n'
+    'OH002,09A,2018,"other year"\n'
+    'OH002,23C,  ,"whitespace year"\n'
+    'OH002,35A,2019,"not Part I"\n'
+    ',13A,2019,"no agency"\n'
+    'OH002,23F,2019,"last\nrecord"\n'
+)
+AGENCIES = (
+    'ori,state,city,population\n'
+    'OH001,OH,Springfield city,50000\n'
+    'OH002,Ohio,Springfield,20000\n'
+)
+EXPECTED = pd.DataFrame({"violent_crime": [2, 0], "property_crime": [0, 2]}, index=["OH001", "OH002"])
+
+def _counts(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_index().astype("int64")
+
+@pytest.fixture
+def extract(tmp_path):
+    path = tmp_path / "NIBRS_2019_incidents.csv"
+    path.write_text(INCIDENTS)
+    (tmp_path / "NIBRS_2019_agencies.csv").write_text(AGENCIES)
+    return str(path)
+
+def test_blank_years_do_not_match(extract):
+    pd.testing.assert_frame_equal(_counts(count_offenses(extract, 2019)), EXPECTED)
+
+@pytest.mark.parametrize("block_bytes", [16, 40, 97, 1 << 20])
+def test_quoted_newlines_across_blocks(extract, monkeypatch, block_bytes):
+    # Small blocks put block boundaries inside quoted fields
+    monkeypatch.setattr(incidents, "CSV_BLOCK_BYTES", block_bytes)
+    pd.testing.assert_frame_equal(_counts(count_offenses(extract, 2019)), EXPECTED)
+
+def test_without_year_filter_counts_every_row(extract):
+    counts = _counts(count_offenses(extract))
+    assert counts.loc["OH001"].tolist() == [2, 1]
+    assert counts.loc["OH002"].tolist() == [1, 3]
+
+def test_parquet_blank_string_years(tmp_path):
+    table = pa.table({"ori": ["OH001", "OH001", "OH002"], "offense_code": ["13A", "220", "240"],
+                      "data_year": ["2019", "", None]})
+    path = tmp_path / "NIBRS_2019_incidents.parquet"
+    pq.write_table(table, path)
+    counts = _counts(count_offenses(str(path), 2019))
+    assert counts.to_dict("index") == {"OH001": {"violent_crime": 1, "property_crime": 0}}
+
+def test_load_incident_year_rolls_agencies_up_to_cities(extract):
+    df = load_incident_year(extract, 2019)
+    assert df[["state", "city", "year"]].values.tolist() == [["OH", "Springfield", 2019]]
+    row = df.iloc[0]
+    assert (row["violent_crime"], row["property_crime"], row["population"]) == (2, 2, 50000)
+    assert row["violent_crime_rate"] == pytest.approx(4.0)
@@ -0,0 +1,32 @@
+import pandas as pd
+from src.data.linkage import NameIndex, link_places
+
+FISC = pd.DataFrame({"state": ["MI", "MI", "MO"], "city": ["Clinton", "Lansing", "Saint Louis"]})
+
+def _fbi(rows):
+    return pd.DataFrame(rows, columns=["state", "city", "year"])
+
+def test_normalized_names_link():
+    fbi = _fbi([("MI", "Clinton Charter Township", 2019), ("MO", "St. Louis", 2019)])
+    out = link_places({"fisc": FISC, "fbi": fbi})["fbi"]
+    assert out["city"].tolist() == ["Clinton", "Saint Louis"]
+
+def test_normalized_link_skips_place_present_in_same_year():
+    # "Clinton" is in the FBI table under its own name in 2019, so the township is another place
+    fbi = _fbi([("MI", "Clinton", 2019), ("MI", "Clinton Charter Township", 2019)])
+    out = link_places({"fisc": FISC, "fbi": fbi})["fbi"]
+    assert out["city"].tolist() == ["Clinton", "Clinton Charter Township"]
+
+def test_normalized_link_allowed_in_other_years():
+    # A rename between editions: each year has the place under one name only
+    fbi = _fbi([("MI", "Clinton", 2018), ("MI", "Clinton Charter Township", 2019)])
+    out = link_places({"fisc": FISC, "fbi": fbi})["fbi"]
+    assert out["city"].tolist() == ["Clinton", "Clinton"]
+
+def test_link_without_periods_treats_occupied_as_always_taken():
+    index = NameIndex(FISC)
+    places = pd.DataFrame({"state": ["MI", "MI"], "city": ["Clinton Township", "Lansing City"]})
+    occupied = {int(index.positions.get_loc(("MI", "Clinton"))): 1}
+    linked = index.link(places, occupied=occupied)
+    assert linked["linked_city"].tolist() == [None, "Lansing"]
+    assert linked["method"].tolist() == ["none", "normalized"]
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.formula.api as smf
+from src.models.ols import DesignMatrix, parse_formula
+
+TERMS = ["treatment", "x1", "x2"]
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(3)
+    n = 240
+    df = pd.DataFrame({"treatment": rng.integers(0, 2, n).astype(float), "x1": rng.normal(size=n),
+                       "x2": rng.gamma(2.0, size=n), "cluster": rng.integers(0, 30, n)})
+    noise = rng.normal(size=n) * (1 + df["x2"])          # heteroskedastic
+    df["y1"] = 1.0 + 2.0 * df["treatment"] - 0.5 * df["x1"] + noise
+    df["y2"] = -3.0 + 0.5 * df["x2"] + rng.normal(size=n)
+    df["y3"] = df["y1"] + df["y2"]
+    # Different missing patterns: y1 and y3 share one, y2 has another, x1 misses for all
+    df.loc[rng.choice(n, 25, replace=False), "y1"] = np.nan
+    df.loc[df["y1"].isna(), "y3"] = np.nan
+    df.loc[rng.choice(n, 40, replace=False), "y2"] = np.nan
+    df.loc[rng.choice(n, 5, replace=False), "x1"] = np.nan
+    return df
+
+def statsmodels_fit(df, outcome, cov_type):
+    rows = df.dropna(subset=[outcome] + TERMS)
+    formula = f"{outcome} ~ " + " + ".join(TERMS)
+    if cov_type == "cluster":
+        return smf.ols(formula, data=rows).fit(cov_type="cluster", cov_kwds={"groups": rows["cluster"].to_numpy()})
+    return smf.ols(formula, data=rows).fit(cov_type=cov_type)
+
+@pytest.mark.parametrize("cov_type", ["nonrobust", "HC1", "cluster"])
+def test_matches_statsmodels(frame, cov_type):
+    design = DesignMatrix.from_frame(frame, TERMS, groups={"cluster": frame["cluster"].to_numpy()})
+    outcomes = {y: frame[y].to_numpy() for y in ("y1", "y2", "y3")}
+    results = design.fit(outcomes, cov_type=cov_type, cluster="cluster" if cov_type == "cluster" else None)
+    assert list(results) == ["y1", "y2", "y3"]
+
+    for y, res in results.items():
+        ref = statsmodels_fit(frame, y, cov_type)
+        assert res.nobs == int(ref.nobs)
+        assert res.df_resid == int(ref.df_resid)
+        assert res.use_t == ref.use_t
+        for attr in ("params", "bse", "tvalues", "pvalues"):
+            pd.testing.assert_series_equal(getattr(res, attr), getattr(ref, attr), check_names=False,
+                                           rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(res.conf_int().to_numpy(), ref.conf_int().to_numpy(), rtol=1e-10)
+
+def test_outcomes_fit_together_or_alone_agree(frame):
+    design = DesignMatrix.from_frame(frame, TERMS)
+    together = design.fit({y: frame[y].to_numpy() for y in ("y1", "y2", "y3")}, cov_type="HC1")
+    for y in ("y1", "y2", "y3"):
+        alone = DesignMatrix.from_frame(frame, TERMS).fit({y: frame[y].to_numpy()}, cov_type="HC1")[y]
+        pd.testing.assert_series_equal(together[y].params, alone.params, rtol=1e-12)
+        pd.testing.assert_series_equal(together[y].bse, alone.bse, rtol=1e-12)
+
+def test_cluster_labels_can_be_passed_directly(frame):
+    design = DesignMatrix.from_frame(frame, TERMS)
+    res = design.fit({"y2": frame["y2"].to_numpy()}, cov_type="cluster", cluster=frame["cluster"].to_numpy())["y2"]
+    ref = statsmodels_fit(frame, "y2", "cluster")
+    pd.testing.assert_series_equal(res.bse, ref.bse, check_names=False, rtol=1e-10)
+
+def test_rejects_bad_arguments(frame):
+    design = DesignMatrix.from_frame(frame, TERMS)
+    with pytest.raises(ValueError):
+        design.fit({"y1": frame["y1"].to_numpy()}, cov_type="HC3")
+    with pytest.raises(ValueError):
+        design.fit({"y1": frame["y1"].to_numpy()}, cov_type="cluster")
+    with pytest.raises(ValueError):
+        design.fit({"y1": frame["y1"].to_numpy()}, cov_type="cluster", cluster="match_id")
+    with pytest.raises(ValueError):
+        parse_formula("y ~ log(x)")
+    assert parse_formula("y ~ a + b") == ("y", ["a", "b"])
@@ -0,0 +1,94 @@
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from src.data import ingest
+from src.data.ingest import (clean_city_name, clean_city_names, map_states, parse_acs_places, split_fisc_places,
+                             us_state_abbrev)
+
+# The original per-row parsers the vectorized functions replaced (also the baseline of
+# src/benchmarks/place_names.py)
+
+def map_state_legacy(val):
+    val = str(val).title().strip()
+    val = re.sub(r'\d+$', '', val).strip()
+    return us_state_abbrev.get(val, None)
+
+def split_fisc_place_legacy(val):
+    s = str(val)
+    if ':' in s:
+        parts = s.split(':')
+        return parts[0].strip(), clean_city_name(parts[1])
+    return None, clean_city_name(s)
+
+def parse_acs_place_legacy(val):
+    if ',' in str(val):
+        parts = val.split(',')
+        return clean_city_name(parts[0].strip()), us_state_abbrev.get(parts[1].strip(), None)
+    return clean_city_name(val), None
+
+def parse_acs_places_legacy(places: pd.Series) -> pd.DataFrame:
+    out = places.apply(lambda x: pd.Series(parse_acs_place_legacy(x)))
+    out.columns = ['city', 'state']
+    return out
+
+def split_fisc_places_legacy(places: pd.Series) -> pd.DataFrame:
+    out = places.apply(lambda x: pd.Series(split_fisc_place_legacy(x)))
+    out.columns = ['state', 'city']
+    return out
+
+CITIES = [
+    "Springfield", "Springfield city", "Springfield3", "Springfield city12", "  Dayton town ",
+    "Kansas City", "Kansas City city", "Carson City", "city", " city", "City", "Town", "village",
+    "Lake Village", "Lake village", "Grand Rapids charter township", "Boston CITY", "Ventura town2",
+    "Saint-Louis", "12", "", "   ", np.nan, None,
+]
+STATES = [
+    "OHIO", "ohio", "Ohio", "OHIO1", "NEW YORK3", "new york", " Texas ", "DISTRICT OF COLUMBIA",
+    "District of Columbia", "Puerto Rico", "Not A State", "", np.nan, None,
+]
+FISC_LABELS = [
+    "AK: Anchorage", "OH: Springfield city", "OH:Dayton3", "MO: Kansas City", "KS: city",
+    "CA: Ventura: San Buenaventura", "NY: New York: city: extra", "no colon here", "Springfield village",
+    ":", "OH:", ": Nowhere", "", np.nan, None,
+]
+ACS_LABELS = [
+    "Frazee city, Minnesota", "Kansas City city, Missouri", "Kansas City, Kansas", "city, Ohio",
+    "Springfield town2, Vermont", "Lexington-Fayette urban county, Kentucky",
+    "Indianapolis city (balance), Indiana", "Ventura, San Buenaventura, California", "A, B, C, Ohio",
+    "Carson City, Nevada, extra", "Frazee city,Minnesota", "Frazee city, Minnesota ", "Nowhere, Narnia",
+    "No comma village", ",", ", Ohio", "Frazee city,", "", np.nan,
+]
+
+@pytest.fixture(params=["cold", "warm"])
+def tables(request, monkeypatch):
+    # cold: every name goes through the vectorized cleaning; warm: served from the memo tables
+    monkeypatch.setattr(ingest, "_CITY_NAME_TABLE", {})
+    monkeypatch.setattr(ingest, "_STATE_TABLE", {})
+    if request.param == "warm":
+        clean_city_names(pd.Series(CITIES + FISC_LABELS + ACS_LABELS, dtype=object))
+        map_states(pd.Series(STATES, dtype=object))
+    return request.param
+
+def test_clean_city_names_matches_legacy(tables):
+    names = pd.Series(CITIES, dtype=object)
+    expected = names.map(clean_city_name)
+    pd.testing.assert_series_equal(clean_city_names(names), expected.astype(object))
+
+def test_map_states_matches_legacy(tables):
+    states = pd.Series(STATES, dtype=object)
+    expected = states.map(map_state_legacy).astype(object)
+    pd.testing.assert_series_equal(map_states(states), expected)
+
+def test_split_fisc_places_matches_legacy(tables):
+    labels = pd.Series(FISC_LABELS, dtype=object)
+    pd.testing.assert_frame_equal(split_fisc_places(labels), split_fisc_places_legacy(labels))
+
+def test_parse_acs_places_matches_legacy(tables):
+    labels = pd.Series(ACS_LABELS, dtype=object)
+    pd.testing.assert_frame_equal(parse_acs_places(labels), parse_acs_places_legacy(labels))
+
+def test_index_is_kept(tables):
+    labels = pd.Series(["AK: Anchorage", "OH: Dayton"], index=[10, 3], dtype=object)
+    assert split_fisc_places(labels).index.tolist() == [10, 3]
+    assert parse_acs_places(pd.Series(["Frazee city, Minnesota"], index=[7])).index.tolist() == [7]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from src.models.psm import estimate_propensity_score, fit_logit, fit_logit_batch, logistic
+
+N, N_BATCH = 400, 6
+COVARIATES = ["x1", "x2", "x3"]
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame(rng.normal(size=(N, 3)), columns=COVARIATES)
+    df["x3"] = rng.gamma(2.0, size=N)
+    eta = -0.4 + 0.8 * df["x1"] - 0.5 * df["x2"] + 0.3 * df["x3"]
+    df["treatment"] = (rng.random(N) < logistic(eta.to_numpy())).astype(int)
+    return df
+
+def design(df):
+    return np.column_stack([np.ones(len(df)), df[COVARIATES].to_numpy()])
+
+def statsmodels_logit(X, y, weights=None):
+    if weights is not None:
+        # Frequency weights are the same fit as repeating each row weights[i] times
+        X, y = np.repeat(X, weights, axis=0), np.repeat(y, weights)
+    return sm.Logit(y, X).fit(disp=0, method="newton", tol=1e-12).params
+
+def test_fit_logit_matches_statsmodels(frame):
+    X, y = design(frame), frame["treatment"].to_numpy(dtype=float)
+    np.testing.assert_allclose(fit_logit(X, y), statsmodels_logit(X, y), rtol=1e-8, atol=1e-10)
+
+def test_propensity_scores_match_statsmodels(frame):
+    df = estimate_propensity_score(frame.copy(), "treatment", COVARIATES)
+    X = design(frame)
+    expected = sm.Logit(frame["treatment"].to_numpy(), X).fit(disp=0).predict(X)
+    np.testing.assert_allclose(df["propensity_score"].to_numpy(), expected, rtol=1e-8)
+
+def test_weighted_batch_matches_statsmodels(frame):
+    X, y = design(frame), frame["treatment"].to_numpy(dtype=float)
+    rng = np.random.default_rng(5)
+    # Bootstrap counts, one row of weights per model
+    weights = rng.multinomial(N, np.full(N, 1 / N), size=N_BATCH)
+    betas = fit_logit_batch(X, y, weights=weights)
+    assert betas.shape == (N_BATCH, X.shape[1])
+    for b in range(N_BATCH):
+        np.testing.assert_allclose(betas[b], statsmodels_logit(X, y, weights[b]), rtol=1e-8, atol=1e-10)
+
+def test_stacked_designs_match_statsmodels(frame):
+    rng = np.random.default_rng(8)
+    rows = np.stack([rng.integers(0, N, N) for _ in range(N_BATCH)])
+    X, y = design(frame)[rows], frame["treatment"].to_numpy(dtype=float)[rows]
+    betas = fit_logit_batch(X, y)
+    for b in range(N_BATCH):
+        np.testing.assert_allclose(betas[b], statsmodels_logit(X[b], y[b]), rtol=1e-8, atol=1e-10)
+
+def test_warm_starts_reach_the_same_fit(frame):
+    X, y = design(frame), frame["treatment"].to_numpy(dtype=float)
+    weights = np.random.default_rng(2).multinomial(N, np.full(N, 1 / N), size=N_BATCH)
+    cold = fit_logit_batch(X, y, weights=weights)
+    shared_start = fit_logit_batch(X, y, weights=weights, beta0=fit_logit(X, y))
+    own_start = fit_logit_batch(X, y, weights=weights, beta0=cold + 0.01)
+    np.testing.assert_allclose(shared_start, cold, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(own_start, cold, rtol=1e-8, atol=1e-10)
+    # Starting at the solution converges at once; a poor start needs more than two steps
+    np.testing.assert_allclose(fit_logit_batch(X, y, weights=weights, beta0=cold, max_iter=2), cold, rtol=1e-10)
+    assert np.isnan(fit_logit_batch(X, y, weights=weights, beta0=cold + 1.0, max_iter=2)).all()
+
+@pytest.mark.filterwarnings("ignore:overflow encountered in exp")
+def test_non_convergence(frame):
+    separated = frame.copy()
+    separated["treatment"] = (separated["x1"] > 0).astype(int)
+    X = design(separated)
+    assert np.isnan(fit_logit(X, separated["treatment"].to_numpy(dtype=float))).all()
+    with pytest.raises(ValueError):
+        estimate_propensity_score(separated, "treatment", COVARIATES)
+
+    # Only the failing models of a batch are NaN: a separated outcome and a singular design
+    y = np.stack([frame["treatment"].to_numpy(dtype=float), separated["treatment"].to_numpy(dtype=float)])
+    betas = fit_logit_batch(X, y)
+    np.testing.assert_allclose(betas[0], statsmodels_logit(X, y[0]), rtol=1e-8, atol=1e-10)
+    assert np.isnan(betas[1]).all()
+    collinear = np.stack([X, np.column_stack([X[:, :3], X[:, 1]])])
+    betas = fit_logit_batch(collinear, y[0])
+    np.testing.assert_allclose(betas[0], statsmodels_logit(X, y[0]), rtol=1e-8, atol=1e-10)
+    assert np.isnan(betas[1]).all()
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors
+from src.models.matching import match_scores
+from src.models.sorted_matching import greedy_1d, knn_1d, radius_1d
+
+N_TREATED, N_CONTROL = 300, 500
+
+@pytest.fixture(scope="module")
+def scores():
+    # Continuous scores: no two distances are exactly equal
+    rng = np.random.default_rng(21)
+    return rng.normal(0.4, 1.0, N_TREATED), rng.normal(0.0, 1.2, N_CONTROL)
+
+@pytest.fixture(scope="module")
+def tied_scores():
+    # Scores on a coarse grid: many equal scores and equidistant controls on both sides
+    rng = np.random.default_rng(22)
+    return np.round(rng.normal(0.4, 1.0, N_TREATED), 1), np.round(rng.normal(0.0, 1.2, N_CONTROL), 1)
+
+def sklearn_knn(treated, control, k):
+    nn = NearestNeighbors(n_neighbors=k).fit(control.reshape(-1, 1))
+    return nn.kneighbors(treated.reshape(-1, 1))
+
+@pytest.mark.parametrize("k", [1, 3])
+def test_knn_matches_sklearn(scores, k):
+    treated, control = scores
+    distances, indices = knn_1d(treated, control, k)
+    ref_distances, ref_indices = sklearn_knn(treated, control, k)
+    np.testing.assert_array_equal(indices, ref_indices)
+    np.testing.assert_allclose(distances, ref_distances, rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize("k", [1, 3])
+def test_knn_with_ties_matches_sklearn_distances(tied_scores, k):
+    # Equidistant controls may be taken in another order; the distances are the same
+    treated, control = tied_scores
+    distances, indices = knn_1d(treated, control, k)
+    ref_distances, _ = sklearn_knn(treated, control, k)
+    np.testing.assert_allclose(distances, ref_distances, atol=1e-12)
+    np.testing.assert_allclose(np.abs(control[indices] - treated[:, None]), distances, atol=1e-12)
+    # Ties go to the lower score, then among equal scores to the control nearest in sorted order
+    rank = np.empty(N_CONTROL, dtype=np.int64)
+    rank[np.argsort(control, kind="stable")] = np.arange(N_CONTROL)
+    pos = np.searchsorted(np.sort(control), treated)[:, None]
+    nearness = np.where(rank[None, :] < pos, pos - 1 - rank[None, :], rank[None, :] - pos)
+    brute = np.abs(control[None, :] - treated[:, None])
+    expected = np.lexsort((nearness, np.broadcast_to(control, brute.shape), brute), axis=1)[:, :k]
+    np.testing.assert_array_equal(indices, expected)
+
+@pytest.mark.parametrize("k", [1, 3])
+@pytest.mark.parametrize("caliper", [None, 0.01, 0.2])
+def test_match_scores_engines_agree(scores, k, caliper):
+    treated, control = scores
+    logit = np.r_[treated, control]
+    treat = np.r_[np.ones(N_TREATED), np.zeros(N_CONTROL)]
+    caliper_val = np.inf if caliper is None else caliper
+    ours = match_scores(logit, treat, caliper_val, k, engine="sorted")
+    ref = match_scores(logit, treat, caliper_val, k, engine="sklearn")
+    for a, b in zip(ours[:-1], ref[:-1]):
+        np.testing.assert_array_equal(a, b)
+    np.testing.assert_allclose(ours[-1], ref[-1], rtol=1e-12, atol=1e-15)
+    if caliper == 0.01:
+        assert 0 < ours[2].sum() < N_TREATED
+
+def brute_greedy(treated, control, k, caliper, visit):
+    """
+    Greedy matching by scanning every control: nearest available first, ties to the lower score.
+    """
+    distances = np.full((len(treated), k), np.inf)
+    picked_scores = np.full((len(treated), k), np.nan)
+    available = np.ones(len(control), dtype=bool)
+    limit = np.inf if caliper is None else caliper
+    for t in visit:
+        for slot in range(k):
+            dist = np.where(available, np.abs(control - treated[t]), np.inf)
+            best = np.lexsort((control, dist))[0]
+            if not dist[best] <= limit:
+                break
+            distances[t, slot], picked_scores[t, slot] = dist[best], control[best]
+            available[best] = False
+    return distances, picked_scores
+
+@pytest.mark.parametrize("fixture", ["scores", "tied_scores"])
+@pytest.mark.parametrize("k", [1, 3])
+@pytest.mark.parametrize("caliper", [None, 0.05, 0.3])
+@pytest.mark.parametrize("visit", ["given", "shuffled"])
+def test_greedy_matches_brute_force(request, fixture, k, caliper, visit):
+    treated, control = request.getfixturevalue(fixture)
+    order = np.arange(N_TREATED) if visit == "given" else np.random.default_rng(1).permutation(N_TREATED)
+    distances, indices = greedy_1d(treated, control, k, caliper=caliper,
+                                   treated_order=None if visit == "given" else order)
+    expected_dist, expected_scores = brute_greedy(treated, control, k, caliper, order)
+    np.testing.assert_allclose(distances, expected_dist, atol=1e-12)
+    filled = indices >= 0
+    np.testing.assert_array_equal(filled, np.isfinite(expected_dist))
+    # Controls with equal scores are interchangeable, so compare the scores picked
+    np.testing.assert_array_equal(control[indices[filled]], expected_scores[filled])
+    # Without replacement every control is used at most once
+    assert len(np.unique(indices[filled])) == filled.sum()
+
+def test_greedy_runs_out_of_controls():
+    distances, indices = greedy_1d(np.array([0.0, 0.1, 0.2]), np.array([0.05, 5.0]), k=1)
+    np.testing.assert_array_equal(indices[:, 0], [0, 1, -1])
+    assert np.isinf(distances[2, 0])
+
+@pytest.mark.parametrize("fixture", ["scores", "tied_scores"])
+@pytest.mark.parametrize("radius", [0.0, 0.05, 0.3])
+def test_radius_matches_brute_force(request, fixture, radius):
+    treated, control = request.getfixturevalue(fixture)
+    offsets, indices, distances = radius_1d(treated, control, radius)
+    assert offsets[0] == 0 and offsets[-1] == len(indices) == len(distances)
+    for t in range(N_TREATED):
+        got = indices[offsets[t]:offsets[t + 1]]
+        dist = np.abs(control - treated[t])
+        np.testing.assert_array_equal(np.sort(got), np.flatnonzero(dist <= radius))
+        np.testing.assert_array_equal(distances[offsets[t]:offsets[t + 1]], dist[got])
+        assert np.all(np.diff(distances[offsets[t]:offsets[t + 1]]) >= 0)